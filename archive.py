@@ -0,0 +1,61 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+
+from database import MOVIE_SCHEMA, DatabaseRepository
+from dictionaries import CATEGORY_URLS
+from movie import Movie
+from progress import PROGRESS_TABLE
+
+ARCHIVE_POSTED_DAYS = int(os.getenv("ARCHIVE_POSTED_DAYS", 90))  # через сколько дней после выхода убирать в архив
+ARCHIVE_UNSEEN_DAYS = int(os.getenv("ARCHIVE_UNSEEN_DAYS", 30))  # сколько дней не вышедший тайтл может отсутствовать в чарте
+
+# Колонки архива: id без SERIAL, чтобы сохранить исходные значения
+ARCHIVE_SCHEMA = {**MOVIE_SCHEMA, "id": "INT PRIMARY KEY", "archived_at": "TIMESTAMPTZ DEFAULT now()"}
+
+
+def archive_table_name(content_type: str) -> str:
+    return f"{content_type}_архив"
+
+
+def compact_tables(repository: DatabaseRepository, now: datetime = None) -> dict[str, int]:
+    """
+    Переносит устаревшие строки из рабочих таблиц категорий в архивные:
+    - вышедшие и отправленные больше ARCHIVE_POSTED_DAYS дней назад, которых нет в чарте дольше ARCHIVE_UNSEEN_DAYS дней
+      (тайтл, который ещё в чарте, update_charts вернул бы из архива на следующий же день);
+    - не вышедшие, которых нет в чарте дольше ARCHIVE_UNSEEN_DAYS дней.
+    Рабочие таблицы и ежедневные проверки остаются того же размера, история сохраняется в архиве.
+    :return: Число перенесённых строк по категориям.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    posted_before = now - timedelta(days=ARCHIVE_POSTED_DAYS)
+    unseen_before = now - timedelta(days=ARCHIVE_UNSEEN_DAYS)
+
+    moved = {}
+    for content_type in CATEGORY_URLS:
+        archive_table = archive_table_name(content_type)
+        repository.create_table(table_name=content_type)
+        repository.create_table(table_name=archive_table, schema=ARCHIVE_SCHEMA)
+
+        posted = repository.move_rows(
+            table_name=content_type,
+            target_table=archive_table,
+            data=Movie(date_now=("<", posted_before), last_seen=("<", unseen_before)).to_dict
+        )
+        dropped = repository.move_rows(
+            table_name=content_type,
+            target_table=archive_table,
+            data=Movie(date_now=None, last_seen=("<", unseen_before)).to_dict
+        )
+        moved[content_type] = posted + dropped
+        logger.info(f"Архив {content_type}: отправленных {posted}, выпавших из чарта {dropped}")
+
+    # Завершённые отправки старше срока больше не нужны для повторов
+    if repository.table_exists(PROGRESS_TABLE):
+        repository.delete_from_table(
+            table_name=PROGRESS_TABLE,
+            data={"next_attempt_at": None, "updated_at": ("<", posted_before)}
+        )
+    return moved
@@ -0,0 +1,316 @@
+import os
+from contextlib import asynccontextmanager
+
+from loguru import logger
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from database import (DB_CONNECT_TIMEOUT, MOVIE_SCHEMA, DatabaseConnection, DatabaseRepository,
+                      DatabaseUnavailable, PostgreSQLDatabaseRepository)
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+
+
+class AsyncPostgreSQLConnection(DatabaseConnection):
+    """
+    Пул асинхронных соединений PostgreSQL (psycopg 3).
+    Каждый запрос берёт своё соединение из пула, поэтому параллельные корутины не ждут друг друга.
+    """
+
+    def __init__(
+        self,
+        db_host: str = None,
+        db_user: str = None,
+        db_password: str = None,
+        db_port: str = None,
+        db_name: str = None,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE
+    ):
+        super().__init__()
+        self.conninfo = make_conninfo(
+            host=db_host or os.getenv("DB_HOST"),
+            user=db_user or os.getenv("DB_USER"),
+            password=db_password or os.getenv("DB_PASSWORD"),
+            port=db_port or os.getenv("DB_PORT"),
+            dbname=db_name or os.getenv("DB_NAME"),
+            connect_timeout=DB_CONNECT_TIMEOUT
+        )
+        self.db_name = db_name or os.getenv("DB_NAME")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool: AsyncConnectionPool | None = None
+
+    def create_connection(self) -> AsyncConnectionPool:
+        """Создает пул соединений (ещё не открытый)"""
+        return AsyncConnectionPool(
+            self.conninfo,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            kwargs={"autocommit": True, "row_factory": dict_row},
+            check=AsyncConnectionPool.check_connection,
+            open=False
+        )
+
+    async def connect(self):
+        """Открывает пул и ждёт первые min_size соединений"""
+        await self.reconnect()
+        logger.success(f"Успешное подключение к базе данных {self.db_name} (пул до {self.max_size} соединений)")
+
+    async def reconnect(self, retries: int = 1, delay: int = 0):
+        """
+        Пересоздаёт пул соединений.
+        :raises DatabaseUnavailable: если подключиться не удалось.
+        """
+
+        await self.close()
+        pool = self.create_connection()
+        try:
+            await pool.open(wait=True, timeout=DB_CONNECT_TIMEOUT * max(retries, 1) + delay)
+        except Exception as e:
+            await pool.close()
+            raise DatabaseUnavailable(str(e)) from e
+        self.pool = pool
+
+    async def ensure_connection(self):
+        """Открывает пул, если он ещё не открыт. Битые соединения пул проверяет и заменяет сам"""
+        if self.pool is None or self.pool.closed:
+            await self.reconnect()
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @asynccontextmanager
+    async def cursor(self, name: str = None):
+        """
+        Курсор на соединении из пула
+        :param name: Имя серверного курсора. Если указано, строки читаются порциями (внутри транзакции).
+        """
+
+        await self.ensure_connection()
+        async with self.pool.connection() as connection:
+            if name:
+                async with connection.transaction():
+                    async with connection.cursor(name=name) as cursor:
+                        yield cursor
+            else:
+                async with connection.cursor() as cursor:
+                    yield cursor
+
+    @asynccontextmanager
+    async def pipeline(self):
+        """
+        Соединение в режиме pipeline внутри одной транзакции:
+        запросы уходят на сервер пачкой, не дожидаясь ответа на каждый.
+        """
+
+        await self.ensure_connection()
+        async with self.pool.connection() as connection:
+            async with connection.transaction():
+                async with connection.pipeline():
+                    yield connection
+
+
+class AsyncPostgreSQLDatabaseRepository(DatabaseRepository):
+    """
+    Асинхронный аналог PostgreSQLDatabaseRepository с теми же методами и фильтрами.
+    Для множества мелких записей есть add_many_into_table и update_many - один round trip на пачку.
+    """
+
+    build_select = classmethod(PostgreSQLDatabaseRepository.build_select.__func__)
+
+    def __init__(self, db_connection: AsyncPostgreSQLConnection):
+        super().__init__(db_connection)
+
+    @staticmethod
+    def build_where(data: dict = None) -> tuple[str, list]:
+        """
+        Как PostgreSQLDatabaseRepository.build_where, но psycopg 3 не раскрывает кортеж в IN (...),
+        поэтому фильтр ("IN", values) превращается в = ANY(массив).
+        """
+
+        data = data or {}
+        in_filters = {
+            key: list(condition[1]) for key, condition in data.items()
+            if isinstance(condition, tuple) and condition[0].strip().upper() == "IN"
+        }
+        where_clause, params = PostgreSQLDatabaseRepository.build_where(
+            {key: condition for key, condition in data.items() if key not in in_filters}
+        )
+        if not in_filters:
+            return where_clause, params
+        clauses = [where_clause.removeprefix(" WHERE ")] if where_clause else []
+        clauses += [f"{key} = ANY(%s)" for key in in_filters]
+        return " WHERE " + " AND ".join(clauses), params + list(in_filters.values())
+
+    async def table_exists(self, table_name: str) -> bool:
+        """Проверяет, существует ли таблица с заданным именем"""
+        async with self.db_connection.cursor() as cursor:
+            await cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_tables WHERE tablename = %s)", (table_name,))
+            result = await cursor.fetchone()
+            return result["exists"]
+
+    async def create_table(self, table_name: str, schema: dict = None):
+        """
+        Создаёт таблицу, если она ещё не существует
+        :param schema: Словарь вида {col_name: col_type}, по умолчанию MOVIE_SCHEMA.
+        """
+
+        schema = schema or MOVIE_SCHEMA
+        if not await self.table_exists(table_name):
+            columns = ",\n".join(f"{name} {col_type}" for name, col_type in schema.items())
+            async with self.db_connection.cursor() as cursor:
+                await cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
+            logger.success(f"Таблица '{table_name}' создана")
+        else:
+            # Добавляем колонки, появившиеся в схеме после создания таблицы. ALTER TABLE берёт
+            # ACCESS EXCLUSIVE блокировку даже с IF NOT EXISTS, поэтому выполняется только для новых колонок
+            async with self.db_connection.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table_name,)
+                )
+                existing = {row["column_name"] for row in await cursor.fetchall()}
+            missing = [name for name in schema if name not in existing]
+            if missing:
+                async with self.db_connection.pipeline() as connection:
+                    for name in missing:
+                        await connection.execute(
+                            f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {name} {schema[name]}"
+                        )
+
+    @staticmethod
+    def build_insert(table_name: str, data: dict) -> tuple[str, list]:
+        columns = ", ".join(data.keys())
+        placeholders = ", ".join(["%s"] * len(data))
+        return f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders}) RETURNING id", list(data.values())
+
+    @classmethod
+    def build_update(cls, table_name: str, data: dict, updates: dict) -> tuple[str, list]:
+        if not data or not updates:
+            raise ValueError("Необходимо указать data и updates.")
+        set_clause = ", ".join([f"{key} = %s" for key in updates.keys()])
+        where_clause, where_params = cls.build_where(data)
+        return f"UPDATE {table_name} SET {set_clause}{where_clause}", list(updates.values()) + where_params
+
+    async def add_into_table(self, table_name: str, data: dict) -> int:
+        """
+        Добавляет новую запись в таблицу.
+        :param table_name: Название таблицы.
+        :param data: Словарь вида {col_name: value}.
+        :return: ID.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать данные для вставки.")
+
+        query, params = self.build_insert(table_name, data)
+        async with self.db_connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            result = await cursor.fetchone()
+            row_id = result["id"] if result and "id" in result else None
+        self.notify_write(table_name, {"id": row_id}, data)
+        return row_id
+
+    async def add_many_into_table(self, table_name: str, rows: list[dict]) -> list[int]:
+        """
+        Добавляет записи одной транзакцией в режиме pipeline.
+        :param rows: Словари вида {col_name: value}, набор колонок может отличаться.
+        :return: ID в порядке rows.
+        """
+
+        if not rows:
+            return []
+        async with self.db_connection.pipeline() as connection:
+            cursors = []
+            for data in rows:
+                if not data:
+                    raise ValueError("Необходимо указать данные для вставки.")
+                query, params = self.build_insert(table_name, data)
+                cursors.append(await connection.execute(query, params))
+        row_ids = []
+        for cursor, data in zip(cursors, rows):
+            result = await cursor.fetchone()
+            row_ids.append(result["id"] if result and "id" in result else None)
+            self.notify_write(table_name, {"id": row_ids[-1]}, data)
+        return row_ids
+
+    async def delete_from_table(self, table_name: str, data: dict) -> int:
+        """
+        Удаляет записи из таблицы по заданным фильтрам.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :return: Число удалённых строк.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать фильтры для удаления.")
+
+        where_clause, params = self.build_where(data)
+        async with self.db_connection.cursor() as cursor:
+            await cursor.execute(f"DELETE FROM {table_name}{where_clause}", params)
+            deleted = cursor.rowcount
+        self.notify_write(table_name, data, deleted=True)
+        return deleted
+
+    async def get_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        fetchone: bool = True,
+        columns: list[str] = None
+    ) -> dict | list[dict]:
+        """
+        Получает все данные из таблицы с опциональными фильтрами и сортировкой.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param fetchone: Вернуть лишь одно значение, False - вернуть список
+        :param columns: Список нужных колонок, по умолчанию все.
+        """
+
+        query, params = self.build_select(table_name, data, sort_by, columns)
+        async with self.db_connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            if fetchone:
+                return await cursor.fetchone()
+            return await cursor.fetchall()
+
+    async def update_table(self, table_name: str, data: dict, updates: dict) -> int:
+        """
+        Обновляет записи в таблице по заданным фильтрам.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param updates: Словарь обновляемых данных вида {col_name: value}.
+        :return: Число изменённых строк.
+        """
+
+        query, params = self.build_update(table_name, data, updates)
+        async with self.db_connection.cursor() as cursor:
+            await cursor.execute(query, params)
+            updated = cursor.rowcount
+        self.notify_write(table_name, data, updates)
+        return updated
+
+    async def update_many(self, table_name: str, changes: list[tuple[dict, dict]]) -> int:
+        """
+        Несколько UPDATE одной транзакцией в режиме pipeline.
+        :param changes: Пары (data, updates), как у update_table.
+        :return: Общее число изменённых строк.
+        """
+
+        if not changes:
+            return 0
+        async with self.db_connection.pipeline() as connection:
+            cursors = []
+            for data, updates in changes:
+                query, params = self.build_update(table_name, data, updates)
+                cursors.append(await connection.execute(query, params))
+        updated = sum(cursor.rowcount for cursor in cursors)
+        for data, updates in changes:
+            self.notify_write(table_name, data, updates)
+        return updated
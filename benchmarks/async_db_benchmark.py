@@ -0,0 +1,143 @@
+"""
+Пропускная способность мелких операций с бд: синхронный PostgreSQLDatabaseRepository
+против AsyncPostgreSQLDatabaseRepository с пулом и pipeline.
+
+    python benchmarks/async_db_benchmark.py --ops 2000 --concurrency 32
+
+Подключение берётся из DB_HOST/DB_USER/DB_PASSWORD/DB_PORT/DB_NAME.
+Каждая операция - вставка строки, чтение её по url и обновление рейтинга (как в save_chart_rows).
+Режимы:
+    sync           - по очереди через одно соединение psycopg2 (как сейчас работает бот);
+    sync-threads   - --concurrency потоков на том же соединении;
+    async          - --concurrency корутин, каждая на своём соединении из пула;
+    async-pipeline - вставки и обновления пачками по --batch через add_many_into_table/update_many.
+Таблица bench_async создаётся заново и удаляется в конце.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DB_JOURNAL_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_database import AsyncPostgreSQLConnection, AsyncPostgreSQLDatabaseRepository  # noqa: E402
+from database import MOVIE_SCHEMA, PostgreSQLConnection, PostgreSQLDatabaseRepository  # noqa: E402
+
+TABLE = "bench_async"
+
+
+def row(i: int, run: str) -> dict:
+    return {"title": f"Фильм {i}", "year_start": 2025, "rating": 7.0, "url": f"https://www.imdb.com/title/{run}{i:08d}"}
+
+
+def sync_op(repository, i: int, run: str, latencies: list):
+    started = time.perf_counter()
+    data = row(i, run)
+    repository.add_into_table(TABLE, data)
+    repository.get_table(TABLE, data={"url": data["url"]}, columns=["id", "rating"])
+    repository.update_table(TABLE, data={"url": data["url"]}, updates={"rating": 8.0})
+    latencies.append(time.perf_counter() - started)
+
+
+async def async_op(repository, i: int, run: str, latencies: list):
+    started = time.perf_counter()
+    data = row(i, run)
+    await repository.add_into_table(TABLE, data)
+    await repository.get_table(TABLE, data={"url": data["url"]}, columns=["id", "rating"])
+    await repository.update_table(TABLE, data={"url": data["url"]}, updates={"rating": 8.0})
+    latencies.append(time.perf_counter() - started)
+
+
+def run_sync(repository, ops: int, concurrency: int) -> list:
+    latencies = []
+    if concurrency <= 1:
+        for i in range(ops):
+            sync_op(repository, i, "s", latencies)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda i: sync_op(repository, i, "t", latencies), range(ops)))
+    return latencies
+
+
+async def run_async(repository, ops: int, concurrency: int) -> list:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            await async_op(repository, i, "a", latencies)
+
+    await asyncio.gather(*(limited(i) for i in range(ops)))
+    return latencies
+
+
+async def run_pipeline(repository, ops: int, batch: int) -> list:
+    latencies = []
+    for start in range(0, ops, batch):
+        started = time.perf_counter()
+        rows = [row(i, "p") for i in range(start, min(start + batch, ops))]
+        await repository.add_many_into_table(TABLE, rows)
+        await repository.get_table(TABLE, data={"url": ("IN", tuple(r["url"] for r in rows))}, fetchone=False)
+        await repository.update_many(TABLE, [({"url": r["url"]}, {"rating": 8.0}) for r in rows])
+        # Задержка пачки делится на её операции, чтобы сравнивать с остальными режимами
+        latencies += [(time.perf_counter() - started) / len(rows)] * len(rows)
+    return latencies
+
+
+def report(mode: str, ops: int, elapsed: float, latencies: list):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{mode:<15} {ops / elapsed:>9.0f} оп/с   p50 {p50:>7.2f} мс   p95 {p95:>7.2f} мс")
+
+
+async def main_async(args):
+    connection = AsyncPostgreSQLConnection(min_size=min(args.concurrency, 4), max_size=args.concurrency)
+    await connection.connect()
+    repository = AsyncPostgreSQLDatabaseRepository(connection)
+    try:
+        started = time.perf_counter()
+        latencies = await run_async(repository, args.ops, args.concurrency)
+        report("async", args.ops, time.perf_counter() - started, latencies)
+
+        started = time.perf_counter()
+        latencies = await run_pipeline(repository, args.ops, args.batch)
+        report("async-pipeline", args.ops, time.perf_counter() - started, latencies)
+    finally:
+        await connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=2000, help="Операций (вставка + чтение + обновление) в каждом режиме")
+    parser.add_argument("--concurrency", type=int, default=32, help="Потоков/корутин и размер пула")
+    parser.add_argument("--batch", type=int, default=100, help="Операций в пачке для async-pipeline")
+    args = parser.parse_args()
+
+    sync_repository = PostgreSQLDatabaseRepository(PostgreSQLConnection())
+    with sync_repository.db_connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    sync_repository.create_table(TABLE, MOVIE_SCHEMA)
+    sync_repository.create_index(TABLE, ["url"])
+    try:
+        started = time.perf_counter()
+        latencies = run_sync(sync_repository, args.ops, 1)
+        report("sync", args.ops, time.perf_counter() - started, latencies)
+
+        started = time.perf_counter()
+        latencies = run_sync(sync_repository, args.ops, args.concurrency)
+        report("sync-threads", args.ops, time.perf_counter() - started, latencies)
+
+        asyncio.run(main_async(args))
+    finally:
+        with sync_repository.db_connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Задержка нечёткого поиска по названию (DatabaseRepository.search_titles) на синтетических таблицах.
+
+    python benchmarks/search_benchmark.py --db postgres --rows 100000 --queries 200
+    python benchmarks/search_benchmark.py --db memory --rows 100000 --queries 20
+
+Создаёт две таблицы по --rows строк, запросы - названия существующих строк с опечатками.
+Выводит перцентили задержки и долю запросов, где искомый тайтл нашёлся в top-5.
+Бэкенд memory ищет перебором без индекса и служит точкой отсчёта для триграммных индексов PostgreSQL.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RU_WORDS = [
+    "тёмный", "рыцарь", "последний", "город", "море", "звёзды", "война", "тайна", "дом", "время",
+    "охотник", "королева", "мост", "ночь", "зима", "остров", "пламя", "граница", "сердце", "дорога",
+]
+EN_WORDS = [
+    "dark", "knight", "last", "city", "sea", "stars", "war", "secret", "house", "time",
+    "hunter", "queen", "bridge", "night", "winter", "island", "flame", "border", "heart", "road",
+]
+TABLES = ["bench_movies", "bench_series"]
+COLUMNS = ["title", "title_original", "year_start", "rating", "url"]
+
+
+def synthetic_rows(rng: random.Random, rows: int, offset: int) -> list[tuple]:
+    result = []
+    for i in range(rows):
+        words = rng.sample(range(len(RU_WORDS)), rng.randint(2, 4))
+        title = " ".join(RU_WORDS[w] for w in words).capitalize() + f" {offset + i}"
+        title_original = " ".join(EN_WORDS[w] for w in words).title() + f" {offset + i}"
+        result.append((title, title_original, rng.randint(1950, 2026), round(rng.uniform(5, 9.5), 1),
+                       f"https://www.imdb.com/title/tt{offset + i:08d}"))
+    return result
+
+
+def misspell(rng: random.Random, text: str) -> str:
+    """Одна случайная опечатка: пропуск, замена или перестановка букв"""
+    chars = list(text)
+    i = rng.randrange(1, len(chars) - 1)
+    kind = rng.choice(["drop", "replace", "swap"])
+    if kind == "drop":
+        del chars[i]
+    elif kind == "replace":
+        chars[i] = rng.choice("аеиоуaeiou")
+    else:
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="memory", choices=["memory", "postgres"])
+    parser.add_argument("--rows", type=int, default=100_000, help="Строк в каждой таблице")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.environ["DB_BACKEND"] = args.db
+
+    from loguru import logger
+
+    from database import create_repository
+    from metrics import percentile
+
+    rng = random.Random(args.seed)
+    repository = create_repository(args.db)
+
+    catalog = []
+    started = time.perf_counter()
+    for number, table_name in enumerate(TABLES):
+        repository.create_table(table_name=table_name)
+        repository.delete_from_table(table_name=table_name, data={"id": (">", 0)})
+        rows = synthetic_rows(rng, args.rows, offset=number * args.rows)
+        repository.copy_into_table(table_name=table_name, columns=COLUMNS, rows=rows)
+        catalog += [(table_name, row) for row in rows]
+    logger.info(f"Загружено {len(catalog)} строк за {time.perf_counter() - started:.1f} сек")
+
+    started = time.perf_counter()
+    for table_name in TABLES:
+        repository.create_search_index(table_name=table_name)
+    logger.info(f"Индексы построены за {time.perf_counter() - started:.1f} сек")
+
+    timings, found = [], 0
+    for _ in range(args.queries):
+        table_name, row = rng.choice(catalog)
+        use_original = rng.random() < 0.5
+        query = misspell(rng, row[1] if use_original else row[0])
+        started = time.perf_counter()
+        matches = repository.search_titles(TABLES, query, limit=5, columns=["url"])
+        timings.append((time.perf_counter() - started) * 1000)
+        found += any(match["url"] == row[4] for match in matches)
+
+    logger.info(
+        f"{args.db}, {args.rows} строк x {len(TABLES)} таблицы, {args.queries} запросов: "
+        f"p50 {percentile(timings, 50):.2f} мс, p90 {percentile(timings, 90):.2f} мс, "
+        f"p99 {percentile(timings, 99):.2f} мс, найдено в top-5 {found / args.queries:.0%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import html
+import os
+import threading
+import time
+
+import requests
+from loguru import logger
+
+import message
+from cache import MovieCache
+from dictionaries import CATEGORY_URLS
+from metrics import metrics
+
+BOT_POLL_TIMEOUT = int(os.getenv("BOT_POLL_TIMEOUT", 30))  # секунд long polling getUpdates
+BOT_REPLY_LIMIT = int(os.getenv("BOT_REPLY_LIMIT", 10))  # тайтлов в ответе на категорию
+BOT_NEW_DAYS = int(os.getenv("BOT_NEW_DAYS", 7))
+
+HELP_TEXT = (
+    "/new - вышедшие за неделю\n"
+    "/top [фильмы|сериалы] - лучшие по рейтингу\n"
+    "/upcoming [фильмы|сериалы] - ожидаемые"
+)
+
+
+def format_rows(category: str, rows: list[dict]) -> str:
+    lines = [f"<b><u>#{category}</u></b>"]
+    for number, row in enumerate(rows, start=1):
+        year = f"{row['year_start']}-{row['year_end']}" if row["year_end"] else row["year_start"]
+        rating = f" ⭐️ {row['rating']}" if row["rating"] is not None else ""
+        lines.append(f"{number}. <a href='{row['url']}'>{html.escape(row['title'], quote=False)} ({year})</a>{rating}")
+    if not rows:
+        lines.append("Пока пусто")
+    return "\n".join(lines)
+
+
+def parse_command(text: str) -> tuple[str, list[str]]:
+    """'/top@bot сериалы' -> ('top', ['сериалы'])"""
+    if not text or not text.startswith("/"):
+        return "", []
+    command, *args = text.split()
+    return command[1:].split("@")[0].lower(), args
+
+
+class CommandBot:
+    """
+    Отвечает на команды /new, /top, /upcoming в личке и в канале.
+    Получает сообщения через long polling getUpdates, ответы собираются только из MovieCache.
+    """
+
+    def __init__(self, cache: MovieCache, poll_timeout: int = BOT_POLL_TIMEOUT, limit: int = BOT_REPLY_LIMIT):
+        self.cache = cache
+        self.poll_timeout = poll_timeout
+        self.limit = limit
+        self.offset = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.handlers = {
+            "new": self.command_new,
+            "top": self.command_top,
+            "upcoming": self.command_upcoming,
+            "start": self.command_help,
+            "help": self.command_help,
+        }
+
+    def categories(self, args: list[str]) -> list[str]:
+        """Категории из аргумента команды, без аргумента - все"""
+        if not args:
+            return list(CATEGORY_URLS)
+        wanted = args[0].lower()
+        return [category for category in CATEGORY_URLS if category.lower().startswith(wanted)] or list(CATEGORY_URLS)
+
+    def command_new(self, args: list[str]) -> str:
+        return "\n\n".join(
+            format_rows(category, self.cache.new(category, days=BOT_NEW_DAYS, limit=self.limit))
+            for category in self.categories(args)
+        )
+
+    def command_top(self, args: list[str]) -> str:
+        return "\n\n".join(
+            format_rows(category, self.cache.top(category, limit=self.limit))
+            for category in self.categories(args)
+        )
+
+    def command_upcoming(self, args: list[str]) -> str:
+        return "\n\n".join(
+            format_rows(category, self.cache.upcoming(category, limit=self.limit))
+            for category in self.categories(args)
+        )
+
+    def command_help(self, args: list[str]) -> str:
+        return HELP_TEXT
+
+    def handle_update(self, update: dict) -> bool:
+        """Отвечает на одно обновление. :return: True, если это была известная команда"""
+        post = update.get("message") or update.get("channel_post")
+        if not post:
+            return False
+        command, args = parse_command(post.get("text"))
+        handler = self.handlers.get(command)
+        if not handler:
+            return False
+
+        started = time.perf_counter()
+        text = handler(args)
+        metrics.observe("bot.command_seconds", time.perf_counter() - started)
+        self.reply(post["chat"]["id"], post.get("message_id"), text)
+        return True
+
+    def reply(self, chat_id, message_id, text: str):
+        data = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": "true",
+        }
+        if message_id:
+            data["reply_to_message_id"] = message_id
+        response = requests.post(message.api_url("sendMessage"), data=data, timeout=message.REPORT_REQUEST_TIMEOUT)
+        if not response.ok:
+            logger.warning(f"Ответ на команду не отправлен. Код статуса: {response.status_code}: {response.text}")
+
+    def poll_once(self) -> int:
+        """Один запрос getUpdates. :return: Число полученных обновлений"""
+        params = {"timeout": self.poll_timeout, "allowed_updates": '["message", "channel_post"]'}
+        if self.offset is not None:
+            params["offset"] = self.offset
+        response = requests.get(message.api_url("getUpdates"), params=params, timeout=self.poll_timeout + 10)
+        response.raise_for_status()
+        updates = response.json().get("result", [])
+        for update in updates:
+            self.offset = update["update_id"] + 1
+            try:
+                self.handle_update(update)
+            except Exception as e:
+                message.send_report(f"Ошибка обработки команды: {e}")
+        return len(updates)
+
+    def run(self):
+        logger.info("Бот команд запущен")
+        while not self.stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"getUpdates не удался: {e}")
+                self.stop_event.wait(5)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="command-bot", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.poll_timeout + 10)
@@ -0,0 +1,163 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+
+from database import DatabaseRepository
+from dictionaries import CATEGORY_URLS
+
+# Колонки, нужные для ответов на команды. Описания не храним - они длинные и в ответах не нужны
+CACHE_COLUMNS = ["id", "title", "title_original", "year_start", "year_end", "rating", "url", "date_now"]
+# Фильтры, по которым изменённые строки можно найти в кэше без запроса к бд
+CACHE_KEYS = ("id", "url")
+
+
+class MovieCache:
+    """
+    Копия таблиц категорий в памяти процесса для ответов на команды бота.
+    Загружается один раз, дальше обновляется по уведомлениям репозитория о записи:
+    изменения по id/url применяются к кэшу на месте, остальные помечают категорию для перезагрузки.
+    """
+
+    def __init__(self, repository: DatabaseRepository, categories: list[str] = None):
+        self.repository = repository
+        self.categories = list(categories or CATEGORY_URLS)
+        self.rows: dict[str, dict[str, dict]] = {category: {} for category in self.categories}
+        self.dirty: set[str] = set(self.categories)
+        self.pending: dict[str, list[dict]] = {category: [] for category in self.categories}
+        self.lock = threading.RLock()
+        repository.add_write_listener(self.on_write)
+
+    def load(self):
+        """Загружает все категории, которые ещё не загружены или помечены для перезагрузки"""
+        with self.lock:
+            for category in list(self.dirty):
+                self._reload(category)
+
+    def _reload(self, category: str):
+        rows = {}
+        if self.repository.table_exists(category):
+            for row in self.repository.iter_table(table_name=category, columns=CACHE_COLUMNS):
+                rows[row["url"]] = dict(row)
+        self.rows[category] = rows
+        self.pending[category] = []
+        self.dirty.discard(category)
+        logger.debug(f"Кэш {category} загружен: {len(rows)} строк")
+
+    def _refresh(self, category: str):
+        """Дочитывает из бд строки, которые нельзя было обновить по уведомлению"""
+        if category in self.dirty:
+            self._reload(category)
+            return
+        pending, self.pending[category] = self.pending[category], []
+        for data in pending:
+            self._remove(category, data)
+            for row in self.repository.iter_table(table_name=category, data=data, columns=CACHE_COLUMNS):
+                self.rows[category][row["url"]] = dict(row)
+
+    @staticmethod
+    def addressable(data: dict) -> bool:
+        """Фильтр выбирает строки только по id/url через = или IN"""
+        if not data or not set(data) <= set(CACHE_KEYS):
+            return False
+        return all(
+            not isinstance(condition, tuple) or condition[0].strip().upper() in ("=", "IN")
+            for condition in data.values()
+        )
+
+    @staticmethod
+    def _matches(row: dict, data: dict) -> bool:
+        for key, condition in data.items():
+            if isinstance(condition, tuple):
+                op, expected = condition
+                if op.strip().upper() == "IN":
+                    if row.get(key) not in expected:
+                        return False
+                    continue
+                condition = expected
+            if row.get(key) != condition:
+                return False
+        return True
+
+    def _remove(self, category: str, data: dict):
+        rows = self.rows[category]
+        for url in [url for url, row in rows.items() if self._matches(row, data)]:
+            del rows[url]
+
+    def on_write(self, table_name: str, data: dict, updates: dict = None, deleted: bool = False):
+        """
+        Обработчик DatabaseRepository.add_write_listener. Вызывается в потоке записи,
+        поэтому только обновляет словари в памяти и не ходит в бд.
+        """
+
+        if table_name not in self.rows:
+            return
+        with self.lock:
+            if table_name in self.dirty:
+                return
+            if not self.addressable(data):
+                self.dirty.add(table_name)
+            elif deleted:
+                self._remove(table_name, data)
+            elif updates and "url" in updates and set(data) == {"id"}:
+                # Новая строка: id пришёл из RETURNING, остальное - вставленные значения
+                row = {column: updates.get(column) for column in CACHE_COLUMNS}
+                row.update(data)
+                self.rows[table_name][row["url"]] = row
+            elif updates:
+                changes = {key: value for key, value in updates.items() if key in CACHE_COLUMNS}
+                if "url" in changes:
+                    self.pending[table_name].append(data)
+                    return
+                for row in self.rows[table_name].values():
+                    if self._matches(row, data):
+                        row.update(changes)
+            else:
+                # Строки появились без значений (например, возвращены из архива) - дочитаем при запросе
+                self.pending[table_name].append(data)
+
+    def select(self, category: str, where=None, sort_key=None, reverse: bool = False, limit: int = None) -> list[dict]:
+        """
+        Строки категории из кэша.
+        :param where: Функция-фильтр по строке.
+        :param sort_key: Ключ сортировки, строки с None в ключе отбрасываются.
+        """
+
+        with self.lock:
+            self._refresh(category)
+            rows = [dict(row) for row in self.rows[category].values() if where is None or where(row)]
+        if sort_key:
+            rows = [row for row in rows if sort_key(row) is not None]
+            rows.sort(key=sort_key, reverse=reverse)
+        return rows[:limit] if limit else rows
+
+    def new(self, category: str, days: int = 7, limit: int = 10) -> list[dict]:
+        """Вышедшие за последние days дней, сначала самые свежие"""
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        return self.select(
+            category,
+            where=lambda row: row["date_now"] is not None and row["date_now"] >= since,
+            sort_key=lambda row: row["date_now"],
+            reverse=True,
+            limit=limit
+        )
+
+    def top(self, category: str, limit: int = 10) -> list[dict]:
+        """Вышедшие с самым высоким рейтингом"""
+        return self.select(
+            category,
+            where=lambda row: row["date_now"] is not None,
+            sort_key=lambda row: row["rating"],
+            reverse=True,
+            limit=limit
+        )
+
+    def upcoming(self, category: str, limit: int = 10) -> list[dict]:
+        """Ещё не вышедшие с самым высоким рейтингом"""
+        return self.select(
+            category,
+            where=lambda row: row["date_now"] is None,
+            sort_key=lambda row: row["rating"],
+            reverse=True,
+            limit=limit
+        )
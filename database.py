@@ -1,12 +1,60 @@
+import copy
+import csv
+import inspect
+import io
+import json
+import operator
 import os
+import queue
+import re
+import select
+import sqlite3
+import threading
 import time
+import uuid
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from functools import lru_cache, wraps
+from itertools import count
+from typing import Iterator
 
 import psycopg2
 from loguru import logger
 from psycopg2.extras import DictCursor
 
 import message
+from journal import DB_JOURNAL_PATH, DEFERRED, WriteJournal
+from metrics import metrics
+
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "imdb_bot.sqlite3")
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", 500))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 3))  # секунд на одну попытку подключения
+DB_RETRY_INTERVAL = int(os.getenv("DB_RETRY_INTERVAL", 10))  # секунд между попытками, пока бд недоступна
+UOW_COMMIT_EVERY = int(os.getenv("UOW_COMMIT_EVERY", 200))  # записей в одной транзакции unit_of_work
+UOW_MAX_AGE = float(os.getenv("UOW_MAX_AGE", 30))  # сек, дольше строки транзакции не держатся заблокированными
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", 0.3))  # порог word_similarity для поиска по названию
+SEARCH_COLUMNS = ["title", "title_original"]
+
+MOVIE_SCHEMA = {
+    "id": "SERIAL PRIMARY KEY",
+    "title": "TEXT NOT NULL",
+    "title_original": "TEXT",
+    "year_start": "INT",
+    "year_end": "INT",
+    "categories": "TEXT[]",
+    "rating": "FLOAT",
+    "description": "TEXT",
+    "countries": "TEXT[]",
+    "url": "TEXT",
+    "date_now": "TIMESTAMPTZ",
+    "last_seen": "TIMESTAMPTZ DEFAULT now()",  # последний раз в чарте
+}
+
+
+class DatabaseUnavailable(Exception):
+    """Бд недоступна, следующая попытка подключения ещё не наступила"""
 
 
 class DatabaseConnection(ABC):
@@ -23,13 +71,13 @@ class DatabaseConnection(ABC):
     def connect(self):
         """
         Устанавливает соединение с базой данных.
-        В случае неудачи пытается восстановить соединение.
+        В случае неудачи не блокирует: следующая попытка будет при обращении к бд.
         """
 
         pass
 
     @abstractmethod
-    def reconnect(self, retries: int = 15, delay: int = 2):
+    def reconnect(self, retries: int = 1, delay: int = 0):
         """
         Восстанавливает соединение с базой данных.
 
@@ -45,8 +93,12 @@ class DatabaseConnection(ABC):
         pass
 
     @abstractmethod
-    def cursor(self):
-        """Курсор для работы с бд"""
+    def cursor(self, name: str = None):
+        """
+        Курсор для работы с бд
+        :param name: Имя серверного курсора. Если указано, строки читаются порциями.
+        """
+
         pass
 
 
@@ -54,13 +106,89 @@ class DatabaseRepository:
     """Общий класс для работы с данными"""
     def __init__(self, db_connection: DatabaseConnection):
         self.db_connection = db_connection
+        self.write_listeners = []
+        self.channel_queues: dict[str, list[queue.Queue]] = {}
+        self._channels_lock = threading.Lock()
+
+    def add_write_listener(self, listener):
+        """
+        Подписывает на изменения данных.
+        :param listener: Функция (table_name, data, updates, deleted), где data - фильтры изменённых строк,
+                         updates - новые значения колонок, deleted - строки удалены.
+        """
+
+        self.write_listeners.append(listener)
+
+    def notify_write(self, table_name: str, data: dict, updates: dict = None, deleted: bool = False):
+        for listener in self.write_listeners:
+            try:
+                listener(table_name, data, updates, deleted)
+            except Exception as e:
+                logger.warning(f"Ошибка подписчика на изменения {table_name}: {e}")
+
+    def available(self) -> bool:
+        """Бд доступна и отложенные записи (если были) уже применены"""
+        return True
+
+    def notify(self, channel: str, payload: str = ""):
+        """Сообщает слушателям канала о событии. Без PostgreSQL слушатели - только в этом процессе"""
+        with self._channels_lock:
+            queues = list(self.channel_queues.get(channel, []))
+        for channel_queue in queues:
+            channel_queue.put(payload)
+
+    def listen(self, channel: str, timeout: float) -> Iterator[str | None]:
+        """
+        Бесконечно ждёт событий канала.
+        :param timeout: Через сколько секунд без событий отдавать None, чтобы слушатель мог заняться своими делами.
+        :return: payload события, None по таймауту или "" - события могли быть пропущены (переподключение).
+        """
+
+        channel_queue = queue.Queue()
+        with self._channels_lock:
+            self.channel_queues.setdefault(channel, []).append(channel_queue)
+        try:
+            while True:
+                try:
+                    yield channel_queue.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+        finally:
+            with self._channels_lock:
+                self.channel_queues[channel].remove(channel_queue)
+
+    @contextmanager
+    def unit_of_work(self, name: str, commit_every: int = UOW_COMMIT_EVERY, max_age: float = UOW_MAX_AGE):
+        """
+        Группирует записи блока (задачи или пачки) в общие транзакции вместо фиксации каждой.
+        Бэкенды без такой поддержки выполняют блок как есть.
+        :param name: Имя задачи для логов и метрик db.commits.<name>.
+        """
+
+        yield None
+
+    def defer(self, func_name: str, **kwargs):
+        """
+        Вызывает функцию, зарегистрированную через journal.deferrable. Если бд недоступна,
+        вызов сохраняется в журнал и повторяется после восстановления подключения.
+        """
+
+        DEFERRED[func_name](**kwargs)
+
+    def flush_journal(self) -> int:
+        """Применяет отложенные записи. :return: Число применённых записей"""
+        return 0
 
     def table_exists(self, table_name: str) -> bool:
         """Проверяет, существует ли таблица с заданным именем"""
         pass
 
-    def create_table(self, table_name: str):
-        """Создаёт таблицу, если она ещё не существует"""
+    def create_table(self, table_name: str, schema: dict = None):
+        """
+        Создаёт таблицу, если она ещё не существует
+        :param schema: Словарь вида {col_name: col_type}, по умолчанию MOVIE_SCHEMA.
+        """
+
         pass
 
     def add_into_table(self, table_name: str, data: dict):
@@ -77,34 +205,110 @@ class DatabaseRepository:
         """
         Удаляет записи из таблицы по заданным фильтрам.
         :param table_name: Название таблицы.
-        :param data: Словарь фильтров вида {col_name: value}.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
         :return: Число удалённых строк.
         """
 
         pass
 
-    def get_table(self, table_name: str, data: dict = None, sort_by: str = None):
+    def get_table(self, table_name: str, data: dict = None, sort_by: str = None, columns: list[str] = None):
         """
         Получает данные из таблицы с опциональными фильтрами и сортировкой.
         :param table_name: Название таблицы.
         :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
         :param sort_by: Строка сортировки (например, "id ASC").
+        :param columns: Список нужных колонок, по умолчанию все.
         :return: Список строк в виде словарей.
         """
 
         pass
 
+    def iter_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        columns: list[str] = None,
+        batch_size: int = DB_BATCH_SIZE
+    ) -> Iterator[dict]:
+        """
+        Построчно читает данные из таблицы, не загружая их в память целиком.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param columns: Список нужных колонок, по умолчанию все.
+        :param batch_size: Сколько строк забирать с сервера за один раз.
+        """
+
+        pass
+
+    def move_rows(self, table_name: str, target_table: str, data: dict, columns: list[str] = None) -> int:
+        """
+        Переносит записи в другую таблицу.
+        :param table_name: Откуда переносить.
+        :param target_table: Куда переносить (с теми же колонками).
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param columns: Переносимые колонки, по умолчанию колонки MOVIE_SCHEMA.
+        :return: Число перенесённых строк.
+        """
+
+        pass
+
+    def copy_into_table(self, table_name: str, columns: list[str], rows: list[tuple]) -> int:
+        """
+        Массово добавляет строки одним потоком (COPY).
+        :param table_name: Название таблицы.
+        :param columns: Колонки в порядке значений в строках.
+        :param rows: Список кортежей значений.
+        :return: Число добавленных строк.
+        """
+
+        pass
+
+    def create_index(self, table_name: str, columns: list[str], method: str = "btree", where: str = None):
+        """
+        Создаёт индекс, если его ещё нет.
+        :param columns: Индексируемые колонки (или выражения).
+        :param method: Тип индекса (btree, brin, gin...).
+        :param where: Условие частичного индекса.
+        """
+
+        pass
+
     def update_table(self, table_name: str, data: dict, updates: dict):
         """
         Обновляет записи в таблице по заданным фильтрам.
         :param table_name: Название таблицы.
-        :param data: Словарь фильтров вида {col_name: value}.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
         :param updates: Словарь обновляемых данных вида {col_name: value}.
         :return: Число изменённых строк.
         """
 
         pass
 
+    def create_search_index(self, table_name: str):
+        """Создаёт индекс для нечёткого поиска по title и title_original"""
+        pass
+
+    def search_titles(
+        self,
+        table_names: list[str],
+        query: str,
+        limit: int = 10,
+        columns: list[str] = None,
+        min_similarity: float = SEARCH_MIN_SIMILARITY
+    ) -> list[dict]:
+        """
+        Нечёткий поиск по названию (в т.ч. с опечатками) сразу в нескольких таблицах.
+        :param table_names: Таблицы категорий.
+        :param query: Строка поиска.
+        :param columns: Возвращаемые колонки, по умолчанию все.
+        :param min_similarity: Минимальная похожесть (0..1) на title или title_original.
+        :return: Строки по убыванию похожести с колонками category (таблица) и score.
+        """
+
+        pass
+
 
 class PostgreSQLConnection(DatabaseConnection):
     """Класс для работы с базой данных PostgreSQL"""
@@ -123,6 +327,8 @@ class PostgreSQLConnection(DatabaseConnection):
         self.db_password = db_password or os.getenv("DB_PASSWORD")
         self.db_port = db_port or os.getenv("DB_PORT")
         self.db_name = db_name or os.getenv("DB_NAME")
+        self.down_since = None  # time.monotonic() начала простоя
+        self.retry_at = 0.0  # time.monotonic() следующей попытки подключения
 
         self.connect()
 
@@ -133,29 +339,30 @@ class PostgreSQLConnection(DatabaseConnection):
             user=self.db_user,
             password=self.db_password,
             port=self.db_port,
-            dbname=self.db_name
+            dbname=self.db_name,
+            connect_timeout=DB_CONNECT_TIMEOUT
         )
 
     def connect(self):
         """
         Устанавливает соединение с базой данных.
-        В случае неудачи пытается восстановить соединение.
+        Если бд недоступна, не блокирует запуск: следующая попытка будет при обращении к бд.
         """
 
         try:
-            self.connection = self.create_connection()
-            self.connection.autocommit = True
+            self.reconnect()
             logger.success(f"Успешное подключение к базе данных {self.db_name}")
-        except Exception as e:
+        except DatabaseUnavailable as e:
             logger.warning(f"Ошибка подключения к базе данных {self.db_name}: {e}")
-            self.reconnect()
 
-    def reconnect(self, retries: int = 15, delay: int = 2):
+    def reconnect(self, retries: int = 1, delay: int = 0):
         """
         Восстанавливает соединение с базой данных.
+        Пока бд недоступна, вызывающий код не ждёт: после неудачи попытки повторяются не чаще DB_RETRY_INTERVAL.
 
         :param retries: число попыток переподключения
         :param delay: задержка между попытками (в секундах)
+        :raises DatabaseUnavailable: если подключиться не удалось.
         """
 
         if self.connection:
@@ -163,43 +370,462 @@ class PostgreSQLConnection(DatabaseConnection):
                 self.connection.close()
             except Exception as close_error:
                 logger.warning(f"Ошибка при закрытии старого соединения: {close_error}")
+            self.connection = None
 
+        error = None
         for attempt in range(1, retries + 1):
             try:
                 self.connection = self.create_connection()
                 self.connection.autocommit = True
-                logger.info("Подключение к базе данных восстановлено")
+                if self.down_since is not None:
+                    logger.info(f"Подключение к базе данных восстановлено через {time.monotonic() - self.down_since:.0f} сек")
+                self.down_since = None
                 return  # Успешное подключение – выходим из метода
             except Exception as e:
+                error = e
                 logger.warning(f"Попытка {attempt} из {retries} не удалась: {e}")
-                time.sleep(delay)
+                if attempt < retries:
+                    time.sleep(delay)
 
-        # Если все попытки не удались, отправляем отчёт об ошибке
-        message.send_report(f"Не удалось восстановить соединение с базой данных после {retries} попыток.")
+        self.retry_at = time.monotonic() + DB_RETRY_INTERVAL
+        if self.down_since is None:
+            self.down_since = time.monotonic()
+            # Отчёт один раз на весь простой
+            message.send_report(f"База данных недоступна, записи откладываются в журнал: {error}")
+        raise DatabaseUnavailable(str(error))
 
     def ensure_connection(self):
-        """Проверяет активность соединения с базой данных и восстанавливает его при необходимости"""
-        if self.connection is None or self.connection.closed:
-            self.reconnect()
-        else:
+        """
+        Проверяет активность соединения с базой данных и восстанавливает его при необходимости.
+        :raises DatabaseUnavailable: если бд недоступна.
+        """
+
+        if self.connection is not None and not self.connection.closed:
             try:
                 with self.connection.cursor() as cursor:
                     cursor.execute("SELECT 1")
+                return
             except Exception as e:
                 logger.warning(f"Соединение с базой данных потеряно: {e}")
-                self.reconnect()
+        elif time.monotonic() < self.retry_at:
+            raise DatabaseUnavailable("ожидание следующей попытки подключения")
+        self.reconnect()
+
+    def cursor(self, name: str = None):
+        """
+        Курсор для работы с бд
+        :param name: Имя серверного курсора. Если указано, строки читаются порциями.
+        """
 
-    def cursor(self):
-        """Курсор для работы с бд"""
         self.ensure_connection()
+        if name:
+            # WITH HOLD позволяет использовать именованный курсор в режиме autocommit
+            return self.connection.cursor(name=name, cursor_factory=DictCursor, withhold=True)
+        return self.connection.cursor(cursor_factory=DictCursor)
+
+
+def copy_value(value):
+    """Значение для COPY ... WITH (FORMAT csv): список - литералом массива PostgreSQL"""
+    if isinstance(value, list):
+        items = (
+            "NULL" if item is None else '"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"'
+            for item in value
+        )
+        return "{" + ",".join(items) + "}"
+    return value
+
+
+# Ошибки, при которых запись откладывается в журнал, а не теряется
+UNAVAILABLE_ERRORS = (DatabaseUnavailable, psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class UnitOfWork:
+    """
+    Транзакция unit_of_work на отдельном соединении. Каждая запись выполняется в своей точке
+    сохранения: ошибка в одной строке откатывает только её. Транзакция фиксируется
+    каждые commit_every записей или max_age секунд и в конце блока.
+    Для методов репозитория подменяет PostgreSQLConnection (cursor, connection, ensure_connection).
+    """
+
+    def __init__(self, name: str, connection, commit_every: int, max_age: float):
+        self.name = name
+        self.connection = connection
+        self.commit_every = commit_every
+        self.max_age = max_age
+        self.calls: list[tuple] = []  # незафиксированные записи - для журнала, если соединение пропадёт
+        self.notifications: list[tuple] = []  # notify_write до фиксации: подписчики прочитают только зафиксированное
+        self.broken = False
+        self.writes = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.depth = 0
+        self.started = time.monotonic()
+        self._savepoints = count(1)
+
+    def cursor(self, name: str = None):
+        if name:
+            # WITH HOLD: iter_table продолжает читать после промежуточной фиксации транзакции
+            return self.connection.cursor(name=name, cursor_factory=DictCursor, withhold=True)
         return self.connection.cursor(cursor_factory=DictCursor)
 
+    def ensure_connection(self):
+        if self.connection.closed:
+            raise psycopg2.InterfaceError("соединение транзакции закрыто")
+
+    @contextmanager
+    def savepoint(self):
+        name = f"uow_{next(self._savepoints)}"
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SAVEPOINT {name}")
+        notified = len(self.notifications)
+        self.depth += 1
+        try:
+            yield
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            del self.notifications[notified:]
+            self.rollbacks += 1
+            raise
+        else:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"RELEASE SAVEPOINT {name}")
+        finally:
+            self.depth -= 1
+
+    def written(self, method_name: str, args: tuple, kwargs: dict):
+        self.calls.append((method_name, args, kwargs))
+        self.writes += 1
+
+    def due(self) -> bool:
+        """Пора фиксировать: набралось commit_every записей или транзакция идёт дольше max_age"""
+        return self.depth == 0 and self.calls and (
+            len(self.calls) >= self.commit_every or time.monotonic() - self.started >= self.max_age
+        )
+
+    def commit(self):
+        if self.calls:
+            self.connection.commit()
+            self.commits += 1
+        self.calls = []
+        self.started = time.monotonic()
+
+
+def journaled(default=None):
+    """
+    Запись в бд, которую можно отложить: пока бд недоступна, вызов сохраняется в журнал
+    и возвращается default. Перед записью применяются ранее отложенные, чтобы не нарушить порядок.
+    Внутри unit_of_work запись выполняется в точке сохранения открытой транзакции.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            unit = self.current_unit()
+            if unit is not None and not self.replaying():
+                return self.write_in_unit(unit, method, default, args, kwargs)
+            if self.journal is None or self.replaying():
+                return method(self, *args, **kwargs)
+            try:
+                self.flush_journal()
+                return method(self, *args, **kwargs)
+            except UNAVAILABLE_ERRORS as e:
+                self.journal.append(method.__name__, args, kwargs)
+                logger.warning(f"Бд недоступна, {method.__name__} отложен (в журнале {len(self.journal)}): {e}")
+                return default
+        return wrapper
+    return decorator
+
+
+def synced(method):
+    """Чтение из бд: сначала применяются отложенные записи, иначе результат будет устаревшим"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        unit = self.current_unit()
+        if unit is not None and not inspect.isgeneratorfunction(method):
+            # Ошибка запроса не должна прерывать всю транзакцию
+            try:
+                with unit.savepoint():
+                    return method(self, *args, **kwargs)
+            except UNAVAILABLE_ERRORS as e:
+                self.lose_unit(unit, e)
+                raise
+        if unit is None and self.journal is not None and not self.replaying():
+            self.flush_journal()
+        return method(self, *args, **kwargs)
+    return wrapper
+
 
 class PostgreSQLDatabaseRepository(DatabaseRepository):
     """Класс для работы с данными в PostgreSQL"""
-    def __init__(self, db_connection: DatabaseConnection):
+    def __init__(self, db_connection: DatabaseConnection, journal: WriteJournal = None):
         super().__init__(db_connection)
+        self.journal = journal
+        self._journal_lock = threading.RLock()
+        self._replay_thread = None  # поток, который сейчас воспроизводит журнал
+        self._units = threading.local()
 
+    @property
+    def db_connection(self):
+        """Соединение текущего потока: транзакция unit_of_work, если она открыта, иначе общее"""
+        unit = self.current_unit()
+        return unit if unit is not None else self._db_connection
+
+    @db_connection.setter
+    def db_connection(self, value):
+        self._db_connection = value
+
+    def current_unit(self) -> UnitOfWork | None:
+        unit = getattr(self._units, "unit", None)
+        return unit if unit is not None and not unit.broken else None
+
+    def commit(self):
+        """Фиксирует запись. Внутри unit_of_work фиксацию делает сама транзакция"""
+        if self.current_unit() is None:
+            self.db_connection.connection.commit()
+
+    def replaying(self) -> bool:
+        return self._replay_thread == threading.get_ident()
+
+    @contextmanager
+    def unit_of_work(self, name: str, commit_every: int = UOW_COMMIT_EVERY, max_age: float = UOW_MAX_AGE):
+        """
+        Записи блока в этом потоке идут в общие транзакции на отдельном соединении,
+        каждая - в своей точке сохранения. Записи, прошедшие свою точку сохранения,
+        фиксируются и при исключении в блоке. Если соединение пропало, незафиксированные
+        записи переносятся в журнал. Вложенный unit_of_work становится частью внешнего.
+        """
+
+        if getattr(self._units, "unit", None) is not None:
+            yield self._units.unit
+            return
+        try:
+            self.flush_journal()  # Отложенные записи должны лечь раньше новых
+            self._db_connection.ensure_connection()
+            connection = self._db_connection.create_connection()
+        except UNAVAILABLE_ERRORS as e:
+            logger.warning(f"{name}: транзакция не открыта, записи пойдут по одной: {e}")
+            yield None
+            return
+
+        unit = UnitOfWork(name, connection, commit_every, max_age)
+        self._units.unit = unit
+        try:
+            yield unit
+        finally:
+            self._units.unit = None
+            if not unit.broken:
+                try:
+                    self.commit_unit(unit)
+                except UNAVAILABLE_ERRORS as e:
+                    self.lose_unit(unit, e)
+            connection.close()
+            metrics.incr(f"db.writes.{name}", unit.writes)
+            metrics.incr(f"db.commits.{name}", unit.commits)
+            logger.info(
+                f"{name}: записей {unit.writes}, коммитов {unit.commits}, "
+                f"откатов до точки сохранения {unit.rollbacks}"
+            )
+
+    def notify(self, channel: str, payload: str = ""):
+        """
+        NOTIFY для слушателей канала в любом процессе. Внутри unit_of_work событие уходит
+        вместе с фиксацией транзакции, поэтому транзакция фиксируется сразу.
+        Если бд недоступна, событие теряется: его заменит плановый запуск.
+        """
+
+        unit = self.current_unit()
+        try:
+            if unit is None:
+                with self.db_connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+                return
+            with unit.savepoint():
+                with unit.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+            if unit.depth == 0:
+                self.commit_unit(unit)
+        except UNAVAILABLE_ERRORS as e:
+            if unit is not None:
+                self.lose_unit(unit, e)
+            logger.warning(f"Событие {channel} не отправлено: {e}")
+
+    def listen(self, channel: str, timeout: float) -> Iterator[str | None]:
+        """
+        LISTEN на отдельном соединении. После потери соединения переподключается
+        не чаще DB_RETRY_INTERVAL и отдаёт "" - события за время простоя могли быть пропущены.
+        """
+
+        reconnected = False
+        while True:
+            connection = None
+            try:
+                connection = self._db_connection.create_connection()
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {channel}")
+                logger.info(f"Слушаю события {channel}")
+                if reconnected:
+                    yield ""
+                while True:
+                    if select.select([connection], [], [], timeout) == ([], [], []):
+                        yield None
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        yield connection.notifies.pop(0).payload
+            except UNAVAILABLE_ERRORS as e:
+                logger.warning(f"Соединение для событий {channel} потеряно: {e}")
+            finally:
+                if connection is not None and not connection.closed:
+                    connection.close()
+            reconnected = True
+            time.sleep(DB_RETRY_INTERVAL)
+            yield None
+
+    def write_in_unit(self, unit: UnitOfWork, method, default, args: tuple, kwargs: dict):
+        try:
+            with unit.savepoint():
+                result = method(self, *args, **kwargs)
+            unit.written(method.__name__, args, kwargs)
+            if unit.due():
+                self.commit_unit(unit)
+            return result
+        except UNAVAILABLE_ERRORS as e:
+            self.lose_unit(unit, e)
+            if self.journal is None:
+                raise
+        self.journal.append(method.__name__, args, kwargs)
+        return default
+
+    def notify_write(self, table_name: str, data: dict, updates: dict = None, deleted: bool = False):
+        """Внутри unit_of_work подписчики узнают об изменении после фиксации транзакции"""
+        unit = self.current_unit()
+        if unit is not None:
+            unit.notifications.append((table_name, data, updates, deleted))
+            return
+        super().notify_write(table_name, data, updates, deleted)
+
+    def commit_unit(self, unit: UnitOfWork):
+        unit.commit()
+        self.deliver_writes(unit)
+
+    def deliver_writes(self, unit: UnitOfWork):
+        """Сообщает подписчикам об изменениях, зафиксированных транзакцией"""
+        notifications, unit.notifications = unit.notifications, []
+        for table_name, data, updates, deleted in notifications:
+            super().notify_write(table_name, data, updates, deleted)
+
+    def lose_unit(self, unit: UnitOfWork, error):
+        """Соединение транзакции пропало: незафиксированные записи уходят в журнал, дальше - без транзакции"""
+        unit.broken = True
+        if self.journal is not None:
+            for method_name, args, kwargs in unit.calls:
+                self.journal.append(method_name, args, kwargs)
+            logger.warning(f"{unit.name}: транзакция прервана, в журнал перенесено записей {len(unit.calls)}: {error}")
+        elif unit.calls:
+            message.send_report(f"{unit.name}: транзакция прервана, потеряно записей {len(unit.calls)}: {error}")
+        # Перенесённые в журнал записи подписчики получат после воспроизведения
+        unit.calls = []
+        unit.notifications = []
+
+    def available(self) -> bool:
+        try:
+            self.flush_journal()
+            self.db_connection.ensure_connection()
+            return True
+        except UNAVAILABLE_ERRORS:
+            return False
+
+    def defer(self, func_name: str, **kwargs):
+        if self.journal is None or self.available():
+            DEFERRED[func_name](**kwargs)
+            return
+        self.journal.append(f"defer:{func_name}", (), kwargs)
+        logger.warning(f"Бд недоступна, {func_name} отложен (в журнале {len(self.journal)})")
+
+    def flush_journal(self) -> int:
+        """
+        Воспроизводит журнал по порядку на отдельном соединении. Ключ каждой записи сохраняется
+        в journal_applied в той же транзакции, что и сама запись, поэтому повтор после сбоя её не задублирует.
+        Запись с ошибкой в самих данных (нарушено ограничение, нет таблицы, исключение в отложенной функции)
+        переносится в journal_failed с отчётом, воспроизведение продолжается.
+        :raises DatabaseUnavailable: если бд всё ещё недоступна (журнал остаётся как есть).
+        """
+
+        if self.journal is None or not len(self.journal) or self.replaying() or self.current_unit() is not None:
+            return 0
+        with self._journal_lock:
+            if not len(self.journal):
+                return 0
+            self._db_connection.ensure_connection()
+            connection = self._db_connection.create_connection()
+            # Общее соединение остаётся в autocommit для остальных потоков
+            unit = UnitOfWork("journal", connection, commit_every=0, max_age=0)
+            self._units.unit = unit
+            self._replay_thread = threading.get_ident()
+            applied = failed = 0
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "CREATE TABLE IF NOT EXISTS journal_applied "
+                        "(key TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+                    )
+                connection.commit()
+                while entry := self.journal.first():
+                    try:
+                        self._apply(unit, entry)
+                    except UNAVAILABLE_ERRORS:
+                        raise
+                    except Exception as e:
+                        connection.rollback()
+                        unit.notifications = []
+                        self.journal.dead_letter(entry, e)
+                        failed += 1
+                        message.send_report(f"Отложенная запись {entry.method} не применена и перенесена в journal_failed: {e}")
+                        continue
+                    self.journal.ack(entry)
+                    applied += 1
+            finally:
+                self._units.unit = None
+                self._replay_thread = None
+                if not connection.closed:
+                    connection.close()
+                if applied or failed:
+                    logger.info(
+                        f"Применено отложенных записей: {applied}, с ошибкой: {failed}, "
+                        f"осталось в журнале: {len(self.journal)}"
+                    )
+            return applied
+
+    def _mark_applied(self, key: str) -> bool:
+        """:return: False, если запись с этим ключом уже применялась"""
+        with self.db_connection.cursor() as cursor:
+            cursor.execute("INSERT INTO journal_applied (key) VALUES (%s) ON CONFLICT DO NOTHING", (key,))
+            return cursor.rowcount == 1
+
+    def _apply(self, unit: UnitOfWork, entry):
+        """Применяет запись журнала и фиксирует её вместе с ключом (commit внутри методов в транзакции не срабатывает)"""
+        if entry.method.startswith("defer:"):
+            func_name = entry.method.removeprefix("defer:")
+            if func_name not in DEFERRED:
+                message.send_report(f"Отложенный вызов {func_name} не зарегистрирован и пропущен")
+                return
+            func = DEFERRED[func_name]
+            args = entry.args
+        else:
+            func = getattr(type(self), entry.method).__wrapped__
+            args = (self, *entry.args)
+
+        with unit.savepoint():
+            if self._mark_applied(entry.key):
+                func(*args, **entry.kwargs)
+        unit.connection.commit()
+        self.deliver_writes(unit)
+
+    @synced
     def table_exists(self, table_name: str) -> bool:
         """Проверяет, существует ли таблица с заданным именем"""
         with self.db_connection.cursor() as cursor:
@@ -209,29 +835,34 @@ class PostgreSQLDatabaseRepository(DatabaseRepository):
             result = cursor.fetchone()
             return result['exists']
 
-    def create_table(self, table_name: str):
-        """Создаёт таблицу, если она ещё не существует"""
+    @journaled()
+    def create_table(self, table_name: str, schema: dict = None):
+        """
+        Создаёт таблицу, если она ещё не существует
+        :param schema: Словарь вида {col_name: col_type}, по умолчанию MOVIE_SCHEMA.
+        """
+
+        schema = schema or MOVIE_SCHEMA
         with self.db_connection.cursor() as cursor:
             if not self.table_exists(table_name):
-                cursor.execute(f"""
-                    CREATE TABLE {table_name} 
-                    (
-                        id SERIAL PRIMARY KEY,
-                        title TEXT NOT NULL,
-                        title_original TEXT,
-                        year_start INT,
-                        year_end INT,
-                        categories TEXT[],
-                        rating FLOAT,
-                        description TEXT,
-                        countries TEXT[],
-                        url TEXT,
-                        date_now TIMESTAMPTZ
-                    )
-                """)
-                self.db_connection.connection.commit()
+                columns = ",\n".join(f"{name} {col_type}" for name, col_type in schema.items())
+                cursor.execute(f"CREATE TABLE {table_name} ({columns})")
+                self.commit()
                 logger.success(f"Таблица '{table_name}' создана")
+            else:
+                # Добавляем колонки, появившиеся в схеме после создания таблицы. ALTER TABLE берёт
+                # ACCESS EXCLUSIVE блокировку даже с IF NOT EXISTS, поэтому выполняется только для новых колонок
+                cursor.execute(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table_name,)
+                )
+                existing = {row["column_name"] for row in cursor.fetchall()}
+                missing = [name for name in schema if name not in existing]
+                for name in missing:
+                    cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {name} {schema[name]}")
+                if missing:
+                    self.commit()
 
+    @journaled()
     def add_into_table(self, table_name: str, data: dict) -> int:
         """
         Добавляет новую запись в таблицу.
@@ -251,16 +882,19 @@ class PostgreSQLDatabaseRepository(DatabaseRepository):
 
             query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders}) RETURNING id"
             cursor.execute(query, values)
-            self.db_connection.connection.commit()
+            self.commit()
 
             result = cursor.fetchone()
-            return result['id'] if result and 'id' in result else None
+            row_id = result['id'] if result and 'id' in result else None
+        self.notify_write(table_name, {"id": row_id}, data)
+        return row_id
 
+    @journaled(0)
     def delete_from_table(self, table_name: str, data: dict) -> int:
         """
         Удаляет записи из таблицы по заданным фильтрам.
         :param table_name: Название таблицы.
-        :param data: Словарь фильтров вида {col_name: value}.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
         :return: Число удалённых строк.
         """
 
@@ -269,20 +903,69 @@ class PostgreSQLDatabaseRepository(DatabaseRepository):
 
         with self.db_connection.cursor() as cursor:
             # Генерация частей SQL-запроса
-            where_clause = " AND ".join([f"{key} = %s" for key in data.keys()])
-            params = list(data.values())
+            where_clause, params = self.build_where(data)
 
-            query = f"DELETE FROM {table_name} WHERE {where_clause}"
+            query = f"DELETE FROM {table_name}{where_clause}"
             cursor.execute(query, params)
-            self.db_connection.connection.commit()
-            return cursor.rowcount
+            self.commit()
+            deleted = cursor.rowcount
+        self.notify_write(table_name, data, deleted=True)
+        return deleted
+
+    @staticmethod
+    def build_where(data: dict = None) -> tuple[str, list]:
+        """
+        Собирает WHERE из словаря фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :return: Текст условия (с ведущим " WHERE " или пустой) и список параметров.
+        """
+
+        if not data:
+            return "", []
+        filter_clauses = []
+        params = []
+        for key, condition in data.items():
+            if isinstance(condition, tuple):
+                operator, value = condition
+                if operator.strip().upper() == "NOT &&":
+                    # Нет общих элементов с массивом value; NULL считается пустым массивом
+                    filter_clauses.append(f"NOT COALESCE({key} && %s, FALSE)")
+                else:
+                    filter_clauses.append(f"{key} {operator} %s")
+                params.append(value)
+            elif condition is None:  # Обрабатываем фильтры с None как IS NULL
+                filter_clauses.append(f"{key} IS NULL")
+            else:
+                filter_clauses.append(f"{key} = %s")
+                params.append(condition)
+        return " WHERE " + " AND ".join(filter_clauses), params
+
+    @classmethod
+    def build_select(
+        cls,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        columns: list[str] = None
+    ) -> tuple[str, list]:
+        """
+        Собирает SELECT-запрос с фильтрами, сортировкой и проекцией колонок.
+        :return: Текст запроса и список параметров.
+        """
 
+        where_clause, params = cls.build_where(data)
+        order_by_clause = f" ORDER BY {sort_by}" if sort_by else ""
+        select_clause = ", ".join(columns) if columns else "*"
+
+        return f"SELECT {select_clause} FROM {table_name}{where_clause}{order_by_clause}", params
+
+    @synced
     def get_table(
         self,
         table_name: str,
         data: dict = None,
         sort_by: str = None,
-        fetchone: bool = True
+        fetchone: bool = True,
+        columns: list[str] = None
     ) -> dict | list[dict]:
         """
         Получает все данные из таблицы с опциональными фильтрами и сортировкой.
@@ -290,38 +973,114 @@ class PostgreSQLDatabaseRepository(DatabaseRepository):
         :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
         :param sort_by: Строка сортировки (например, "id ASC").
         :param fetchone: Вернуть лишь одно значение, False - вернуть список
+        :param columns: Список нужных колонок, по умолчанию все.
         """
 
         with self.db_connection.cursor() as cursor:
-            where_clause = ""
-            params = []
-            if data:
-                filter_clauses = []
-                for key, condition in data.items():
-                    if isinstance(condition, tuple):
-                        operator, value = condition
-                        filter_clauses.append(f"{key} {operator} %s")
-                        params.append(value)
-                    elif condition is None:  # Обрабатываем фильтры с None как IS NULL
-                        filter_clauses.append(f"{key} IS NULL")
-                    else:
-                        filter_clauses.append(f"{key} = %s")
-                        params.append(condition)
-                where_clause = " WHERE " + " AND ".join(filter_clauses)
-
-            order_by_clause = f" ORDER BY {sort_by}" if sort_by else ""
-
-            query = f"SELECT * FROM {table_name}{where_clause}{order_by_clause}"
+            query, params = self.build_select(table_name, data, sort_by, columns)
             cursor.execute(query, params)
             if fetchone:
                 return cursor.fetchone()
             return cursor.fetchall()
 
+    @synced
+    def iter_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        columns: list[str] = None,
+        batch_size: int = DB_BATCH_SIZE
+    ) -> Iterator[dict]:
+        """
+        Построчно читает данные из таблицы через серверный курсор,
+        не загружая их в память целиком.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param columns: Список нужных колонок, по умолчанию все.
+        :param batch_size: Сколько строк забирать с сервера за один раз.
+        """
+
+        query, params = self.build_select(table_name, data, sort_by, columns)
+        with self.db_connection.cursor(name=f"iter_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            yield from cursor
+
+    @journaled(0)
+    def copy_into_table(self, table_name: str, columns: list[str], rows: list[tuple]) -> int:
+        """
+        Массово добавляет строки одним потоком (COPY ... FROM STDIN).
+        :param table_name: Название таблицы.
+        :param columns: Колонки в порядке значений в строках.
+        :param rows: Список кортежей значений.
+        :return: Число добавленных строк.
+        """
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([copy_value(value) for value in row] for row in rows)
+        buffer.seek(0)
+        with self.db_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            self.commit()
+            copied = cursor.rowcount
+        self.notify_write(table_name, {}, {})
+        return copied
+
+    @journaled()
+    def create_index(self, table_name: str, columns: list[str], method: str = "btree", where: str = None):
+        """
+        Создаёт индекс, если его ещё нет.
+        :param columns: Индексируемые колонки (или выражения).
+        :param method: Тип индекса (btree, brin, gin...).
+        :param where: Условие частичного индекса.
+        """
+
+        suffix = "_".join("".join(ch for ch in column if ch.isalnum() or ch == "_") for column in columns)
+        index_name = f"{table_name}_{suffix}_{method}_idx"
+        where_clause = f" WHERE {where}" if where else ""
+        with self.db_connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} "
+                f"USING {method} ({', '.join(columns)}){where_clause}"
+            )
+            self.commit()
+
+    @journaled(0)
+    def move_rows(self, table_name: str, target_table: str, data: dict, columns: list[str] = None) -> int:
+        """
+        Переносит записи в другую таблицу одним запросом (DELETE ... RETURNING -> INSERT).
+        :param table_name: Откуда переносить.
+        :param target_table: Куда переносить (с теми же колонками).
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param columns: Переносимые колонки, по умолчанию колонки MOVIE_SCHEMA.
+        :return: Число перенесённых строк.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать фильтры для переноса.")
+
+        column_list = ", ".join(columns or MOVIE_SCHEMA)
+        with self.db_connection.cursor() as cursor:
+            where_clause, params = self.build_where(data)
+            query = (
+                f"WITH moved AS (DELETE FROM {table_name}{where_clause} RETURNING {column_list}) "
+                f"INSERT INTO {target_table} ({column_list}) SELECT {column_list} FROM moved"
+            )
+            cursor.execute(query, params)
+            self.commit()
+            moved = cursor.rowcount
+        self.notify_write(table_name, data, deleted=True)
+        self.notify_write(target_table, data, {})
+        return moved
+
+    @journaled(0)
     def update_table(self, table_name: str, data: dict, updates: dict) -> int:
         """
         Обновляет записи в таблице по заданным фильтрам.
         :param table_name: Название таблицы.
-        :param data: Словарь фильтров вида {col_name: value}.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
         :param updates: Словарь обновляемых данных вида {col_name: value}.
         :return: Число изменённых строк.
         """
@@ -332,18 +1091,791 @@ class PostgreSQLDatabaseRepository(DatabaseRepository):
         with self.db_connection.cursor() as cursor:
             # Генерация частей SQL-запроса
             set_clause = ", ".join([f"{key} = %s" for key in updates.keys()])
-            where_clause = " AND ".join([f"{key} = %s" for key in data.keys()])
+            where_clause, where_params = self.build_where(data)
 
-            query = f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}"
-            params = list(updates.values()) + list(data.values())
+            query = f"UPDATE {table_name} SET {set_clause}{where_clause}"
+            params = list(updates.values()) + where_params
 
             cursor.execute(query, params)
-            self.db_connection.connection.commit()
-            return cursor.rowcount
+            self.commit()
+            updated = cursor.rowcount
+        self.notify_write(table_name, data, updates)
+        return updated
+
+
+    @journaled()
+    def create_search_index(self, table_name: str):
+        """Триграммные GIN-индексы (pg_trgm) по title и title_original"""
+        with self.db_connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            self.commit()
+        for column in SEARCH_COLUMNS:
+            self.create_index(table_name=table_name, columns=[f"{column} gin_trgm_ops"], method="gin")
+
+    @synced
+    def search_titles(
+        self,
+        table_names: list[str],
+        query: str,
+        limit: int = 10,
+        columns: list[str] = None,
+        min_similarity: float = SEARCH_MIN_SIMILARITY
+    ) -> list[dict]:
+        """
+        Нечёткий поиск по названию (в т.ч. с опечатками) сразу в нескольких таблицах.
+        Оператор <% использует триграммные индексы из create_search_index.
+        :param table_names: Таблицы категорий.
+        :param query: Строка поиска.
+        :param columns: Возвращаемые колонки, по умолчанию все.
+        :param min_similarity: Минимальная похожесть (0..1) на title или title_original.
+        :return: Строки по убыванию похожести с колонками category (таблица) и score.
+        """
+
+        if not query.strip() or not table_names:
+            return []
+        select_clause = ", ".join(columns) if columns else "*"
+        parts, params = [], []
+        for table_name in table_names:
+            parts.append(
+                f"SELECT %s AS category, GREATEST(word_similarity(%s, title), word_similarity(%s, title_original)) "
+                f"AS score, {select_clause} FROM {table_name} WHERE %s <%% title OR %s <%% title_original"
+            )
+            params += [table_name, query, query, query, query]
+
+        def search(cursor) -> list[dict]:
+            # Порог действует до конца транзакции
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(min_similarity),))
+            cursor.execute(
+                f"SELECT * FROM ({' UNION ALL '.join(parts)}) AS matches ORDER BY score DESC LIMIT %s",
+                params + [limit]
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+        unit = self.current_unit()
+        if unit is not None:
+            with unit.cursor() as cursor:
+                return search(cursor)
+        # Общее соединение остаётся в autocommit для остальных потоков: транзакция - на отдельном соединении
+        self._db_connection.ensure_connection()
+        connection = self._db_connection.create_connection()
+        try:
+            with connection.cursor(cursor_factory=DictCursor) as cursor:
+                return search(cursor)
+        finally:
+            connection.close()
+
+
+@lru_cache(maxsize=200_000)
+def trigrams(text: str) -> frozenset[str]:
+    """Триграммы как в pg_trgm: слова в нижнем регистре, дополненные двумя пробелами слева и одним справа"""
+    result = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(result)
+
+
+def word_similarity(query: str, text: str) -> float:
+    """Доля триграмм запроса, найденных в тексте (приближение word_similarity из pg_trgm)"""
+    if not query or not text:
+        return 0.0
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return 0.0
+    return len(query_trigrams & trigrams(text)) / len(query_trigrams)
+
+
+class MemoryDatabaseRepository(DatabaseRepository):
+    """
+    Хранилище в памяти процесса с тем же интерфейсом, что и у PostgreSQL.
+    Используется для прогона конвейера без бд (replay.py, нагрузочные тесты).
+    """
+
+    OPERATORS = {
+        "=": operator.eq,
+        "!=": operator.ne,
+        "<>": operator.ne,
+        ">": operator.gt,
+        ">=": operator.ge,
+        "<": operator.lt,
+        "<=": operator.le,
+        "IN": lambda value, expected: value in expected,
+        "&&": lambda value, expected: not set(value).isdisjoint(expected),
+        "NOT &&": lambda value, expected: set(value or []).isdisjoint(expected),
+    }
+
+    def __init__(self, db_connection: DatabaseConnection = None):
+        super().__init__(db_connection)
+        self.tables: dict[str, list[dict]] = {}
+        self.columns: dict[str, list[str]] = {}
+        self.defaults: dict[str, dict] = {}
+        self._ids = count(1)
+
+    def table_exists(self, table_name: str) -> bool:
+        """Проверяет, существует ли таблица с заданным именем"""
+        return table_name in self.tables
+
+    def create_table(self, table_name: str, schema: dict = None):
+        """
+        Создаёт таблицу, если она ещё не существует
+        :param schema: Словарь вида {col_name: col_type}, по умолчанию MOVIE_SCHEMA.
+        """
+
+        schema = schema or MOVIE_SCHEMA
+        if not self.table_exists(table_name):
+            self.tables[table_name] = []
+            self.columns[table_name] = []
+            logger.success(f"Таблица '{table_name}' создана")
+        for name, col_type in schema.items():
+            if name not in self.columns[table_name]:
+                self.columns[table_name].append(name)
+            if "DEFAULT now()" in col_type:
+                self.defaults.setdefault(table_name, {})[name] = lambda: datetime.now(timezone.utc)
+
+    def _matches(self, row: dict, data: dict) -> bool:
+        for key, condition in (data or {}).items():
+            value = row.get(key)
+            if isinstance(condition, tuple):
+                op = condition[0].strip().upper()
+                # Как и в SQL, сравнение с NULL ложно (кроме NOT &&, см. build_where)
+                if value is None and op != "NOT &&" or not self.OPERATORS[op](value, condition[1]):
+                    return False
+            elif condition is None:
+                if value is not None:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def _select(self, table_name: str, data: dict = None, sort_by: str = None, columns: list[str] = None):
+        rows = [row for row in self.tables[table_name] if self._matches(row, data)]
+        if sort_by:
+            # Сортируем с конца, чтобы первый ключ оказался главным. NULL - в конце, как в PostgreSQL при ASC
+            for part in reversed([p.split() for p in sort_by.split(",")]):
+                key, desc = part[0], len(part) > 1 and part[1].upper() == "DESC"
+                present = [r for r in rows if r.get(key) is not None]
+                missing = [r for r in rows if r.get(key) is None]
+                present.sort(key=lambda r: r[key], reverse=desc)
+                rows = missing + present if desc else present + missing
+        keys = columns or self.columns[table_name]
+        return [{key: copy.copy(row.get(key)) for key in keys} for row in rows]
+
+    def add_into_table(self, table_name: str, data: dict) -> int:
+        """
+        Добавляет новую запись в таблицу.
+        :param table_name: Название таблицы.
+        :param data: Словарь вида {col_name: value}.
+        :return: ID.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать данные для вставки.")
+        row = {key: None for key in self.columns[table_name]}
+        row.update({key: default() for key, default in self.defaults.get(table_name, {}).items()})
+        row.update(copy.deepcopy(data))
+        row["id"] = next(self._ids)
+        self.tables[table_name].append(row)
+        self.notify_write(table_name, {"id": row["id"]}, data)
+        return row["id"]
+
+    def delete_from_table(self, table_name: str, data: dict) -> int:
+        """
+        Удаляет записи из таблицы по заданным фильтрам.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :return: Число удалённых строк.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать фильтры для удаления.")
+        rows = self.tables[table_name]
+        kept = [row for row in rows if not self._matches(row, data)]
+        self.tables[table_name] = kept
+        self.notify_write(table_name, data, deleted=True)
+        return len(rows) - len(kept)
+
+    def get_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        fetchone: bool = True,
+        columns: list[str] = None
+    ) -> dict | list[dict]:
+        """
+        Получает все данные из таблицы с опциональными фильтрами и сортировкой.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param fetchone: Вернуть лишь одно значение, False - вернуть список
+        :param columns: Список нужных колонок, по умолчанию все.
+        """
+
+        rows = self._select(table_name, data, sort_by, columns)
+        if fetchone:
+            return rows[0] if rows else None
+        return rows
+
+    def iter_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        columns: list[str] = None,
+        batch_size: int = DB_BATCH_SIZE
+    ) -> Iterator[dict]:
+        """
+        Построчно читает данные из таблицы.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param columns: Список нужных колонок, по умолчанию все.
+        :param batch_size: Не используется, оставлен для совместимости.
+        """
+
+        yield from self._select(table_name, data, sort_by, columns)
+
+    def copy_into_table(self, table_name: str, columns: list[str], rows: list[tuple]) -> int:
+        """
+        Массово добавляет строки.
+        :param table_name: Название таблицы.
+        :param columns: Колонки в порядке значений в строках.
+        :param rows: Список кортежей значений.
+        :return: Число добавленных строк.
+        """
+
+        for values in rows:
+            row = {key: None for key in self.columns[table_name]}
+            row.update(zip(columns, values))
+            self.tables[table_name].append(row)
+        self.notify_write(table_name, {}, {})
+        return len(rows)
+
+    def create_index(self, table_name: str, columns: list[str], method: str = "btree", where: str = None):
+        """Индексы в памяти не нужны"""
+        pass
+
+    def move_rows(self, table_name: str, target_table: str, data: dict, columns: list[str] = None) -> int:
+        """
+        Переносит записи в другую таблицу.
+        :param table_name: Откуда переносить.
+        :param target_table: Куда переносить (с теми же колонками).
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param columns: Переносимые колонки, по умолчанию колонки MOVIE_SCHEMA.
+        :return: Число перенесённых строк.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать фильтры для переноса.")
+        moved = [row for row in self.tables[table_name] if self._matches(row, data)]
+        self.tables[table_name] = [row for row in self.tables[table_name] if not self._matches(row, data)]
+        keys = columns or list(MOVIE_SCHEMA)
+        self.tables[target_table].extend({key: row.get(key) for key in keys} for row in moved)
+        self.notify_write(table_name, data, deleted=True)
+        self.notify_write(target_table, data, {})
+        return len(moved)
+
+    def update_table(self, table_name: str, data: dict, updates: dict) -> int:
+        """
+        Обновляет записи в таблице по заданным фильтрам.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param updates: Словарь обновляемых данных вида {col_name: value}.
+        :return: Число изменённых строк.
+        """
+
+        if not data or not updates:
+            raise ValueError("Необходимо указать data и updates.")
+        changed = 0
+        for row in self.tables[table_name]:
+            if self._matches(row, data):
+                row.update(copy.deepcopy(updates))
+                changed += 1
+        self.notify_write(table_name, data, updates)
+        return changed
+
+    def create_search_index(self, table_name: str):
+        """Индекс не нужен, поиск перебирает строки"""
+        pass
+
+    def search_titles(
+        self,
+        table_names: list[str],
+        query: str,
+        limit: int = 10,
+        columns: list[str] = None,
+        min_similarity: float = SEARCH_MIN_SIMILARITY
+    ) -> list[dict]:
+        """
+        Нечёткий поиск по названию перебором строк.
+        :param table_names: Таблицы категорий.
+        :param query: Строка поиска.
+        :param columns: Возвращаемые колонки, по умолчанию все.
+        :param min_similarity: Минимальная похожесть (0..1) на title или title_original.
+        :return: Строки по убыванию похожести с колонками category (таблица) и score.
+        """
+
+        matches = []
+        for table_name in table_names:
+            keys = columns or self.columns[table_name]
+            for row in self.tables.get(table_name, []):
+                score = max(word_similarity(query, row.get(column)) for column in SEARCH_COLUMNS)
+                if score >= min_similarity:
+                    match = {"category": table_name, "score": score}
+                    match.update({key: copy.copy(row.get(key)) for key in keys})
+                    matches.append(match)
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches[:limit]
+
+
+# Типы PostgreSQL, которые в SQLite объявляются иначе.
+# TEXT_ARRAY - массив, хранится как JSON; по объявленному типу sqlite3 преобразует его обратно в list
+SQLITE_NOW = "(strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))"
+SQLITE_TYPES = {
+    "SERIAL PRIMARY KEY": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "TEXT[]": "TEXT_ARRAY",
+    "now()": SQLITE_NOW,
+}
+
+sqlite3.register_converter("TEXT_ARRAY", json.loads)
+sqlite3.register_converter("TIMESTAMPTZ", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: bool(int(value)))
+
+
+def sqlite_type(col_type: str) -> str:
+    for pg_type, sqlite_col_type in SQLITE_TYPES.items():
+        col_type = col_type.replace(pg_type, sqlite_col_type)
+    return col_type
+
+
+def sqlite_value(value):
+    """Значение параметра для SQLite: списки - в JSON, даты - в ISO-строку (сравнимую как текст)"""
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.isoformat(timespec="microseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def sqlite_row(cursor, row) -> dict:
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteConnection(DatabaseConnection):
+    """
+    Встроенная бд SQLite в одном файле (DB_SQLITE_PATH) для небольших установок без PostgreSQL.
+    Одно соединение на процесс, обращения из потоков сериализуются блокировкой.
+    """
+
+    PRAGMAS = {
+        "journal_mode": "WAL",  # читатели не блокируют запись
+        "synchronous": "NORMAL",  # в режиме WAL не теряет целостность, fsync только на checkpoint
+        "busy_timeout": 5000,
+        "cache_size": -32_000,  # ~32 МБ
+        "temp_store": "MEMORY",
+        "mmap_size": 128 * 1024 * 1024,
+    }
+
+    def __init__(self, path: str = None):
+        super().__init__()
+        self.path = path or DB_SQLITE_PATH
+        self.lock = threading.RLock()
+        self.connect()
+
+    def create_connection(self):
+        """Создает новое соединение с базой данных"""
+        connection = sqlite3.connect(
+            self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, isolation_level=None
+        )
+        for name, value in self.PRAGMAS.items():
+            connection.execute(f"PRAGMA {name}={value}")
+        connection.create_function("word_similarity", 2, word_similarity, deterministic=True)
+        connection.row_factory = sqlite_row
+        return connection
+
+    def connect(self):
+        """Открывает файл бд (создаёт, если его нет)"""
+        self.reconnect()
+        logger.success(f"Успешное подключение к базе данных {self.path}")
+
+    def reconnect(self, retries: int = 1, delay: int = 0):
+        with self.lock:
+            if self.connection:
+                self.connection.close()
+            self.connection = self.create_connection()
+
+    def ensure_connection(self):
+        if self.connection is None:
+            self.reconnect()
+
+    @contextmanager
+    def cursor(self, name: str = None):
+        """
+        Курсор для работы с бд
+        :param name: Не используется, оставлен для совместимости.
+        """
+
+        self.ensure_connection()
+        with self.lock:
+            cursor = self.connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Курсор внутри явной транзакции (соединение работает в режиме autocommit)"""
+        with self.cursor() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+
+class SQLiteDatabaseRepository(DatabaseRepository):
+    """
+    Класс для работы с данными в SQLite с теми же фильтрами, что и у PostgreSQL.
+    Колонки TEXT[] хранятся как JSON, операторы && и NOT && проверяются через json_each.
+    """
+
+    def __init__(self, db_connection: SQLiteConnection):
+        super().__init__(db_connection)
+
+    def table_exists(self, table_name: str) -> bool:
+        """Проверяет, существует ли таблица с заданным именем"""
+        with self.db_connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+            return cursor.fetchone() is not None
+
+    def create_table(self, table_name: str, schema: dict = None):
+        """
+        Создаёт таблицу, если она ещё не существует
+        :param schema: Словарь вида {col_name: col_type}, по умолчанию MOVIE_SCHEMA.
+        """
+
+        schema = schema or MOVIE_SCHEMA
+        with self.db_connection.cursor() as cursor:
+            if not self.table_exists(table_name):
+                columns = ",\n".join(f"{name} {sqlite_type(col_type)}" for name, col_type in schema.items())
+                cursor.execute(f"CREATE TABLE {table_name} ({columns})")
+                logger.success(f"Таблица '{table_name}' создана")
+                return
+            # Добавляем колонки, появившиеся в схеме после создания таблицы.
+            # SQLite не умеет добавлять колонку с DEFAULT-выражением, поэтому now() у таких колонок опускается
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            existing = {row["name"] for row in cursor.fetchall()}
+            for name, col_type in schema.items():
+                if name not in existing:
+                    col_type = col_type.replace(" DEFAULT now()", "")
+                    cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {name} {sqlite_type(col_type)}")
+
+    @staticmethod
+    def build_where(data: dict = None) -> tuple[str, list]:
+        """
+        Собирает WHERE из словаря фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :return: Текст условия (с ведущим " WHERE " или пустой) и список параметров.
+        """
+
+        if not data:
+            return "", []
+        filter_clauses = []
+        params = []
+        for key, condition in data.items():
+            if isinstance(condition, tuple):
+                operator, value = condition
+                op = operator.strip().upper()
+                if op in ("&&", "NOT &&"):
+                    # Есть общие элементы с массивом value; для NULL json_each пуст, как и в build_where PostgreSQL
+                    placeholders = ", ".join(["?"] * len(value))
+                    clause = f"EXISTS (SELECT 1 FROM json_each({key}) WHERE value IN ({placeholders}))"
+                    filter_clauses.append(f"NOT {clause}" if op == "NOT &&" else clause)
+                    params.extend(sqlite_value(item) for item in value)
+                elif op == "IN":
+                    filter_clauses.append(f"{key} IN ({', '.join(['?'] * len(value))})")
+                    params.extend(sqlite_value(item) for item in value)
+                else:
+                    filter_clauses.append(f"{key} {operator} ?")
+                    params.append(sqlite_value(value))
+            elif condition is None:  # Обрабатываем фильтры с None как IS NULL
+                filter_clauses.append(f"{key} IS NULL")
+            else:
+                filter_clauses.append(f"{key} = ?")
+                params.append(sqlite_value(condition))
+        return " WHERE " + " AND ".join(filter_clauses), params
+
+    @staticmethod
+    def build_order_by(sort_by: str = None) -> str:
+        """Как в PostgreSQL: NULL в конце при ASC и в начале при DESC"""
+        if not sort_by:
+            return ""
+        parts = []
+        for part in sort_by.split(","):
+            key, *direction = part.split()
+            desc = bool(direction) and direction[0].upper() == "DESC"
+            parts.append(f"{key} {'DESC NULLS FIRST' if desc else 'ASC NULLS LAST'}")
+        return " ORDER BY " + ", ".join(parts)
+
+    @classmethod
+    def build_select(
+        cls,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        columns: list[str] = None
+    ) -> tuple[str, list]:
+        """
+        Собирает SELECT-запрос с фильтрами, сортировкой и проекцией колонок.
+        :return: Текст запроса и список параметров.
+        """
+
+        where_clause, params = cls.build_where(data)
+        select_clause = ", ".join(columns) if columns else "*"
+        return f"SELECT {select_clause} FROM {table_name}{where_clause}{cls.build_order_by(sort_by)}", params
+
+    def add_into_table(self, table_name: str, data: dict) -> int:
+        """
+        Добавляет новую запись в таблицу.
+        :param table_name: Название таблицы.
+        :param data: Словарь вида {col_name: value}.
+        :return: ID.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать данные для вставки.")
+
+        with self.db_connection.cursor() as cursor:
+            columns = ", ".join(data.keys())
+            placeholders = ", ".join(["?"] * len(data))
+            cursor.execute(
+                f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})",
+                [sqlite_value(value) for value in data.values()]
+            )
+            row_id = cursor.lastrowid
+        self.notify_write(table_name, {"id": row_id}, data)
+        return row_id
+
+    def delete_from_table(self, table_name: str, data: dict) -> int:
+        """
+        Удаляет записи из таблицы по заданным фильтрам.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :return: Число удалённых строк.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать фильтры для удаления.")
+
+        with self.db_connection.cursor() as cursor:
+            where_clause, params = self.build_where(data)
+            cursor.execute(f"DELETE FROM {table_name}{where_clause}", params)
+            deleted = cursor.rowcount
+        self.notify_write(table_name, data, deleted=True)
+        return deleted
+
+    def get_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        fetchone: bool = True,
+        columns: list[str] = None
+    ) -> dict | list[dict]:
+        """
+        Получает все данные из таблицы с опциональными фильтрами и сортировкой.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param fetchone: Вернуть лишь одно значение, False - вернуть список
+        :param columns: Список нужных колонок, по умолчанию все.
+        """
+
+        with self.db_connection.cursor() as cursor:
+            query, params = self.build_select(table_name, data, sort_by, columns)
+            cursor.execute(query, params)
+            if fetchone:
+                return cursor.fetchone()
+            return cursor.fetchall()
+
+    def iter_table(
+        self,
+        table_name: str,
+        data: dict = None,
+        sort_by: str = None,
+        columns: list[str] = None,
+        batch_size: int = DB_BATCH_SIZE
+    ) -> Iterator[dict]:
+        """
+        Построчно читает данные из таблицы порциями по batch_size строк.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param sort_by: Строка сортировки (например, "id ASC").
+        :param columns: Список нужных колонок, по умолчанию все.
+        :param batch_size: Число строк в одной порции.
+        """
+
+        query, params = self.build_select(table_name, data, sort_by, columns)
+        offset = 0
+        while True:
+            with self.db_connection.cursor() as cursor:
+                cursor.execute(f"{query} LIMIT ? OFFSET ?", params + [batch_size, offset])
+                rows = cursor.fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            offset += batch_size
+
+    def copy_into_table(self, table_name: str, columns: list[str], rows: list[tuple]) -> int:
+        """
+        Массово добавляет строки одной транзакцией.
+        :param table_name: Название таблицы.
+        :param columns: Колонки в порядке значений в строках.
+        :param rows: Список кортежей значений.
+        :return: Число добавленных строк.
+        """
+
+        placeholders = ", ".join(["?"] * len(columns))
+        with self.db_connection.transaction() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})",
+                ([sqlite_value(value) for value in row] for row in rows)
+            )
+        self.notify_write(table_name, {}, {})
+        return len(rows)
+
+    def create_index(self, table_name: str, columns: list[str], method: str = "btree", where: str = None):
+        """
+        Создаёт индекс, если его ещё нет.
+        В SQLite есть только B-tree: brin заменяется им, а gin (массивы, триграммы) не создаётся.
+        :param columns: Индексируемые колонки (или выражения).
+        :param method: Тип индекса (btree, brin, gin...).
+        :param where: Условие частичного индекса.
+        """
+
+        if method == "gin":
+            return
+        suffix = "_".join("".join(ch for ch in column if ch.isalnum() or ch == "_") for column in columns)
+        index_name = f"{table_name}_{suffix}_{method}_idx"
+        where_clause = f" WHERE {where}" if where else ""
+        with self.db_connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)}){where_clause}"
+            )
+
+    def move_rows(self, table_name: str, target_table: str, data: dict, columns: list[str] = None) -> int:
+        """
+        Переносит записи в другую таблицу одной транзакцией (INSERT ... SELECT -> DELETE).
+        :param table_name: Откуда переносить.
+        :param target_table: Куда переносить (с теми же колонками).
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param columns: Переносимые колонки, по умолчанию колонки MOVIE_SCHEMA.
+        :return: Число перенесённых строк.
+        """
+
+        if not data:
+            raise ValueError("Необходимо указать фильтры для переноса.")
+
+        column_list = ", ".join(columns or MOVIE_SCHEMA)
+        where_clause, params = self.build_where(data)
+        with self.db_connection.transaction() as cursor:
+            cursor.execute(
+                f"INSERT INTO {target_table} ({column_list}) SELECT {column_list} FROM {table_name}{where_clause}",
+                params
+            )
+            moved = cursor.rowcount
+            cursor.execute(f"DELETE FROM {table_name}{where_clause}", params)
+        self.notify_write(table_name, data, deleted=True)
+        self.notify_write(target_table, data, {})
+        return moved
+
+    def update_table(self, table_name: str, data: dict, updates: dict) -> int:
+        """
+        Обновляет записи в таблице по заданным фильтрам.
+        :param table_name: Название таблицы.
+        :param data: Словарь фильтров вида {col_name: (operator, value)} или {col_name: value}.
+        :param updates: Словарь обновляемых данных вида {col_name: value}.
+        :return: Число изменённых строк.
+        """
+
+        if not data or not updates:
+            raise ValueError("Необходимо указать data и updates.")
+
+        with self.db_connection.cursor() as cursor:
+            set_clause = ", ".join([f"{key} = ?" for key in updates.keys()])
+            where_clause, where_params = self.build_where(data)
+            cursor.execute(
+                f"UPDATE {table_name} SET {set_clause}{where_clause}",
+                [sqlite_value(value) for value in updates.values()] + where_params
+            )
+            updated = cursor.rowcount
+        self.notify_write(table_name, data, updates)
+        return updated
+
+    def create_search_index(self, table_name: str):
+        """Триграммных индексов в SQLite нет, поиск считает похожесть по всем строкам"""
+        pass
+
+    def search_titles(
+        self,
+        table_names: list[str],
+        query: str,
+        limit: int = 10,
+        columns: list[str] = None,
+        min_similarity: float = SEARCH_MIN_SIMILARITY
+    ) -> list[dict]:
+        """
+        Нечёткий поиск по названию: word_similarity зарегистрирована в SQLite как функция Python.
+        :param table_names: Таблицы категорий.
+        :param query: Строка поиска.
+        :param columns: Возвращаемые колонки, по умолчанию все.
+        :param min_similarity: Минимальная похожесть (0..1) на title или title_original.
+        :return: Строки по убыванию похожести с колонками category (таблица) и score.
+        """
+
+        if not query.strip() or not table_names:
+            return []
+        select_clause = ", ".join(columns) if columns else "*"
+        parts, params = [], []
+        for table_name in table_names:
+            parts.append(
+                f"SELECT ? AS category, max(word_similarity(?, title), word_similarity(?, title_original)) "
+                f"AS score, {select_clause} FROM {table_name}"
+            )
+            params += [table_name, query, query]
+
+        with self.db_connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT * FROM ({' UNION ALL '.join(parts)}) WHERE score >= ? ORDER BY score DESC LIMIT ?",
+                params + [min_similarity, limit]
+            )
+            return cursor.fetchall()
+
+
+def create_repository(backend: str = DB_BACKEND) -> DatabaseRepository:
+    """
+    Создаёт репозиторий по настройке DB_BACKEND.
+    :param backend: "postgres" (по умолчанию), "sqlite" (файл DB_SQLITE_PATH) или "memory".
+    """
+
+    if backend == "memory":
+        return MemoryDatabaseRepository()
+    if backend == "sqlite":
+        return SQLiteDatabaseRepository(SQLiteConnection())
+    if backend == "postgres":
+        journal = WriteJournal(DB_JOURNAL_PATH) if DB_JOURNAL_PATH else None
+        return PostgreSQLDatabaseRepository(PostgreSQLConnection(), journal)
+    raise ValueError(f"Неизвестный DB_BACKEND: {backend}")
 
 
-db_connection = PostgreSQLConnection()
-db = PostgreSQLDatabaseRepository(db_connection)
+db = create_repository()
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -0,0 +1,129 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+
+from loguru import logger
+
+from metrics import metrics
+
+# Момент (time.monotonic()), к которому текущая задача должна закончить работу
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Срок задачи или отдельного внешнего вызова истёк"""
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Ограничивает время блока. Вложенный срок не может быть позже внешнего.
+    Внешние вызовы внутри блока берут таймаут через remaining().
+    """
+
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(timeout: float = None) -> float | None:
+    """
+    Таймаут для внешнего вызова: timeout, но не дольше, чем осталось до срока задачи.
+    :param timeout: Собственный предел вызова (None - только срок задачи).
+    :return: Секунды или None, если ограничений нет.
+    :raises DeadlineExceeded: если срок задачи уже истёк.
+    """
+
+    at = _deadline.get()
+    if at is None:
+        return timeout
+    left = at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("срок задачи истёк")
+    return left if timeout is None else min(timeout, left)
+
+
+def expired() -> bool:
+    at = _deadline.get()
+    return at is not None and time.monotonic() >= at
+
+
+def record_overrun(name: str):
+    """Учитывает внешний вызов, прерванный по таймауту"""
+    metrics.incr("deadline.overruns")
+    metrics.incr(f"deadline.overruns.{name}")
+    logger.warning(f"Превышено время ожидания: {name}")
+
+
+def call_with_timeout(name: str, timeout: float, func, *args, **kwargs):
+    """
+    Вызывает func в отдельном потоке и ждёт не дольше remaining(timeout).
+    Для библиотек без своих таймаутов (GoogleTranslator): зависший вызов остаётся
+    доделываться в фоновом потоке, а задача идёт дальше.
+    :raises DeadlineExceeded: если результата нет вовремя.
+    """
+
+    limit = remaining(timeout)
+    result = {}
+    done = threading.Event()
+    context = copy_context()
+
+    def run():
+        try:
+            result["value"] = context.run(func, *args, **kwargs)
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=run, name=f"watchdog-{name}", daemon=True).start()
+    if not done.wait(limit):
+        record_overrun(name)
+        raise DeadlineExceeded(f"{name}: нет ответа за {limit:.1f} сек")
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def in_context(func):
+    """
+    Функция для ThreadPoolExecutor, которая выполняется со сроком вызывающего потока
+    (contextvars сами в потоки пула не передаются).
+    """
+
+    context = copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def job_deadline(seconds: float):
+    """
+    Задача планировщика со сроком seconds. Если срок истёк, задача завершается,
+    а не держит планировщик; необработанные тайтлы остаются на следующий запуск.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            overruns = metrics.counter("deadline.overruns")
+            try:
+                with deadline(seconds):
+                    return func(*args, **kwargs)
+            except DeadlineExceeded:
+                record_overrun(f"job.{func.__name__}")
+                logger.warning(f"{func.__name__} остановлено: истёк срок {seconds:.0f} сек")
+            finally:
+                overruns = metrics.counter("deadline.overruns") - overruns
+                if overruns:
+                    logger.warning(f"{func.__name__}: превышений времени ожидания: {overruns:.0f}")
+        return wrapper
+    return decorator
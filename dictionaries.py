@@ -14,6 +14,18 @@ def rename_from_dict(
         result.append(item_translates.get(i, prefix + i + suffix))
     return ", ".join(result)
 
+
+def untranslate(ban_list: list[str], item_translates: dict[str, str]) -> set[str]:
+    """
+    Исходные (английские) названия, которые отсекает бан-лист.
+    Как и Movie.filter_passes, элемент бан-листа ищется подстрокой в переводе (или в исходном названии).
+    """
+
+    return {
+        name for name, translated in item_translates.items()
+        if any(banned in translated or banned in name for banned in ban_list)
+    }
+
 CATEGORY_URLS = {
     "Фильмы": "https://www.imdb.com/chart/moviemeter/?ref_=nv_mv_mpm&sort=release_date%2Cdesc&user_rating=5%2C",
     "Сериалы": "https://www.imdb.com/chart/tvmeter/?ref_=nv_tvv_mptv&sort=release_date%2Cdesc&user_rating=5%2C"
@@ -0,0 +1,49 @@
+import html
+import os
+
+from post import CAPTION_LIMIT, Post, caption_length
+
+DIGEST_MAX_ITEMS = int(os.getenv("DIGEST_MAX_ITEMS", 10))  # Не больше 10 медиа в одном sendMediaGroup
+DIGEST_MAX_BYTES = int(os.getenv("DIGEST_MAX_BYTES", 50 * 1024 * 1024))  # Лимит Bot API на размер запроса
+DIGEST_CAPTION_LIMIT = CAPTION_LIMIT
+
+
+def digest_caption(content_type: str, posts: list[Post]) -> str:
+    """Общая подпись к альбому: номер видео в альбоме, название со ссылкой на трейлер и рейтинг"""
+    lines = [f"<b><u>#{content_type}</u></b>"]
+    for n, post in enumerate(posts, start=1):
+        lines.append(
+            f"{n}. <b><a href='{post.youtube_url}'>{html.escape(post.title_full)}</a></b> "
+            f"⭐️ <a href='{post.movie.url}'>{post.movie.rating}</a>"
+        )
+    return "\n".join(lines)
+
+
+def split_digest(
+    content_type: str,
+    posts: list[Post],
+    max_items: int = DIGEST_MAX_ITEMS,
+    max_bytes: int = DIGEST_MAX_BYTES,
+    max_caption: int = DIGEST_CAPTION_LIMIT
+) -> list[list[Post]]:
+    """
+    Делит посты с трейлерами на альбомы.
+    Новый альбом начинается, если текущий превысит число видео, суммарный размер файлов или длину подписи.
+    """
+
+    batches, batch, batch_bytes = [], [], 0
+    for post in posts:
+        # Уже загруженные в Telegram видео отправляются по file_id и не увеличивают размер запроса
+        size = 0 if post.progress and post.progress.file_id else os.path.getsize(post.video_path)
+        if batch and (
+            len(batch) >= max_items
+            or batch_bytes + size > max_bytes
+            or caption_length(digest_caption(content_type, batch + [post])) > max_caption
+        ):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(post)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
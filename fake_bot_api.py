@@ -0,0 +1,145 @@
+"""
+Локальная заглушка Telegram Bot API для проверки бота без сети.
+
+    with FakeBotApi() as api:
+        message.TELEGRAM_API_URL = api.url
+        api.push_message("/top сериалы")
+        bot.poll_once()
+        print(api.sent)
+"""
+import json
+import threading
+import urllib.parse
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+
+
+class FakeBotApi:
+    """
+    HTTP-сервер с методами getUpdates (с long polling), sendMessage, sendVideo и sendMediaGroup.
+    Все вызовы send* сохраняются в sent как {"method": ..., **поля запроса}.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.updates: list[dict] = []
+        self.sent: list[dict] = []
+        self.condition = threading.Condition()
+        self._update_ids = count(1)
+        self._message_ids = count(1)
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def push_message(self, text: str, chat_id: int = 1, channel: bool = False) -> dict:
+        """Добавляет входящее сообщение, которое бот получит в getUpdates"""
+        update = {
+            "update_id": next(self._update_ids),
+            "channel_post" if channel else "message": {
+                "message_id": next(self._message_ids),
+                "chat": {"id": chat_id, "type": "channel" if channel else "private"},
+                "text": text,
+            },
+        }
+        with self.condition:
+            self.updates.append(update)
+            self.condition.notify_all()
+        return update
+
+    def wait_sent(self, count_: int, timeout: float = 5) -> bool:
+        """Ждёт, пока бот отправит count_ сообщений"""
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.sent) >= count_, timeout=timeout)
+
+    def get_updates(self, offset: int = 0, timeout: float = 0) -> list[dict]:
+        with self.condition:
+            ready = lambda: [u for u in self.updates if u["update_id"] >= offset]
+            self.condition.wait_for(ready, timeout=timeout)
+            # Как и в Telegram, offset подтверждает получение предыдущих обновлений
+            self.updates = ready()
+            return list(self.updates)
+
+    def _message(self, chat_id, video=None) -> dict:
+        result = {"message_id": next(self._message_ids), "chat": {"id": chat_id}}
+        if video is not None:
+            # Загруженный файл получает новый file_id, отправленный по file_id - сохраняет его
+            reused = isinstance(video, str) and not video.startswith("attach://")
+            result["video"] = {"file_id": video if reused else f"file-{len(self.sent)}"}
+        return result
+
+    def record(self, method: str, fields: dict):
+        with self.condition:
+            self.sent.append({"method": method, **fields})
+            self.condition.notify_all()
+        chat_id = fields.get("chat_id")
+        if method == "sendVideo":
+            return self._message(chat_id, fields.get("video"))
+        if method == "sendMediaGroup":
+            return [self._message(chat_id, media["media"]) for media in json.loads(fields.get("media", "[]"))]
+        return self._message(chat_id)
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _fields(self) -> dict:
+                fields = {k: v[-1] for k, v in urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.startswith("multipart/form-data"):
+                    parsed = BytesParser(policy=HTTP).parsebytes(
+                        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+                    )
+                    for part in parsed.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        if part.get_filename():
+                            fields[name] = {"filename": part.get_filename(), "size": len(part.get_payload(decode=True))}
+                        else:
+                            fields[name] = part.get_content().strip()
+                elif body:
+                    fields.update({k: v[-1] for k, v in urllib.parse.parse_qs(body.decode()).items()})
+                return fields
+
+            def _respond(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _dispatch(self):
+                method = urllib.parse.urlsplit(self.path).path.rsplit("/", 1)[-1]
+                fields = self._fields()
+                if method == "getUpdates":
+                    result = api.get_updates(int(fields.get("offset", 0)), float(fields.get("timeout", 0)))
+                elif method.startswith("send"):
+                    result = api.record(method, fields)
+                else:
+                    self._respond(404, {"ok": False, "description": f"Unknown method {method}"})
+                    return
+                self._respond(200, {"ok": True, "result": result})
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+        return Handler
@@ -0,0 +1,149 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+import message
+from deadlines import in_context
+from digest import digest_caption, split_digest
+from metrics import metrics
+from post import Post
+from ratelimit import TokenBucket
+
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", 8))  # чатов, в которые отправляем одновременно
+TELEGRAM_RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", 25))  # сообщений в секунду на бота (лимит Telegram ~30)
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv("TELEGRAM_CHAT_RATE_LIMIT", 20))  # сообщений в минуту в один чат
+
+
+class FanOut:
+    """
+    Рассылает посты по чатам подписчиков.
+    Каждый трейлер загружается в Telegram один раз, в остальные чаты уходит по file_id.
+    Чаты обрабатываются параллельно с общим лимитом на бота и отдельным лимитом на каждый чат.
+    """
+
+    def __init__(
+        self,
+        workers: int = FANOUT_WORKERS,
+        rate: float = TELEGRAM_RATE_LIMIT,
+        chat_rate_per_minute: float = TELEGRAM_CHAT_RATE_LIMIT
+    ):
+        self.workers = workers
+        self.bucket = TokenBucket(rate, capacity=max(1, int(rate)))
+        self.chat_rate = chat_rate_per_minute / 60
+        self.chat_buckets: dict[str, TokenBucket] = {}
+        self.delivered: dict[str, set[str]] = {}  # url -> чаты, куда пост отправлен
+        self.errors: dict[str, str] = {}  # url -> последняя ошибка
+        self.uploads = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, chat_id: str, messages: int = 1):
+        with self._lock:
+            chat_bucket = self.chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate, capacity=3))
+        # Альбом считается одним сообщением для лимита чата и отдельными - для лимита бота
+        chat_bucket.acquire()
+        self.bucket.acquire(min(messages, self.bucket.capacity))
+
+    def _done(self, chat_id: str, posts: list[Post], file_ids: list):
+        with self._lock:
+            for post, file_id in zip(posts, file_ids):
+                if file_id and not post.progress.file_id:
+                    post.progress.file_id = file_id
+                    self.uploads += 1
+                self.delivered.setdefault(post.movie.url, set()).add(chat_id)
+        metrics.incr("fanout.messages", len(posts))
+
+    def _failed(self, posts: list[Post], error):
+        with self._lock:
+            for post in posts:
+                self.errors[post.movie.url] = str(error)
+
+    def send_single(self, chat_id: str, post: Post):
+        self._acquire(chat_id)
+        try:
+            file_id = message.send_telegram_video(
+                video_path=post.video_path, message=post.caption, chat_id=chat_id, file_id=post.progress.file_id
+            )
+        except Exception as e:
+            self._failed([post], e)
+            return
+        if file_id is None:
+            self._failed([post], f"Telegram не принял видео в чат {chat_id}")
+        else:
+            self._done(chat_id, [post], [file_id])
+
+    def send_album(self, chat_id: str, content_type: str, batch: list[Post]):
+        self._acquire(chat_id, messages=len(batch))
+        try:
+            file_ids = message.send_telegram_videos(
+                video_paths=[post.video_path for post in batch],
+                message=digest_caption(content_type, batch),
+                chat_id=chat_id,
+                file_ids=[post.progress.file_id for post in batch]
+            )
+        except Exception as e:
+            self._failed(batch, e)
+            return
+        if file_ids is None:
+            self._failed(batch, f"Telegram не принял альбом в чат {chat_id}")
+        else:
+            self._done(chat_id, batch, file_ids)
+
+    def _run(self, plan: dict[str, list[Post]], deliver):
+        """
+        Сначала по одному отправляет в чаты, которым нужны ещё не загруженные трейлеры
+        (загрузка каждого трейлера происходит один раз), затем параллельно во все остальные.
+        """
+
+        remaining = {chat_id: posts for chat_id, posts in plan.items() if posts}
+        while remaining:
+            uploads = {
+                chat_id: sum(1 for post in posts if not post.progress.file_id)
+                for chat_id, posts in remaining.items()
+            }
+            chat_id = max(uploads, key=uploads.get)
+            if not uploads[chat_id]:
+                break
+            deliver(chat_id, remaining.pop(chat_id))
+
+        if remaining:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(remaining))) as executor:
+                list(executor.map(in_context(lambda item: deliver(*item)), remaining.items()))
+
+    @staticmethod
+    def plan(posts: list[Post]) -> dict[str, list[Post]]:
+        """Посты по чатам с сохранением порядка"""
+        plan = {}
+        for post in posts:
+            for chat_id in post.audience:
+                plan.setdefault(chat_id, []).append(post)
+        return plan
+
+    def send_posts(self, posts: list[Post]):
+        """Отправляет каждый пост отдельным сообщением во все его чаты"""
+        def deliver(chat_id, chat_posts):
+            for post in chat_posts:
+                self.send_single(chat_id, post)
+
+        self._run(self.plan(posts), deliver)
+
+    def send_digest(self, content_type: str, posts: list[Post]):
+        """Отправляет посты одной категории альбомами, в каждый чат - только прошедшие его фильтры"""
+        def deliver(chat_id, chat_posts):
+            for batch in split_digest(content_type, chat_posts):
+                if len(batch) == 1:
+                    self.send_single(chat_id, batch[0])
+                else:
+                    self.send_album(chat_id, content_type, batch)
+
+        self._run(self.plan(posts), deliver)
+
+    def log_summary(self, posts: list[Post]):
+        chats = {chat_id for post in posts for chat_id in post.audience}
+        if chats:
+            logger.info(
+                f"Рассылка: {len(posts)} постов в {len(chats)} чатов, "
+                f"загружено видео {self.uploads}, "
+                f"ошибок {len(self.errors)}"
+            )
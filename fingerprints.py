@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from datetime import date, timedelta
+
+from loguru import logger
+
+from database import DatabaseRepository
+
+CHART_ROWS_TABLE = "chart_rows"
+CHART_ROWS_SCHEMA = {
+    "source": "TEXT NOT NULL",
+    "rank": "INT NOT NULL",
+    "url": "TEXT NOT NULL",
+    "title": "TEXT",
+    "year_start": "INT",
+    "year_end": "INT",
+    "rating": "FLOAT",
+    "fingerprint": "TEXT NOT NULL",
+    "checked_on": "DATE NOT NULL",  # когда строка последний раз сверялась с таблицей категории
+}
+CHART_ROWS_COLUMNS = list(CHART_ROWS_SCHEMA)
+# Через сколько дней неизменная строка всё равно сверяется с бд (на случай ручных правок таблиц)
+CHART_FULL_SYNC_DAYS = int(os.getenv("CHART_FULL_SYNC_DAYS", 7))
+
+# Тексты, из которых parcer.fetch_chart разбирает строку чарта, - одним запросом для всех строк
+CHART_ITEMS_SCRIPT = """
+const text = (item, selector) => {
+    const element = item.querySelector(selector);
+    return element ? element.innerText : null;
+};
+return arguments[0].map(item => {
+    const link = item.querySelector('a[class*="ipc-title-link-wrapper"]');
+    return [
+        text(item, 'h3[class*="ipc-title__text"]'),
+        text(item, 'span[class*="cli-title-metadata-item"]'),
+        link ? link.href.split("/?ref")[0] : null,
+        text(item, 'span[class*="ipc-rating-star--rating"]')
+    ];
+});
+"""
+
+
+def fingerprint(values) -> str:
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def row_fingerprint(row: dict) -> str:
+    """Отпечаток строки чарта: по исходным текстам страницы, если они были, иначе по разобранным полям"""
+    return row.get("fingerprint") or fingerprint(
+        [row["title"], row["year_start"], row["year_end"], row["url"], row["rating"]]
+    )
+
+
+def item_fingerprints(driver, items: list) -> list[str | None]:
+    """Отпечатки элементов чарта на странице. Если скрипт не сработал, строки просто разбираются заново"""
+    try:
+        texts = driver.execute_script(CHART_ITEMS_SCRIPT, items)
+    except Exception as e:
+        logger.warning(f"Не удалось получить тексты строк чарта: {e}")
+        return [None] * len(items)
+    if not isinstance(texts, list) or len(texts) != len(items):
+        return [None] * len(items)
+    return [fingerprint(values) for values in texts]
+
+
+def chart_fingerprint(rows: list[dict]) -> str:
+    return fingerprint([(row["rank"], row_fingerprint(row)) for row in rows])
+
+
+class ChartFingerprints:
+    """
+    Строки чартов, сверенные с таблицами категорий в прошлые запуски, с отпечатками содержимого.
+    Строку с тем же отпечатком не нужно ни разбирать, ни сверять с бд.
+    """
+
+    def __init__(self, repository: DatabaseRepository, full_sync_days: int = CHART_FULL_SYNC_DAYS):
+        self.repository = repository
+        self.full_sync_days = full_sync_days
+
+    def ensure_table(self):
+        self.repository.create_table(table_name=CHART_ROWS_TABLE, schema=CHART_ROWS_SCHEMA)
+        self.repository.create_index(table_name=CHART_ROWS_TABLE, columns=["source"])
+
+    def load(self, source: str) -> list[dict]:
+        """Строки чарта прошлого запуска по порядку"""
+        rows = self.repository.get_table(
+            table_name=CHART_ROWS_TABLE, data={"source": source}, sort_by="rank ASC", fetchone=False
+        )
+        return [dict(row) for row in rows]
+
+    def fresh(self, stored: list[dict], day: date = None) -> dict[str, dict]:
+        """
+        {отпечаток: строка чарта} для строк, сверенных не раньше чем full_sync_days назад.
+        Остальные строки разбираются и сверяются заново, даже если не изменились.
+        """
+
+        oldest = (day or date.today()) - timedelta(days=self.full_sync_days)
+        return {row["fingerprint"]: row for row in stored if row["checked_on"] > oldest}
+
+    def save(self, source: str, rows: list[dict], failed: set[str] = frozenset(), day: date = None) -> int:
+        """
+        Запоминает сверенные строки чарта вместо прошлых.
+        :param failed: url строк, которые не удалось сверить, - в следующий раз их разберут заново.
+        """
+
+        day = day or date.today()
+        self.repository.delete_from_table(table_name=CHART_ROWS_TABLE, data={"source": source})
+        values = [
+            (
+                source, row["rank"], row["url"], row["title"], row["year_start"], row["year_end"], row["rating"],
+                row_fingerprint(row), row["checked_on"] if row.get("unchanged") else day
+            )
+            for row in rows if row["url"] not in failed
+        ]
+        return self.repository.copy_into_table(table_name=CHART_ROWS_TABLE, columns=CHART_ROWS_COLUMNS, rows=values)
@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+
+DB_JOURNAL_PATH = os.getenv("DB_JOURNAL_PATH", "db_journal.sqlite3")  # пустое значение отключает журнал
+
+# Функции, вызов которых можно отложить до восстановления бд (см. deferrable)
+DEFERRED = {}
+
+
+def deferrable(func):
+    """Регистрирует функцию, чтобы DatabaseRepository.defer мог повторить её вызов из журнала"""
+    DEFERRED[func.__name__] = func
+    return func
+
+
+def pack(value):
+    """Значение в JSON с сохранением кортежей (фильтры) и дат"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [pack(item) for item in value]}
+    if isinstance(value, list):
+        return [pack(item) for item in value]
+    if isinstance(value, dict):
+        return {key: pack(item) for key, item in value.items()}
+    return value
+
+
+def unpack(value):
+    if isinstance(value, list):
+        return [unpack(item) for item in value]
+    if isinstance(value, dict):
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+        if "__date__" in value:
+            return date.fromisoformat(value["__date__"])
+        if "__tuple__" in value:
+            return tuple(unpack(item) for item in value["__tuple__"])
+        return {key: unpack(item) for key, item in value.items()}
+    return value
+
+
+@dataclass
+class JournalEntry:
+    seq: int
+    key: str  # ключ идемпотентности
+    method: str
+    args: list
+    kwargs: dict
+
+
+class WriteJournal:
+    """
+    Журнал отложенных записей в SQLite (WAL) на локальном диске.
+    Записи воспроизводятся строго в порядке добавления.
+    """
+
+    def __init__(self, path: str = DB_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE, "
+            "method TEXT NOT NULL, payload TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        # Записи, которые не удалось применить из-за ошибки в самих данных, - для ручного разбора
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal_failed ("
+            "seq INTEGER PRIMARY KEY, key TEXT NOT NULL, method TEXT NOT NULL, payload TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, error TEXT NOT NULL, failed_at TEXT NOT NULL)"
+        )
+        self._count = self.connection.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    def __len__(self):
+        return self._count
+
+    def append(self, method: str, args: tuple = (), kwargs: dict = None) -> str:
+        """Добавляет запись в конец журнала. :return: Ключ идемпотентности"""
+        key = uuid.uuid4().hex
+        payload = json.dumps({"args": pack(list(args)), "kwargs": pack(kwargs or {})}, ensure_ascii=False)
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO journal (key, method, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, method, payload, datetime.now().isoformat())
+            )
+            self._count += 1
+        return key
+
+    def first(self) -> JournalEntry | None:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT seq, key, method, payload FROM journal ORDER BY seq LIMIT 1"
+            ).fetchone()
+        if not row:
+            return None
+        payload = json.loads(row[3])
+        return JournalEntry(row[0], row[1], row[2], unpack(payload["args"]), unpack(payload["kwargs"]))
+
+    def ack(self, entry: JournalEntry):
+        """Удаляет воспроизведённую запись"""
+        with self._lock:
+            self.connection.execute("DELETE FROM journal WHERE seq = ?", (entry.seq,))
+            self._count -= 1
+
+    def dead_letter(self, entry: JournalEntry, error: Exception):
+        """Переносит запись, которую не удалось применить, в journal_failed, чтобы она не блокировала остальные"""
+        with self._lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO journal_failed (seq, key, method, payload, created_at, error, failed_at) "
+                    "SELECT seq, key, method, payload, created_at, ?, ? FROM journal WHERE seq = ?",
+                    (repr(error), datetime.now().isoformat(), entry.seq)
+                )
+                self.connection.execute("DELETE FROM journal WHERE seq = ?", (entry.seq,))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self._count -= 1
@@ -1,8 +1,9 @@
 import os
 import subprocess
-import urllib.parse
+import threading
 from datetime import datetime, timedelta, timezone
 from functools import wraps
+from itertools import chain
 
 from apscheduler.schedulers.blocking import BlockingScheduler
 from dotenv import load_dotenv
@@ -11,14 +12,38 @@ from loguru import logger
 load_dotenv()
 
 import message
-from database import db
+from archive import compact_tables
+from bot import CommandBot
+from cache import MovieCache
+from database import DB_RETRY_INTERVAL, UNAVAILABLE_ERRORS, db
+from deadlines import DeadlineExceeded, deadline, expired, job_deadline
 from dictionaries import CATEGORY_URLS
+from fanout import FanOut
 from movie import Movie
-from parcer import (check_movie_release, download_video,
-                    get_top_movies_and_serials, get_youtube_links)
+from pageperf import page_perf
+from planner import CHECK_BUDGET, CheckPlanner
+from parcer import (check_releases, download_video, get_youtube_links,
+                    rank_youtube_links, update_charts)
+from post import Post, caption_problem, render_posts
+from progress import STAGE_DOWNLOADED, STAGE_LINKS, STAGE_SENT, ProgressTracker
+from push import PUSH_SEND, ReleaseListener
+from subscribers import SubscriberRegistry, shared_ban_filter
+from trailer_store import trailer_store
+from transcode import TranscodePool, log_transcode_summary
 
-CATEGORY_BAN_LIST = os.getenv("CATEGORY_BAN_LIST").split()
-COUNTRY_BAN_LIST = os.getenv("COUNTRY_BAN_LIST").split()
+DIGEST_MODE = os.getenv("DIGEST_MODE", "false").lower() == "true"
+SEND_RETRY_INTERVAL = int(os.getenv("SEND_RETRY_INTERVAL", 15))  # минут между повторами отложенных отправок
+BOT_COMMANDS_ENABLED = os.getenv("BOT_COMMANDS_ENABLED", "false").lower() == "true"
+# Сроки задач планировщика (сек): зависший внешний вызов не должен держать задачу до следующего запуска
+UPDATE_TABLE_DEADLINE = float(os.getenv("UPDATE_TABLE_DEADLINE", 55 * 60))
+SEND_DEADLINE = float(os.getenv("SEND_DEADLINE", 30 * 60))
+
+tracker = ProgressTracker(db)
+planner = CheckPlanner(db)
+registry = SubscriberRegistry(db)
+# Кэш для команд бота, обновляется при каждой записи в таблицы категорий
+movie_cache = MovieCache(db)
+send_lock = threading.Lock()
 
 def time_spent(func):
     @wraps(func)
@@ -67,102 +92,298 @@ def check_updates():
             subprocess.run(["pip", "install", "--upgrade", package_name])
 
 @time_spent
+@job_deadline(UPDATE_TABLE_DEADLINE)
 def update_table():
     logger.info("Запускаю обновление таблиц")
     current_year = datetime.now().year - 1
-    for content_type, content_type_url in CATEGORY_URLS.items():
+    for content_type in CATEGORY_URLS:
         # Создаем таблицы
         db.create_table(table_name=content_type)
-        # Обновляем общий топ фильмов
-        get_top_movies_and_serials(content_type, content_type_url, current_year)
-        # Обновляем каждый не вышедший фильм
-        not_released_movies = db.get_table(table_name=content_type, data=Movie(date_now=None).to_dict, fetchone=False)
-        if not_released_movies:
-            check_movie_release(content_type=content_type, not_released_movies=not_released_movies)
-
-@time_spent
-def send_new_movies():
-    logger.info("Запускаю отправку сообщения в telegram")
+    # Обновляем тайтлы по всем чартам сразу
+    update_charts(current_year)
 
-    for content_type, content_type_url in CATEGORY_URLS.items():
-        # Проверяем что вышло за последнее время
-        time_ago = datetime.now(timezone.utc) - timedelta(hours=2)
-        recent_movies = db.get_table(
+    # Не вышедшие тайтлы проверяются по очереди планировщика, пока не кончится бюджет
+    planner.ensure_table()
+    movies = {
+        content_type: db.get_table(
             table_name=content_type,
-            data=Movie(date_now=(">=", time_ago)).to_dict,
-            sort_by="rating DESC",
-            fetchone=False
+            data=Movie(date_now=None).to_dict,
+            fetchone=False,
+            columns=["title", "url", "rating", "year_start"]
         )
-        if recent_movies:
-            for movie in recent_movies:
-                movie = Movie.from_dict(movie)
+        for content_type in CATEGORY_URLS
+    }
+    tasks = planner.plan(movies)
+    if not tasks:
+        return
+    fits = planner.fits(tasks, CHECK_BUDGET)
+    logger.info(
+        f"Проверка релизов: {len(tasks)} тайтлов, оценка {sum(task.cost for task in tasks) / 60:.0f} мин, "
+        f"в бюджет {CHECK_BUDGET / 60:.0f} мин укладывается {fits}"
+    )
+    pending = {(task.content_type, task.url): task for task in tasks}
+
+    def on_checked(content_type, url, seconds):
+        planner.record(pending.pop((content_type, url)), seconds)
+
+    # Каждую страницу - один раз за запуск
+    try:
+        with deadline(CHECK_BUDGET):
+            check_releases([(task.content_type, task.movie) for task in tasks], checked=set(), on_checked=on_checked)
+    finally:
+        carried = [task for task in tasks if (task.content_type, task.url) in pending]
+        with db.unit_of_work("check_plan"):
+            planner.carry(carried)
+            planner.prune()
+        if carried:
+            logger.warning(f"Не проверено {len(carried)} тайтлов, они первыми попадут в следующий запуск")
+        page_perf.log_summary()
+
+def reset_release(content_type: str, movie: Movie):
+    """Обнуляет дату выхода, чтобы тайтл попал в следующую отправку"""
+    db.update_table(
+        table_name=content_type,
+        data=Movie(url=movie.url).to_dict,
+        updates=Movie(date_now=None).to_dict
+    )
+
+
+def fail_stage(post: Post, error, retry: bool = True):
+    """
+    Отмечает неудачный этап отправки. Следующая попытка повторит только его.
+    Когда попытки исчерпаны, тайтл, как и раньше, начинает всё заново.
+    """
+
+    if tracker.fail(post.progress, error, retry=retry):
+        tracker.forget(post.progress)
+        reset_release(post.content_type, post.movie)
+        message.send_report(f"Не удалось отправить {post.title_full}: {error}")
+
+
+def fetch_trailer(post: Post) -> str:
+    """
+    Ищет трейлер на YouTube, выбирает лучший по метаданным и скачивает его.
+    Остальные ссылки - запасные на случай ошибки скачивания. Пройденные этапы не повторяются.
+    """
+
+    progress = post.progress
+    if not progress.youtube_links:
+        youtube_links = get_youtube_links(video_name=post.title_trailer)
+        if not youtube_links:
+            raise RuntimeError(f"Трейлер не найден: {post.title_trailer}")
+        youtube_links = rank_youtube_links(
+            youtube_links, title=post.movie.title_original, year=post.movie.year_end or post.movie.year_start
+        )
+        if not youtube_links:
+            raise RuntimeError(f"Нет подходящего трейлера: {post.title_trailer}")
+        tracker.advance(progress, STAGE_LINKS, youtube_links=youtube_links)
+
+    # Сначала пробуем уже скачанное видео, оно скорее всего лежит в хранилище
+    youtube_links = progress.youtube_links
+    if progress.video_url:
+        youtube_links = [progress.video_url] + [link for link in youtube_links if link != progress.video_url]
+    for youtube_link in youtube_links:
+        try:
+            video_path = download_video(url=youtube_link, output_name=post.title_trailer)
+            if progress.stage != STAGE_DOWNLOADED or progress.video_url != youtube_link:
+                tracker.advance(progress, STAGE_DOWNLOADED, video_url=youtube_link)
+            return video_path
+        except DeadlineExceeded as e:
+            # Превышение уже учтено в метриках, пробуем следующую ссылку (если срок задачи не истёк)
+            logger.warning(e)
+        except Exception as e:
+            if "Sign in to confirm your age." in str(e):
+                continue
+            message.send_report(e)
+    raise RuntimeError(f"Не удалось скачать трейлер: {post.title_trailer}")
+
+
+def prepare_trailers(content_type: str, posts: list[Post]) -> list[Post]:
+    """
+    Скачивает трейлеры и, если включено, перекодирует их в пуле процессов параллельно со скачиванием.
+    Посты без трейлера откладываются до следующей попытки.
+    """
+
+    ready = []
+    with TranscodePool() as pool:
+        for post in posts:
+            if post.progress.file_id:
+                # Трейлер уже загружен в Telegram при прошлой попытке, файл не нужен
+                ready.append(post)
+                continue
+            if expired():
+                # Срок задачи истёк: пост уйдёт при следующей попытке
+                fail_stage(post, DeadlineExceeded("срок задачи истёк до скачивания трейлера"))
+                continue
+            try:
+                post.video_path = fetch_trailer(post)
+            except Exception as e:
+                fail_stage(post, e)
+                continue
+            pool.submit(post.video_path)
+            ready.append(post)
+
+        for post in ready:
+            if post.video_path:
+                post.video_path = pool.result(post.video_path)
+    return ready
 
-                categories = movie.get_translated_categories()
-                countries = movie.get_translated_countries()
 
-                # Фильтрация
-                if not Movie.filter_passes(categories, CATEGORY_BAN_LIST):
+def send_posts(content_type: str, posts: list[Post]):
+    """Рассылает посты по чатам подписчиков и отмечает, куда каждый пост уже отправлен"""
+    fanout = FanOut()
+    try:
+        if DIGEST_MODE:
+            fanout.send_digest(content_type, posts)
+        else:
+            fanout.send_posts(posts)
+    finally:
+        # Трейлеры остаются в хранилище до вытеснения
+        for post in posts:
+            if post.video_path:
+                trailer_store.release(post.video_path)
+
+    with db.unit_of_work(f"send_posts.{content_type}"):
+        for post in posts:
+            delivered = fanout.delivered.get(post.movie.url, set())
+            post.progress.sent_to = sorted(set(post.progress.sent_to or []) | delivered)
+            if set(post.audience) <= delivered:
+                tracker.advance(post.progress, STAGE_SENT)
+            else:
+                # В следующий раз пост уйдёт только в чаты, где не получилось
+                fail_stage(post, fanout.errors.get(post.movie.url, "Пост отправлен не во все чаты"))
+    fanout.log_summary(posts)
+
+
+def pending_movies(content_type: str):
+    """Фильмы, отправка которых ранее сорвалась и пора повторить попытку"""
+    for progress in tracker.pending(content_type):
+        row = db.get_table(table_name=content_type, data=Movie(url=progress.url).to_dict)
+        if row:
+            yield Movie.from_dict(row)
+        else:
+            tracker.forget(progress)
+
+
+@time_spent
+@job_deadline(SEND_DEADLINE)
+def send_new_movies(only_pending: bool = False, since: datetime = None):
+    """
+    Отправляет новые релизы и повторяет незавершённые отправки.
+    :param only_pending: Только повторить отложенные отправки, не трогая новые релизы.
+    :param since: Отправить релизы с date_now не раньше since, по умолчанию за последние 2 часа.
+    """
+
+    if not send_lock.acquire(blocking=False):
+        logger.warning("Отправка уже идёт, пропускаю запуск")
+        return
+    try:
+        logger.info("Запускаю отправку сообщения в telegram")
+        tracker.ensure_table()
+        subscribers = registry.all()
+        if not subscribers:
+            logger.warning("Нет подписчиков для рассылки")
+            return
+        # Строки, которые отфильтровали бы все подписчики, не загружаются и не переводятся
+        ban_filter = shared_ban_filter(subscribers)
+
+        for content_type, content_type_url in CATEGORY_URLS.items():
+            movies = pending_movies(content_type)
+            if not only_pending:
+                # Проверяем что вышло за последнее время
+                time_ago = since or datetime.now(timezone.utc) - timedelta(hours=2)
+                recent_movies = db.iter_table(
+                    table_name=content_type,
+                    data={**Movie(date_now=(">=", time_ago)).to_dict, **ban_filter},
+                    sort_by="rating DESC"
+                )
+                movies = chain(movies, Movie.from_rows(recent_movies))
+
+            candidates, seen = [], set()
+            for movie in movies:
+                if movie.url in seen:
                     continue
-                if not Movie.filter_passes(countries, COUNTRY_BAN_LIST):
+                seen.add(movie.url)
+                progress = tracker.load(content_type, movie.url)
+                if not tracker.is_due(progress):
                     continue
 
-                year_mod = movie.year_start
-                if movie.year_end:
-                    year_mod = f"{movie.year_start}-{movie.year_end}"
-                title_trailer = f"{movie.title_original} {movie.year_start} трейлер"
-                if movie.year_end:
-                    title_trailer = f"{movie.title_original} {movie.year_end} трейлер"
-                title_full = f"{movie.title} ({year_mod})"
-
-                # Кодируем название фильма для YouTube-поиска
-                title_trailer_encoded = urllib.parse.quote_plus(title_trailer)
-                youtube_url = f"https://www.youtube.com/results?search_query={title_trailer_encoded}"
-
-                title_original_display = f"<b><a href='{youtube_url}'>{movie.title_original}</a></b>\n"
-                if movie.title_original == movie.title:
-                    title_original_display = ""
-
-                genre_content = (
-                    f"<b><u>#{content_type}</u></b>\n"
-                    f"<b><a href='{youtube_url}'>{title_full}</a></b>\n"
-                    f"{title_original_display}"
-                    f"{countries}\n"
-                    f"🎬 {categories}\n"
-                    f"⭐️ <a href='{movie.url}'>{movie.rating}</a>\n"
-                    f"{movie.description}")
-
-                try:
-                    # Получаем трейлер
-                    youtube_links = get_youtube_links(video_name=title_trailer)
-                    video_path = None
-                    for youtube_link in youtube_links:
-                        try:
-                            video_path = download_video(url=youtube_link, output_name=title_trailer)
-                            break
-                        except Exception as e:
-                            if "Sign in to confirm your age." in str(e):
-                                continue
-                            message.send_report(e)
-                    if len(genre_content) <= 4096:
-                        message.send_telegram_video(video_path=video_path, message=genre_content)
-                    else:
-                        message.send_report(f"Сообщение не отправилось. Длина сообщения: {len(genre_content)}")
-                    # Удаление файла
-                    if video_path:
-                        os.remove(video_path)
-                except Exception as e:
-                    # Обнуляем дату выхода фильма
-                    db.update_table(
-                        table_name=content_type,
-                        data=Movie(url=movie.url).to_dict,
-                        updates=Movie(date_now=None).to_dict
-                    )
-                    message.send_report(e)
+                # Переводы берутся из кэша по набору жанров/стран
+                categories = movie.get_translated_categories()
+                countries = movie.get_translated_countries()
+
+                # Фильтры подписчиков за один проход; чаты, куда пост уже ушёл, пропускаем
+                sent_to = set(progress.sent_to or [])
+                audience = [
+                    subscriber.chat_id for subscriber in subscribers
+                    if subscriber.chat_id not in sent_to and subscriber.accepts(categories, countries)
+                ]
+                if audience:
+                    candidates.append((movie, progress, audience))
+
+            # Посты собираются и проверяются до поиска трейлеров: на неотправляемые не тратим сеть
+            posts = []
+            rendered = render_posts(content_type, [movie for movie, _, _ in candidates])
+            for post, (_, progress, audience) in zip(rendered, candidates):
+                post.progress = progress
+                post.audience = audience
+                problem = caption_problem(post)
+                if problem:
+                    # Повтор не поможет, а сброс date_now повторял бы ошибку и отчёт каждый день
+                    tracker.fail(post.progress, problem, retry=False)
+                    message.send_report(f"Не удалось отправить {post.title_full}: {problem}")
+                else:
+                    posts.append(post)
+
+            posts = prepare_trailers(content_type, posts)
+            send_posts(content_type, posts)
+
+        log_transcode_summary()
+        page_perf.log_summary()
+    finally:
+        send_lock.release()
+
+@time_spent
+def archive_tables():
+    logger.info("Запускаю перенос устаревших записей в архив")
+    compact_tables(db)
+
+def flush_journal():
+    """Применяет записи, отложенные, пока бд была недоступна"""
+    try:
+        db.flush_journal()
+    except UNAVAILABLE_ERRORS:
+        pass
+
+def create_search_indexes():
+    """
+    Триграммные индексы для поиска командами бота - один раз при запуске.
+    CREATE EXTENSION может требовать прав, которых у пользователя бд нет: это не должно мешать рассылке.
+    """
+
+    for content_type in CATEGORY_URLS:
+        try:
+            db.create_table(table_name=content_type)
+            db.create_search_index(table_name=content_type)
+        except Exception as e:
+            message.send_report(f"Индексы поиска по названию не созданы: {e}")
+            return
 
 scheduler = BlockingScheduler()
+scheduler.add_job(archive_tables, 'cron', hour=13, minute=0)
 scheduler.add_job(check_updates, 'cron', hour=14, minute=0)
 scheduler.add_job(update_table, 'cron', hour=15, minute=0)
 scheduler.add_job(send_new_movies, 'cron', hour=16, minute=0)
+scheduler.add_job(send_new_movies, 'interval', minutes=SEND_RETRY_INTERVAL, kwargs={"only_pending": True})
+scheduler.add_job(flush_journal, 'interval', seconds=DB_RETRY_INTERVAL)
 
 if __name__ == "__main__":
+    trailer_store.cleanup()
+    if BOT_COMMANDS_ENABLED:
+        create_search_indexes()
+        movie_cache.load()
+        CommandBot(movie_cache).start()
+    # Дайджест собирается раз в день, отправлять его по каждому релизу незачем
+    if PUSH_SEND and not DIGEST_MODE:
+        ReleaseListener(send_new_movies, busy=send_lock.locked).start()
     scheduler.start()
\ No newline at end of file
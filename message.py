@@ -1,84 +1,182 @@
 import json
 import os
-import traceback
+import time
 
 import requests
 from loguru import logger
 
+from deadlines import DeadlineExceeded, record_overrun, remaining
+from metrics import metrics
+from reporter import Reporter
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_BOT_CHAT_ID = os.getenv("TELEGRAM_BOT_CHAT_ID")
 TELEGRAM_REPORT_CHAT_ID = os.getenv("TELEGRAM_REPORT_CHAT_ID")
+REPORT_REQUEST_TIMEOUT = 30
+TELEGRAM_MAX_RETRY_AFTER = 60  # дольше ждать при 429 не будем, попытка уйдёт в повтор отправки
+TELEGRAM_REQUEST_TIMEOUT = float(os.getenv("TELEGRAM_REQUEST_TIMEOUT", 30))  # сек на запрос к Bot API
+TELEGRAM_UPLOAD_TIMEOUT = float(os.getenv("TELEGRAM_UPLOAD_TIMEOUT", 300))  # сек на ответ при загрузке видео
 
-def send_report(message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    error = f"{message}\n{traceback.format_exc()}"
+
+def api_url(method):
+    return f"{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/{method}"
+
+
+def post_report(text):
+    url = api_url("sendMessage")
     data = {
         'chat_id': TELEGRAM_REPORT_CHAT_ID,
-        'text': error,
+        'text': text,
         'parse_mode': 'HTML',
     }
-    requests.post(url, data=data)
-    logger.error(error)
+    response = requests.post(url, data=data, timeout=REPORT_REQUEST_TIMEOUT)
+    if not response.ok:
+        logger.warning(f"Отчёт не отправлен. Код статуса: {response.status_code}: {response.text}")
+
+
+reporter = Reporter(sender=post_report)
+
+
+def send_report(message):
+    """Ставит ошибку в фоновый канал отчётов (дайджест отправится позже)"""
+    reporter.report(message)
 
 
 def send_telegram(message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    url = api_url("sendMessage")
     data = {
         'chat_id': TELEGRAM_BOT_CHAT_ID,
         'text': message,
         'parse_mode': 'HTML',
         'disable_web_page_preview': 'true'
     }
-    response = requests.post(url, data=data)
+    response = post_with_timeout(url, data=data)
     if response.status_code == 200:
         logger.success('Сообщение в Telegram отправлено')
     else:
         send_report(f'Ошибка при отправке сообщения в Telegram. Код статуса: {response.status_code}: {response.text}')
 
 
-def send_telegram_video(video_path, message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendVideo"
+def record_upload(video_paths, started):
+    """Учитывает объём и время загрузки видео в метриках"""
+    metrics.incr("upload.bytes", sum(os.path.getsize(path) for path in video_paths))
+    metrics.incr("upload.seconds", time.perf_counter() - started)
+
+
+def post_with_timeout(url, data, files=None):
+    """requests.post с таймаутом не дольше срока текущей задачи (deadlines)"""
+    timeout = remaining(TELEGRAM_UPLOAD_TIMEOUT if files else TELEGRAM_REQUEST_TIMEOUT)
     try:
-        with open(video_path, 'rb') as video_file:
-            data = {
-                'chat_id': TELEGRAM_BOT_CHAT_ID,
-                'caption': message,
-                'supports_streaming': True,
-                'parse_mode': 'HTML',
-                'disable_web_page_preview': 'true'
-            }
-            files = {'video': video_file}
-            response = requests.post(url, data=data, files=files)
-            if response.status_code == 200:
-                logger.success('Видео успешно отправлено в Telegram.')
-            else:
-                send_report(f'Ошибка при отправке видео. Код статуса: {response.status_code}, {response.text}')
+        return requests.post(url, data=data, files=files, timeout=timeout)
+    except requests.Timeout as e:
+        record_overrun("telegram")
+        raise DeadlineExceeded(f"Telegram не ответил за {timeout:.1f} сек") from e
+
+
+def telegram_post(url, data, files=None):
+    """
+    POST в Bot API. При 429 Too Many Requests один раз ждёт retry_after и повторяет запрос.
+    :param files: Словарь для requests, открытые файлы перематываются перед повтором.
+    """
+
+    response = post_with_timeout(url, data=data, files=files)
+    if response.status_code == 429:
+        try:
+            retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+        except ValueError:
+            retry_after = 1
+        logger.warning(f"Telegram ограничил частоту запросов, повтор через {retry_after} сек")
+        time.sleep(remaining(min(retry_after, TELEGRAM_MAX_RETRY_AFTER)))
+        for file in (files or {}).values():
+            (file[1] if isinstance(file, tuple) else file).seek(0)
+        response = post_with_timeout(url, data=data, files=files)
+    return response
+
+
+def video_file_id(result: dict):
+    """file_id видео из отправленного сообщения (Telegram может сохранить видео как animation/document)"""
+    for kind in ("video", "animation", "document"):
+        if isinstance(result, dict) and result.get(kind):
+            return result[kind].get("file_id")
+    return None
+
+
+def send_telegram_video(video_path, message, chat_id=None, file_id=None):
+    """
+    Отправляет видео с подписью.
+    :param file_id: Видео, уже загруженное в Telegram, - отправляется без повторной загрузки.
+    :return: file_id отправленного видео ("" если Telegram его не вернул), None при ошибке.
+    """
+
+    url = api_url("sendVideo")
+    data = {
+        'chat_id': chat_id or TELEGRAM_BOT_CHAT_ID,
+        'caption': message,
+        'supports_streaming': True,
+        'parse_mode': 'HTML',
+        'disable_web_page_preview': 'true'
+    }
+    try:
+        if file_id:
+            data['video'] = file_id
+            response = telegram_post(url, data=data)
+        else:
+            with open(video_path, 'rb') as video_file:
+                started = time.perf_counter()
+                response = telegram_post(url, data=data, files={'video': video_file})
+                record_upload([video_path], started)
+        if response.status_code == 200:
+            logger.success('Видео успешно отправлено в Telegram.')
+            return video_file_id(response.json().get("result")) or file_id or ""
+        send_report(f'Ошибка при отправке видео. Код статуса: {response.status_code}, {response.text}')
     except FileNotFoundError:
         send_report('Файл видео не найден')
+    return None
 
 
-def send_telegram_videos(video_paths, message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMediaGroup"
+def send_telegram_videos(video_paths, message, chat_id=None, file_ids=None):
+    """
+    Отправляет альбом видео с общей подписью.
+    :param file_ids: Уже загруженные видео по порядку video_paths (None - загрузить файл).
+    :return: Список file_id отправленных видео, None при ошибке.
+    """
+
+    url = api_url("sendMediaGroup")
+    file_ids = file_ids or [None] * len(video_paths)
     media, files = [], {}
     try:
-        for idx, video_path in enumerate(video_paths):
-            if os.path.exists(video_path):
+        for idx, (video_path, file_id) in enumerate(zip(video_paths, file_ids)):
+            if file_id:
+                source = file_id
+            else:
                 file_key = f"video{idx}"
                 files[file_key] = (os.path.basename(video_path), open(video_path, "rb"), "video/mp4")
-                media.append({
-                    "type": "video",
-                    "media": f"attach://{file_key}",
-                    "supports_streaming": True,
-                    'parse_mode': 'HTML',
-                    'disable_web_page_preview': 'true'
-                })
+                source = f"attach://{file_key}"
+            media.append({
+                "type": "video",
+                "media": source,
+                "supports_streaming": True,
+                'parse_mode': 'HTML',
+                'disable_web_page_preview': 'true'
+            })
 
         if media:
             media[0]["caption"] = message  # Подпись добавляется к первому видео
-            response = requests.post(url, data={"chat_id": TELEGRAM_BOT_CHAT_ID, "media": json.dumps(media)}, files=files)
-            logger.success("Видео успешно отправлены." if response.ok else f"Ошибка: {response.status_code} - {response.text}")
-
-        for file in files.values():
-            file[1].close() # Закрываем файл
+            started = time.perf_counter()
+            response = telegram_post(
+                url, data={"chat_id": chat_id or TELEGRAM_BOT_CHAT_ID, "media": json.dumps(media)}, files=files
+            )
+            if files:
+                record_upload([file[1].name for file in files.values()], started)
+            if response.ok:
+                logger.success("Видео успешно отправлены.")
+                sent = response.json().get("result") or []
+                return [video_file_id(result) for result in sent]
+            send_report(f'Ошибка при отправке альбома. Код статуса: {response.status_code}, {response.text}')
     except FileNotFoundError:
         send_report('Файл видео не найден')
+    finally:
+        for file in files.values():
+            file[1].close() # Закрываем файл
+    return None
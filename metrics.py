@@ -0,0 +1,49 @@
+import threading
+from collections import defaultdict, deque
+
+METRICS_WINDOW = 1000
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль q (0..100) методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Metrics:
+    """Счётчики и скользящие окна наблюдений в памяти процесса"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self.counters: dict[str, float] = defaultdict(float)
+        self.observations: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.observations[name].append(value)
+
+    def counter(self, name: str) -> float:
+        return self.counters.get(name, 0)
+
+    def summary(self, name: str) -> dict:
+        """Число наблюдений, p50, p90, p99 и максимум по окну"""
+        with self._lock:
+            values = list(self.observations.get(name, ()))
+        return {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": max(values, default=0.0),
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,121 @@
+"""
+Перенос данных бота между PostgreSQL и SQLite в обе стороны.
+
+    python migrate_db.py postgres sqlite [--sqlite-path imdb_bot.sqlite3]
+    python migrate_db.py sqlite postgres
+
+Переносятся таблицы категорий, их архивы, send_progress, subscribers, chart_snapshots,
+release_checks и chart_rows.
+Таблицы в целевой бд создаются по схемам из кода; если в таблице уже есть строки,
+она пропускается (--replace сначала очищает её). id сохраняются, в PostgreSQL после
+переноса сдвигается счётчик SERIAL.
+"""
+
+import argparse
+import os
+
+# Перенос должен падать, а не откладывать записи в журнал
+os.environ["DB_JOURNAL_PATH"] = ""
+
+from loguru import logger  # noqa: E402
+
+from archive import ARCHIVE_SCHEMA, archive_table_name  # noqa: E402
+from database import (DB_BATCH_SIZE, MOVIE_SCHEMA, DatabaseRepository, PostgreSQLDatabaseRepository,  # noqa: E402
+                      SQLiteConnection, SQLiteDatabaseRepository, create_repository)
+from dictionaries import CATEGORY_URLS  # noqa: E402
+from fingerprints import CHART_ROWS_SCHEMA, CHART_ROWS_TABLE  # noqa: E402
+from planner import PLAN_SCHEMA, PLAN_TABLE  # noqa: E402
+from progress import PROGRESS_SCHEMA, PROGRESS_TABLE  # noqa: E402
+from snapshots import SNAPSHOT_SCHEMA, SNAPSHOT_TABLE  # noqa: E402
+from subscribers import SUBSCRIBERS_SCHEMA, SUBSCRIBERS_TABLE  # noqa: E402
+
+
+def migrated_tables() -> dict[str, dict]:
+    """{table_name: schema} всех таблиц бота"""
+    tables = {}
+    for content_type in CATEGORY_URLS:
+        tables[content_type] = MOVIE_SCHEMA
+        tables[archive_table_name(content_type)] = ARCHIVE_SCHEMA
+    tables[PROGRESS_TABLE] = PROGRESS_SCHEMA
+    tables[SUBSCRIBERS_TABLE] = SUBSCRIBERS_SCHEMA
+    tables[SNAPSHOT_TABLE] = SNAPSHOT_SCHEMA
+    tables[PLAN_TABLE] = PLAN_SCHEMA
+    tables[CHART_ROWS_TABLE] = CHART_ROWS_SCHEMA
+    return tables
+
+
+def reset_serial(repository: DatabaseRepository, table_name: str):
+    """После вставки строк с явными id следующий SERIAL должен идти за максимальным"""
+    with repository.db_connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table_name}",
+            (table_name,)
+        )
+        repository.db_connection.connection.commit()
+
+
+def migrate_table(
+    source: DatabaseRepository,
+    target: DatabaseRepository,
+    table_name: str,
+    schema: dict,
+    replace: bool = False,
+    batch_size: int = DB_BATCH_SIZE
+) -> int:
+    """
+    Копирует таблицу порциями по batch_size строк.
+    :return: Число перенесённых строк (-1, если таблица пропущена).
+    """
+
+    if not source.table_exists(table_name):
+        logger.info(f"{table_name}: нет в исходной бд")
+        return -1
+    columns = list(schema)
+    target.create_table(table_name=table_name, schema=schema)
+    if target.get_table(table_name=table_name, columns=[columns[0]]):
+        if not replace:
+            logger.warning(f"{table_name}: в целевой бд уже есть строки, пропускаю (--replace очистит таблицу)")
+            return -1
+        target.delete_from_table(table_name=table_name, data={columns[0]: ("IS NOT", None)})
+
+    sort_by = "id ASC" if "id" in schema else None
+    copied, batch = 0, []
+    for row in source.iter_table(table_name=table_name, sort_by=sort_by, columns=columns, batch_size=batch_size):
+        batch.append(tuple(row[column] for column in columns))
+        if len(batch) >= batch_size:
+            copied += target.copy_into_table(table_name=table_name, columns=columns, rows=batch)
+            batch = []
+    if batch:
+        copied += target.copy_into_table(table_name=table_name, columns=columns, rows=batch)
+
+    if isinstance(target, PostgreSQLDatabaseRepository) and schema.get("id") == "SERIAL PRIMARY KEY":
+        reset_serial(target, table_name)
+    logger.success(f"{table_name}: перенесено {copied} строк")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", choices=["postgres", "sqlite"])
+    parser.add_argument("target", choices=["postgres", "sqlite"])
+    parser.add_argument("--sqlite-path", help="Файл SQLite, по умолчанию DB_SQLITE_PATH")
+    parser.add_argument("--replace", action="store_true", help="Очищать непустые таблицы в целевой бд")
+    parser.add_argument("--batch", type=int, default=DB_BATCH_SIZE)
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("Исходная и целевая бд совпадают")
+
+    def open_repository(backend: str) -> DatabaseRepository:
+        if backend == "sqlite":
+            return SQLiteDatabaseRepository(SQLiteConnection(args.sqlite_path))
+        return create_repository(backend)
+
+    source, target = open_repository(args.source), open_repository(args.target)
+    total = 0
+    for table_name, schema in migrated_tables().items():
+        total += max(migrate_table(source, target, table_name, schema, args.replace, args.batch), 0)
+    logger.info(f"Перенос {args.source} -> {args.target} завершён: {total} строк")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import Optional, Union
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Union
 
 from dictionaries import (CATEGORY_TRANSLATED, COUNTRY_TRANSLATED,
                           rename_from_dict)
 
 
-@dataclass
+@lru_cache(maxsize=4096)
+def translated_categories(categories: tuple[str, ...]) -> str:
+    """Перевод набора жанров. У многих тайтлов набор совпадает, поэтому переводится один раз"""
+    return rename_from_dict(items=list(categories), item_translates=CATEGORY_TRANSLATED, prefix="#")
+
+
+@lru_cache(maxsize=4096)
+def translated_countries(countries: tuple[str, ...]) -> str:
+    return rename_from_dict(items=list(countries), item_translates=COUNTRY_TRANSLATED)
+
+
+@dataclass(slots=True)
 class Movie:
     id: Optional[Union[int, tuple[str, int]]] = ...
     title: Optional[str] = ...
@@ -19,25 +31,18 @@ class Movie:
     countries: Optional[list[str]] = ...
     url: Optional[str] = ...
     date_now: Optional[Union[datetime, tuple[str, datetime]]] = ...
+    last_seen: Optional[Union[datetime, tuple[str, datetime]]] = ...
 
     @property
     def to_dict(self):
-        return {k: v for k, v in self.__dict__.items() if v is not ...}
+        values = ((f.name, getattr(self, f.name)) for f in fields(self))
+        return {k: v for k, v in values if v is not ...}
 
     def get_translated_categories(self) -> str:
-        categories = rename_from_dict(
-            items=self.categories,
-            item_translates=CATEGORY_TRANSLATED,
-            prefix="#"
-        )
-        return categories
+        return translated_categories(tuple(self.categories or ()))
 
     def get_translated_countries(self) -> str:
-        countries = rename_from_dict(
-            items=self.countries,
-            item_translates=COUNTRY_TRANSLATED,
-        )
-        return countries
+        return translated_countries(tuple(self.countries or ()))
 
     @staticmethod
     def filter_passes(types: list[str], ban_list: list[str]) -> bool:
@@ -47,3 +52,9 @@ class Movie:
     def from_dict(cls, data: dict):
         return cls(**data) if data else None
 
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> Iterator["Movie"]:
+        """Лениво превращает строки бд (в т.ч. с частью колонок) в Movie"""
+        for row in rows:
+            yield cls(**row)
+
@@ -0,0 +1,151 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+from weakref import WeakKeyDictionary
+
+from loguru import logger
+
+from metrics import metrics
+
+# Navigation Timing Level 2 и Resource Timing открытой страницы, все времена в мс
+NAVIGATION_SCRIPT = """
+const nav = performance.getEntriesByType("navigation")[0];
+if (!nav) return null;
+const resources = performance.getEntriesByType("resource");
+const byType = {};
+let transfer = 0, resourcesEnd = 0;
+for (const r of resources) {
+    byType[r.initiatorType] = (byType[r.initiatorType] || 0) + 1;
+    transfer += r.transferSize || 0;
+    resourcesEnd = Math.max(resourcesEnd, r.responseEnd);
+}
+return {
+    dns: nav.domainLookupEnd - nav.domainLookupStart,
+    connect: nav.connectEnd - nav.connectStart,
+    ttfb: nav.responseStart - nav.requestStart,
+    download: nav.responseEnd - nav.responseStart,
+    scripts: nav.domContentLoadedEventEnd - nav.responseEnd,
+    load: nav.loadEventEnd - nav.domContentLoadedEventEnd,
+    total: nav.loadEventEnd || nav.duration,
+    resources_end: resourcesEnd,
+    document_kb: (nav.transferSize || 0) / 1024,
+    resource_kb: transfer / 1024,
+    resources: resources.length,
+    by_type: byType
+};
+"""
+# Время, ушедшее на сеть, скрипты страницы и наши ожидания - в таком порядке в сводке
+SUMMARY_METRICS = ["ttfb", "download", "scripts", "load", "total", "get", "ready_wait", "sleep", "resources"]
+
+
+def page_type(url: str) -> str:
+    """Тип страницы для метрик: сайт и вид страницы без конкретного тайтла"""
+    parsed = urlparse(url)
+    host = parsed.netloc.removeprefix("www.").removeprefix("m.")
+    if host.endswith("imdb.com"):
+        if parsed.path.startswith("/title/"):
+            return "imdb.title"
+        return "imdb.chart"
+    if host.endswith("youtube.com"):
+        return "youtube.search" if parsed.path.startswith("/results") else "youtube.video"
+    return host or "unknown"
+
+
+@dataclass
+class PageVisit:
+    """Открытая в драйвере страница и наши ожидания на ней"""
+    page_type: str
+    url: str
+    ready_wait: float = 0.0  # ожидание document.readyState
+    sleep: float = 0.0  # фиксированные паузы (прокрутка, подгрузка)
+    started: float = field(default_factory=time.monotonic)
+
+
+class PagePerf:
+    """
+    Замеры загрузки страниц в Selenium по типам страниц: Navigation Timing браузера,
+    число и объём ресурсов, время driver.get и наши ожидания. Наблюдения идут в скользящие
+    окна metrics с именами page.<тип>.<метрика>, по ним считаются перцентили.
+    """
+
+    def __init__(self):
+        self.visits: WeakKeyDictionary = WeakKeyDictionary()  # драйвер -> текущая страница
+        self.page_types: set[str] = set()
+        self._lock = threading.Lock()
+
+    def observe(self, visit: PageVisit, name: str, value: float):
+        metrics.observe(f"page.{visit.page_type}.{name}", value)
+
+    def start(self, driver, url: str) -> PageVisit:
+        """Новая навигация драйвера; ожидания предыдущей страницы записываются"""
+        self.finish(driver)
+        visit = PageVisit(page_type=page_type(url), url=url)
+        with self._lock:
+            self.visits[driver] = visit
+            self.page_types.add(visit.page_type)
+        return visit
+
+    def loaded(self, driver, get_seconds: float):
+        """Записывает время driver.get и замеры браузера для только что открытой страницы"""
+        visit = self.visits.get(driver)
+        if visit is None:
+            return
+        self.observe(visit, "get", get_seconds * 1000)
+        try:
+            timing = driver.execute_script(NAVIGATION_SCRIPT)
+        except Exception as e:
+            logger.debug(f"Navigation Timing недоступен для {visit.url}: {e}")
+            return
+        if not timing:
+            return
+        by_type = timing.pop("by_type", {}) or {}
+        for name, value in timing.items():
+            if value is not None and value >= 0:
+                self.observe(visit, name, value)
+        for initiator, number in by_type.items():
+            self.observe(visit, f"resources.{initiator}", number)
+
+    def waited(self, driver, seconds: float, kind: str = "sleep"):
+        """Учитывает наше ожидание на текущей странице драйвера: kind - ready_wait или sleep"""
+        visit = self.visits.get(driver)
+        if visit is not None:
+            setattr(visit, kind, getattr(visit, kind) + seconds)
+
+    def sleep(self, driver, seconds: float):
+        """time.sleep с учётом паузы в замерах страницы"""
+        time.sleep(seconds)
+        self.waited(driver, seconds)
+
+    def finish(self, driver):
+        """Страница закрыта или драйвер ушёл на другую: записываем наши ожидания на ней"""
+        with self._lock:
+            visit = self.visits.pop(driver, None)
+        if visit is None:
+            return
+        self.observe(visit, "ready_wait", visit.ready_wait * 1000)
+        self.observe(visit, "sleep", visit.sleep * 1000)
+        self.observe(visit, "ours", (time.monotonic() - visit.started) * 1000)
+
+    def summary(self) -> dict[str, dict[str, dict]]:
+        """{тип страницы: {метрика: metrics.summary}}"""
+        with self._lock:
+            page_types = sorted(self.page_types)
+        return {
+            kind: {name: metrics.summary(f"page.{kind}.{name}") for name in SUMMARY_METRICS}
+            for kind in page_types
+        }
+
+    def log_summary(self):
+        """Пишет в лог p50/p90 по типам страниц: сеть, скрипты страницы, наши ожидания"""
+        for kind, summaries in self.summary().items():
+            if not summaries["get"]["count"]:
+                continue
+            parts = ", ".join(
+                f"{name} {summary['p50']:.0f}/{summary['p90']:.0f}"
+                for name, summary in summaries.items() if summary["count"]
+            )
+            logger.info(f"Страницы {kind} ({summaries['get']['count']}), p50/p90 (мс, resources - штук): {parts}")
+
+
+page_perf = PagePerf()
@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 from deep_translator import GoogleTranslator
@@ -7,17 +8,44 @@ from loguru import logger
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.client_config import ClientConfig
 from selenium.webdriver.support.ui import WebDriverWait
 from yt_dlp import YoutubeDL
 
 import message
+from archive import archive_table_name
 from database import db
+from fingerprints import ChartFingerprints, chart_fingerprint, item_fingerprints, row_fingerprint
+from deadlines import DeadlineExceeded, call_with_timeout, deadline, expired, in_context, record_overrun, remaining
+from journal import deferrable
+from metrics import metrics
 from movie import Movie
+from pageperf import page_perf
+from progress import ProgressTracker
+from push import notify_release
+from snapshots import save_snapshot
+from sources import CHART_SOURCES, ChartSource, merge_charts
+from trailer_rank import TRAILER_CANDIDATES, score_trailer, trailer_rejection
+from trailer_store import trailer_store, video_id
 
 SELENIUM_COMMAND_EXECUTOR = os.getenv("SELENIUM_COMMAND_EXECUTOR")
+CHART_FETCH_WORKERS = int(os.getenv("CHART_FETCH_WORKERS", 2))  # одновременных сессий Selenium для чартов
+# Пределы внешних вызовов (сек); вместе со сроком задачи (deadlines) действует меньший
+WEBDRIVER_COMMAND_TIMEOUT = float(os.getenv("WEBDRIVER_COMMAND_TIMEOUT", 120))  # HTTP-запрос к Selenium
+PAGE_LOAD_TIMEOUT = float(os.getenv("PAGE_LOAD_TIMEOUT", 60))
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", 20))
+YTDLP_SOCKET_TIMEOUT = float(os.getenv("YTDLP_SOCKET_TIMEOUT", 20))
+YTDLP_METADATA_TIMEOUT = float(os.getenv("YTDLP_METADATA_TIMEOUT", 60))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", 600))  # скачивание одного трейлера целиком
 
 class WebDriverContext:
     def __init__(self, *args, **kwargs):
+        command_executor = kwargs.get("command_executor")
+        if command_executor and "client_config" not in kwargs:
+            # По умолчанию Selenium ждёт ответа удалённого браузера до 120 сек на каждую команду
+            kwargs["client_config"] = ClientConfig(
+                remote_server_addr=command_executor, timeout=remaining(WEBDRIVER_COMMAND_TIMEOUT)
+            )
         self.driver = webdriver.Remote(*args, **kwargs)
 
     def __enter__(self):
@@ -26,6 +54,7 @@ class WebDriverContext:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         logger.info("Закрытие соединения с Selenium")
+        page_perf.finish(self.driver)
         self.driver.quit()
 
 
@@ -39,15 +68,40 @@ chrome_options.add_argument(f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x6
                             f"(KHTML, like Gecko) Chrome/130.0.6723.116 Safari/537.36")
 chrome_options.add_argument("--lang=ru-RU")
 
+# Отпечатки строк чартов прошлых запусков
+chart_fingerprints = ChartFingerprints(db)
+# Состояния отправки релизов (см. main.send_new_movies)
+progress_tracker = ProgressTracker(db)
+
+
+def load_page(driver, url):
+    """
+    driver.get с таймаутом загрузки не дольше срока текущей задачи.
+    Время загрузки и Navigation Timing страницы записываются в pageperf.
+    """
+
+    driver.set_page_load_timeout(remaining(PAGE_LOAD_TIMEOUT))
+    page_perf.start(driver, url)
+    started = time.monotonic()
+    try:
+        driver.get(url)
+    except TimeoutException as e:
+        record_overrun("webdriver.get")
+        raise DeadlineExceeded(f"Страница не загрузилась: {url}") from e
+    page_perf.loaded(driver, time.monotonic() - started)
+
 
 def is_page_loaded(driver, timeout=10):
+    started = time.monotonic()
     try:
-        WebDriverWait(driver, timeout).until(
+        WebDriverWait(driver, remaining(timeout)).until(
             lambda d: d.execute_script("return document.readyState") == "complete"
         )
-        time.sleep(1)
+        page_perf.waited(driver, time.monotonic() - started, kind="ready_wait")
+        page_perf.sleep(driver, 1)
         return True
     except TimeoutException:
+        page_perf.waited(driver, time.monotonic() - started, kind="ready_wait")
         message.send_report(TimeoutException)
         return False
 
@@ -60,7 +114,7 @@ def scroll_to_bottom(driver, delay=0.15):
     while current_position < total_height:
         # Прокрутить на текущую позицию
         driver.execute_script(f"window.scrollTo(0, {current_position});")
-        time.sleep(delay)  # Задержка для подгрузки контента
+        page_perf.sleep(driver, delay)  # Задержка для подгрузки контента
 
         # Обновляем позицию
         current_position += step_height
@@ -94,7 +148,7 @@ def scroll_and_find_element(driver, xpath, delay=0.15, max_attempts=10):
         while current_position < last_height:
             # Прокрутить на текущую позицию
             driver.execute_script(f"window.scrollTo(0, {current_position});")
-            time.sleep(delay)  # Задержка для подгрузки контента
+            page_perf.sleep(driver, delay)  # Задержка для подгрузки контента
 
             # Обновляем позицию
             current_position += step_height
@@ -106,61 +160,232 @@ def scroll_and_find_element(driver, xpath, delay=0.15, max_attempts=10):
     return None
 
 
-def get_top_movies_and_serials(content_type, content_type_url, current_year):
-    # Используем контекстный менеджер для управления драйвером
+def fetch_chart(driver, content_type_url, known: dict[str, dict] = None) -> list[dict]:
+    """
+    Разбирает страницу чарта IMDb.
+    :param known: {отпечаток: строка} прошлого запуска (fingerprints). Строки с тем же отпечатком не разбираются.
+    :return: Список строк чарта вида {rank, title, year_start, year_end, url, rating, fingerprint}.
+    """
+
+    load_page(driver, content_type_url)
+
+    is_page_loaded(driver)
+
+    movie_table_element = driver.find_element(
+        By.XPATH,
+        './/ul[contains(@class, "ipc-metadata-list")]'
+    )
+    movie_items_list = movie_table_element.find_elements(
+        By.XPATH,
+        './/li[contains(@class, "ipc-metadata-list-summary-item")]'
+    )
+
+    known = known or {}
+    row_fingerprints = item_fingerprints(driver, movie_items_list)
+    rows = []
+    for n, (movie_item, item_fingerprint) in enumerate(zip(movie_items_list, row_fingerprints), start=1):
+        if item_fingerprint in known:
+            # Строка не изменилась с прошлого запуска: разбор (4 запроса к Selenium) не нужен
+            row = known[item_fingerprint]
+            rows.append({
+                "rank": n,
+                "title": row["title"],
+                "year_start": row["year_start"],
+                "year_end": row["year_end"],
+                "url": row["url"],
+                "rating": row["rating"],
+                "fingerprint": item_fingerprint
+            })
+            metrics.incr("chart.rows_reused")
+            continue
+        try:
+            title_text = movie_item.find_element(By.XPATH, './/h3[contains(@class, "ipc-title__text")]').text
+            logger.debug(f"{n}/{len(movie_items_list)} {title_text}")
+
+            try:
+                year_text = movie_item.find_element(
+                    By.XPATH,
+                    './/span[contains(@class, "cli-title-metadata-item")]'
+                ).text
+            except Exception as e:
+                logger.warning(f"year_text не найден: {e}")
+                continue
+            # Получаем года, присваиваем year_end None если его нет
+            year_parts = year_text.split('–')
+            year_start = int(year_parts[0])
+            year_end = int(year_parts[1]) if len(year_parts) > 1 and year_parts[1].isdigit() else None
+
+            url_element = movie_item.find_element(
+                By.XPATH,
+                './/a[contains(@class, "ipc-title-link-wrapper")]'
+            )
+            url = url_element.get_attribute("href").split('/?ref')[0]
+
+            try:
+                rating = float(movie_item.find_element(
+                    By.XPATH,
+                    './/span[contains(@class, "ipc-rating-star--rating")]'
+                ).text)
+            except Exception as e:
+                logger.warning(f"rating не найден: {e}")
+                rating = None
+
+            rows.append({
+                "rank": n,
+                "title": title_text,
+                "year_start": year_start,
+                "year_end": year_end,
+                "url": url,
+                "rating": rating,
+                "fingerprint": item_fingerprint
+            })
+            metrics.incr("chart.rows_parsed")
+        except Exception as e:
+            message.send_report(e)
+    return rows
+
+
+def restore_from_archive(content_type, url) -> bool:
+    """Возвращает тайтл из архива, если он снова попал в чарт, чтобы не отправить его повторно"""
+    archive_table = archive_table_name(content_type)
+    if not db.table_exists(archive_table):
+        return False
+    restored = db.move_rows(table_name=archive_table, target_table=content_type, data=Movie(url=url).to_dict)
+    if restored:
+        logger.info(f"{url} вернулся в чарт и восстановлен из архива")
+    return bool(restored)
+
+
+def fetch_source(source: ChartSource, known: dict[str, dict] = None) -> list[dict]:
+    """Скачивает один чарт в отдельной сессии Selenium"""
     with WebDriverContext(command_executor=SELENIUM_COMMAND_EXECUTOR, options=chrome_options) as driver:
-        logger.debug(f"Получаем все {content_type}")
-        driver.get(content_type_url)
+        logger.debug(f"Получаем чарт {source.name}")
+        return fetch_chart(driver, source.url, known=known)
 
-        is_page_loaded(driver)
 
-        movie_table_element = driver.find_element(
-            By.XPATH,
-            './/ul[contains(@class, "ipc-metadata-list")]'
-        )
-        movie_items_list = movie_table_element.find_elements(
-            By.XPATH,
-            './/li[contains(@class, "ipc-metadata-list-summary-item")]'
-        )
+def fetch_sources(
+    sources: list[ChartSource] = None,
+    workers: int = CHART_FETCH_WORKERS,
+    known: dict[str, dict[str, dict]] = None
+) -> dict[ChartSource, list[dict]]:
+    """
+    Параллельно скачивает чарты и сохраняет их снимки.
+    Чарт, который не удалось скачать, пропускается.
+    :param known: {имя чарта: строки прошлого запуска по отпечаткам}, см. fetch_chart.
+    :return: Строки чартов в порядке sources.
+    """
 
-        for n, movie_item in enumerate(movie_items_list, start=1):
+    sources = CHART_SOURCES if sources is None else sources
+    known = known or {}
+    charts = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as executor:
+        futures = [
+            (source, executor.submit(in_context(fetch_source), source, known.get(source.name)))
+            for source in sources
+        ]
+        for source, future in futures:
             try:
-                title_text = movie_item.find_element(By.XPATH, './/h3[contains(@class, "ipc-title__text")]').text
-                logger.debug(f"{n}/{len(movie_items_list)} {title_text}")
-
-                try:
-                    year_text = movie_item.find_element(
-                        By.XPATH,
-                        './/span[contains(@class, "cli-title-metadata-item")]'
-                    ).text
-                except Exception as e:
-                    logger.warning(f"year_text не найден: {e}")
-                    continue
-                # Получаем года, присваиваем year_end None если его нет
-                year_parts = year_text.split('–')
-                year_start = int(year_parts[0])
-                year_end = int(year_parts[1]) if len(year_parts) > 1 and year_parts[1].isdigit() else None
+                charts[source] = future.result()
+            except Exception as e:
+                message.send_report(f"Не удалось получить чарт {source.name}: {e}")
+                continue
+            try:
+                save_snapshot(db, source.name, charts[source])
+            except Exception as e:
+                message.send_report(e)
+    return charts
+
+
+def update_charts(current_year, sources: list[ChartSource] = None):
+    """
+    Обновляет таблицы категорий по всем чартам. Тайтл из нескольких чартов
+    попадает в таблицу один раз (sources.merge_charts).
+    """
+
+    sources = CHART_SOURCES if sources is None else sources
+    reused = metrics.counter("chart.rows_reused")
+    chart_fingerprints.ensure_table()
+    stored = {source.name: chart_fingerprints.load(source.name) for source in sources}
+    known = {name: chart_fingerprints.fresh(rows) for name, rows in stored.items()}
+    charts = fetch_sources(sources, known=known)
+
+    # Строки, сверенные с бд в прошлые запуски и с тех пор не изменившиеся, сверять не нужно
+    unchanged_charts = 0
+    for source, rows in charts.items():
+        for row in rows:
+            row["fingerprint"] = row_fingerprint(row)
+            previous = known[source.name].get(row["fingerprint"])
+            row["unchanged"] = previous is not None
+            if previous:
+                row["checked_on"] = previous["checked_on"]
+        if rows and chart_fingerprint(rows) == chart_fingerprint(stored[source.name]):
+            unchanged_charts += 1
+            logger.info(f"Чарт {source.name} не изменился с прошлого запуска")
+
+    merged = merge_charts(charts)
+    duplicates = sum(len(rows) for rows in charts.values()) - sum(len(rows) for rows in merged.values())
+    if duplicates:
+        logger.info(f"Чартов: {len(charts)}, повторов тайтлов убрано: {duplicates}")
+    failed, deferred = set(), False
+    for content_type, chart_rows in merged.items():
+        result = save_chart_rows(content_type, chart_rows, current_year)
+        if result is None:
+            deferred = True
+        else:
+            failed |= result
+    # Отложенные строки сверятся позже, поэтому отпечатки остаются прошлые
+    if not deferred:
+        for source, rows in charts.items():
+            chart_fingerprints.save(source.name, rows, failed)
+
+    total = sum(len(rows) for rows in merged.values())
+    skipped = sum(1 for rows in merged.values() for row in rows if row["unchanged"])
+    logger.info(
+        f"Чартов без изменений: {unchanged_charts}/{len(charts)}, строк без изменений: {skipped}/{total} "
+        f"(не разобрано {metrics.counter('chart.rows_reused') - reused:.0f}, сверка с бд пропущена для {skipped})"
+    )
+
+
+@deferrable
+def save_chart_rows(content_type, chart_rows, current_year):
+    """
+    Добавляет новые тайтлы чарта в таблицу категории и отмечает last_seen у всех тайтлов чарта.
+    Строки с пометкой unchanged (не изменились с прошлой сверки) с таблицей не сверяются.
+    Если бд недоступна, строки чарта сохраняются в журнал и разбираются после восстановления подключения.
+    :return: url строк, которые не удалось сверить, или None, если сверка отложена.
+    """
+
+    if not db.available():
+        db.defer("save_chart_rows", content_type=content_type, chart_rows=chart_rows, current_year=current_year)
+        return None
+    changed = [row for row in chart_rows if not row.get("unchanged")]
+    if not changed:
+        logger.info(f"{content_type}: чарт не изменился, сверка с бд пропущена")
+    failed = set()
+    # Записи чарта - общими транзакциями, ошибка в строке откатывает только её
+    with db.unit_of_work(f"save_chart_rows.{content_type}"):
+        for row in changed:
+            try:
+                title_text, url = row["title"], row["url"]
+                year_start, year_end, rating = row["year_start"], row["year_end"], row["rating"]
 
                 if year_start < current_year and (year_end is None or year_end < current_year):
                     logger.warning(f"{year_start=}<{current_year} and {year_end=}")
                     continue
-
-                url_element = movie_item.find_element(
-                    By.XPATH,
-                    './/a[contains(@class, "ipc-title-link-wrapper")]'
-                )
-                url = url_element.get_attribute("href").split('/?ref')[0]
-
-                try:
-                    rating = float(movie_item.find_element(
-                        By.XPATH,
-                        './/span[contains(@class, "ipc-rating-star--rating")]'
-                    ).text)
-                except Exception as e:
-                    logger.warning(f"rating не найден: {e}")
+                if rating is None:
                     continue
 
-                movie = Movie.from_dict(db.get_table(table_name=content_type, data=Movie(url=url).to_dict))
+                movie = Movie.from_dict(db.get_table(
+                    table_name=content_type,
+                    data=Movie(url=url).to_dict,
+                    columns=["title", "year_end", "url"]
+                ))
+                if not movie and restore_from_archive(content_type, url):
+                    movie = Movie.from_dict(db.get_table(
+                        table_name=content_type,
+                        data=Movie(url=url).to_dict,
+                        columns=["title", "year_end", "url"]
+                    ))
                 # Если нет в таблице, добавляем фильм
                 if not movie:
                     data = Movie(
@@ -184,105 +409,177 @@ def get_top_movies_and_serials(content_type, content_type_url, current_year):
                             date_now=None
                         ).to_dict
                         db.update_table(table_name=content_type, data=data, updates=updates)
+                        # Новый сезон отправляется заново, с первого этапа
+                        progress_tracker.forget_release(content_type, url)
                         logger.success(f"Изменился year_end у {title_text}: {movie.year_end} => {year_end}")
                     logger.warning(f"{title_text} есть в таблице {content_type}. title={movie.title}, url={movie.url}")
 
             except Exception as e:
+                failed.add(row["url"])
                 message.send_report(e)
 
+        # Отмечаем всё, что сейчас в чарте: по last_seen архивируются выпавшие из чарта тайтлы
+        chart_urls = tuple(row["url"] for row in chart_rows)
+        if chart_urls:
+            db.update_table(
+                table_name=content_type,
+                data=Movie(url=("IN", chart_urls)).to_dict,
+                updates=Movie(last_seen=datetime.now(timezone.utc)).to_dict
+            )
+    return failed
 
-def check_movie_release(content_type, not_released_movies):
-    with WebDriverContext(command_executor=SELENIUM_COMMAND_EXECUTOR, options=chrome_options) as driver:
-        logger.debug(f"Проверяем вышли ли новые {content_type}")
-        for n, movie in enumerate(not_released_movies, start=1):
-            try:
-                movie = Movie.from_dict(movie)
-                logger.debug(f"{n}/{len(not_released_movies)} {movie.title} {movie.url}")
-                driver.get(movie.url)
-
-                is_page_loaded(driver)
-                # Промотка страницы для прогрузки нужного элемента
-                category_span = scroll_and_find_element(
-                    driver=driver,
-                    xpath='//span[contains(text(), "Genre")]/following-sibling::div',
-                    delay=0.1,
-                    max_attempts=60)
-                if not category_span:
-                    logger.warning("Элемент category_span не найден.")
-                    continue
 
-                title_text = driver.find_element(
-                    By.XPATH,
-                    './/span[contains(@data-testid, "hero__primary-text")]'
-                ).text
+def fetch_title_page(driver, url) -> dict | None:
+    """
+    Разбирает страницу фильма/сериала на IMDb.
+    :return: Словарь вида {title, title_original, rating, description, countries, categories, released}
+             или None, если страница не прогрузилась или у тайтла нет рейтинга.
+    """
 
-                try:
-                    rating = float(driver.find_element(
-                        By.XPATH,
-                        './/div[contains(@data-testid, "hero-rating-bar__aggregate-rating__score")]/span'
-                    ).text)
-                except:
-                    continue
+    load_page(driver, url)
 
-                try:
-                    title_original_text = driver.find_element(
-                        By.XPATH,
-                        './/div[contains(text(), "Original title: ")]'
-                    ).text.split("Original title: ")[1]
-                except:
-                    title_original_text = title_text
+    is_page_loaded(driver)
+    # Промотка страницы для прогрузки нужного элемента
+    category_span = scroll_and_find_element(
+        driver=driver,
+        xpath='//span[contains(text(), "Genre")]/following-sibling::div',
+        delay=0.1,
+        max_attempts=60)
+    if not category_span:
+        logger.warning("Элемент category_span не найден.")
+        return None
 
-                description_text = driver.find_element(
-                    By.XPATH,
-                    './/span[contains(@data-testid, "plot-l")]'
-                ).get_attribute("textContent")
-                description_text_trans = GoogleTranslator(source="en", target="ru").translate(description_text)
+    title_text = driver.find_element(
+        By.XPATH,
+        './/span[contains(@data-testid, "hero__primary-text")]'
+    ).text
 
-                country_span = driver.find_element(
-                    By.XPATH,
-                    '//span[contains(text(), "of origin")]/following-sibling::div'
-                )
-                country_elements = country_span.find_elements(By.XPATH,  './/li')
-                country_list = [element.text for element in country_elements]
-
-                category_elements = category_span.find_elements(By.XPATH,  './/li')
-                category_list = [element.text for element in category_elements]
-                try:
-                    # Поиск даты (фильм не вышел)
-                    driver.find_element(By.XPATH, './/div[contains(@data-testid, "tm-box-up")]')
-                    data = Movie(
-                        url=movie.url
-                    ).to_dict
-                    updates = Movie(
-                        title=title_text,
-                        title_original=title_original_text,
-                        categories=category_list,
-                        rating=rating,
-                        description=description_text_trans,
-                        countries=country_list
-                    ).to_dict
-                    db.update_table(table_name=content_type, data=data, updates=updates)
+    try:
+        rating = float(driver.find_element(
+            By.XPATH,
+            './/div[contains(@data-testid, "hero-rating-bar__aggregate-rating__score")]/span'
+        ).text)
+    except:
+        return None
+
+    try:
+        title_original_text = driver.find_element(
+            By.XPATH,
+            './/div[contains(text(), "Original title: ")]'
+        ).text.split("Original title: ")[1]
+    except:
+        title_original_text = title_text
+
+    description_text = driver.find_element(
+        By.XPATH,
+        './/span[contains(@data-testid, "plot-l")]'
+    ).get_attribute("textContent")
+
+    country_span = driver.find_element(
+        By.XPATH,
+        '//span[contains(text(), "of origin")]/following-sibling::div'
+    )
+    country_elements = country_span.find_elements(By.XPATH,  './/li')
+    country_list = [element.text for element in country_elements]
+
+    category_elements = category_span.find_elements(By.XPATH,  './/li')
+    category_list = [element.text for element in category_elements]
+    try:
+        # Поиск даты (фильм не вышел)
+        driver.find_element(By.XPATH, './/div[contains(@data-testid, "tm-box-up")]')
+        released = False
+    except:
+        released = True
+
+    return {
+        "title": title_text,
+        "title_original": title_original_text,
+        "rating": rating,
+        "description": description_text,
+        "countries": country_list,
+        "categories": category_list,
+        "released": released
+    }
+
+
+def translate(text: str) -> str:
+    # У GoogleTranslator нет таймаута, зависший запрос не должен держать проверку релизов
+    return call_with_timeout(
+        "translate", TRANSLATE_TIMEOUT, GoogleTranslator(source="en", target="ru").translate, text
+    )
+
+
+def check_movie_release(content_type, not_released_movies, checked: set = None):
+    """
+    Проверяет страницы не вышедших тайтлов и отмечает вышедшие.
+    :param checked: url, уже проверенные за этот запуск (пополняется), - повторно не открываются.
+    """
+
+    check_releases([(content_type, movie) for movie in not_released_movies], checked)
+
+
+def check_releases(movies: list[tuple[str, dict]], checked: set = None, on_checked=None):
+    """
+    Проверяет тайтлы разных категорий в заданном порядке в одной сессии Selenium.
+    :param movies: Пары (content_type, строка тайтла).
+    :param checked: url, уже проверенные за этот запуск (пополняется), - повторно не открываются.
+    :param on_checked: Функция (content_type, url, seconds), вызывается после каждой завершённой проверки.
+    """
+
+    checked = set() if checked is None else checked
+    with WebDriverContext(command_executor=SELENIUM_COMMAND_EXECUTOR, options=chrome_options) as driver, \
+            db.unit_of_work("check_movie_release"):
+        logger.debug(f"Проверяем вышли ли новые тайтлы: {len(movies)}")
+        for n, (content_type, movie) in enumerate(movies, start=1):
+            if expired():
+                logger.warning(f"Срок задачи истёк, {len(movies) - n + 1} тайтлов проверим в следующий раз")
+                break
+            movie = Movie.from_dict(movie)
+            if movie.url in checked:
+                continue
+            checked.add(movie.url)
+            logger.debug(f"{n}/{len(movies)} {content_type} {movie.title} {movie.url}")
+            started = time.monotonic()
+            try:
+                check_release(driver, content_type, movie)
+            except DeadlineExceeded as e:
+                # Превышение уже учтено в метриках, тайтл проверим в следующий раз
+                logger.warning(f"{movie.url}: {e}")
+                if expired():
+                    checked.discard(movie.url)
                     continue
-                except:
-                    pass
-
-                # Обновляем выход фильма
-                data = Movie(
-                    url=movie.url
-                ).to_dict
-                updates = Movie(
-                    title=title_text,
-                    title_original=title_original_text,
-                    categories=category_list,
-                    rating=rating,
-                    description=description_text_trans,
-                    countries=country_list,
-                    date_now=datetime.now(timezone.utc)
-                ).to_dict
-                db.update_table(table_name=content_type, data=data, updates=updates)
-                logger.success(f"Новый релиз: {title_text}")
             except Exception as e:
                 message.send_report(e)
+            if on_checked:
+                on_checked(content_type, movie.url, time.monotonic() - started)
+
+
+def check_release(driver, content_type, movie: Movie):
+    """Обновляет данные тайтла со страницы и отмечает выход"""
+    page = fetch_title_page(driver, movie.url)
+    if not page:
+        return
+
+    data = Movie(
+        url=movie.url
+    ).to_dict
+    updates = Movie(
+        title=page["title"],
+        title_original=page["title_original"],
+        categories=page["categories"],
+        rating=page["rating"],
+        description=translate(page["description"]),
+        countries=page["countries"]
+    )
+    if not page["released"]:
+        db.update_table(table_name=content_type, data=data, updates=updates.to_dict)
+        return
+
+    # Обновляем выход фильма
+    updates.date_now = datetime.now(timezone.utc)
+    db.update_table(table_name=content_type, data=data, updates=updates.to_dict)
+    notify_release(content_type, movie.url)
+    logger.success(f"Новый релиз: {page['title']}")
 
 
 def get_youtube_links(video_name: str) -> list:
@@ -290,7 +587,7 @@ def get_youtube_links(video_name: str) -> list:
     with WebDriverContext(command_executor=SELENIUM_COMMAND_EXECUTOR, options=chrome_options) as driver:
         logger.debug(f"Получаем ссылку на {video_name}")
         try:
-            driver.get(f"https://www.youtube.com/results?search_query={video_name}")
+            load_page(driver, f"https://www.youtube.com/results?search_query={video_name}")
 
             is_page_loaded(driver)
 
@@ -308,20 +605,105 @@ def get_youtube_links(video_name: str) -> list:
             return []
 
 
-def download_video(url, output_name):
-    logger.debug(f"Скачиваем {output_name}")
-    options = {
-        "format": "best",
-        "outtmpl": output_name + ".%(ext)s",
-        "noprogress": True,
-        "quiet": True,
+def ytdlp_metadata(url) -> dict:
+    """
+    Метаданные видео без скачивания. Ошибка yt-dlp (например, возрастное ограничение)
+    возвращается в поле error, а не выбрасывается.
+    """
+
+    options = {"quiet": True, "no_warnings": True, "skip_download": True, "socket_timeout": YTDLP_SOCKET_TIMEOUT}
+    try:
+        with YoutubeDL(options) as ydl:
+            info = call_with_timeout(
+                "ytdlp.metadata", YTDLP_METADATA_TIMEOUT, ydl.extract_info, url, download=False, process=False
+            )
+    except Exception as e:
+        return {"url": url, "error": str(e)}
+    return {
+        "url": url,
+        "title": info.get("title"),
+        "channel": info.get("channel") or info.get("uploader"),
+        "channel_is_verified": info.get("channel_is_verified"),
+        "duration": info.get("duration"),
+        "age_limit": info.get("age_limit"),
+        "availability": info.get("availability"),
+        "live_status": info.get("live_status"),
     }
-    with YoutubeDL(options) as ydl:
-        info = ydl.extract_info(url, download=True)
-        file_path = ydl.prepare_filename(info)
+
+
+def rank_youtube_links(urls: list[str], title: str, year: int = None) -> list[str]:
+    """
+    Параллельно получает метаданные первых TRAILER_CANDIDATES ссылок, отбрасывает
+    недоступные и явно не трейлеры, остальные сортирует по score_trailer.
+    Непроверенные ссылки из хвоста выдачи остаются запасными в конце списка.
+    """
+
+    candidates, rest = urls[:TRAILER_CANDIDATES], urls[TRAILER_CANDIDATES:]
+    if not candidates:
+        return []
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        metas = list(executor.map(in_context(ytdlp_metadata), candidates))
+
+    scored = []
+    for position, meta in enumerate(metas):
+        reason = trailer_rejection(meta)
+        if reason:
+            metrics.incr("trailer.rejected")
+            logger.debug(f"Пропускаем {meta['url']}: {reason}")
+            continue
+        scored.append((score_trailer(meta, title, year, position), meta["url"]))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    if scored:
+        logger.debug(f"Лучший трейлер для {title}: {scored[0][1]} ({scored[0][0]})")
+    return [url for _, url in scored] + rest
+
+
+def ytdlp_download(url, output_dir) -> str:
+    """
+    Скачивает видео через yt-dlp в папку output_dir и возвращает путь к файлу.
+    Скачивание прерывается, если не уложилось в DOWNLOAD_TIMEOUT или срок задачи.
+    """
+
+    def check_deadline(progress):
+        if expired():
+            raise DeadlineExceeded(f"Скачивание не уложилось в срок: {url}")
+
+    with deadline(DOWNLOAD_TIMEOUT):
+        options = {
+            "format": "best",
+            "outtmpl": os.path.join(output_dir, "%(id)s.%(ext)s"),
+            "noprogress": True,
+            "quiet": True,
+            "socket_timeout": remaining(YTDLP_SOCKET_TIMEOUT),
+            "progress_hooks": [check_deadline],
+        }
+        try:
+            with YoutubeDL(options) as ydl:
+                info = ydl.extract_info(url, download=True)
+                file_path = ydl.prepare_filename(info)
+        except Exception as e:
+            # yt-dlp может обернуть исключение из progress_hooks в DownloadError
+            if expired():
+                record_overrun("ytdlp.download")
+                raise DeadlineExceeded(f"Скачивание не уложилось в срок: {url}") from e
+            raise
     return file_path
 
 
+def download_video(url, output_name=None):
+    """
+    Возвращает путь к трейлеру из хранилища, при промахе скачивает его туда.
+    После отправки файл нужно отпустить через trailer_store.release.
+    """
+
+    key = video_id(url)
+    file_path = trailer_store.get(key)
+    if file_path:
+        return file_path
+    logger.debug(f"Скачиваем {output_name or url}")
+    return trailer_store.put(key, lambda output_dir: ytdlp_download(url, output_dir))
+
+
 if __name__ == "__main__":
     pass
 
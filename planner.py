@@ -0,0 +1,177 @@
+import math
+import os
+import statistics
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+from loguru import logger
+
+from database import DatabaseRepository
+from snapshots import get_snapshot
+from sources import CHART_SOURCES
+
+PLAN_TABLE = "release_checks"
+PLAN_SCHEMA = {
+    "id": "SERIAL PRIMARY KEY",
+    "content_type": "TEXT NOT NULL",
+    "url": "TEXT NOT NULL",
+    "checks": "INT NOT NULL DEFAULT 0",
+    "cost": "FLOAT",  # сек на проверку, сглаженное среднее прошлых проверок
+    "last_checked": "TIMESTAMPTZ",
+    "carried": "INT NOT NULL DEFAULT 0",  # запусков подряд, в которые до тайтла не дошла очередь
+    "updated_at": "TIMESTAMPTZ",
+}
+
+CHECK_BUDGET = float(os.getenv("CHECK_BUDGET", 40 * 60))  # сек на проверку не вышедших тайтлов за запуск
+CHECK_DEFAULT_COST = float(os.getenv("CHECK_DEFAULT_COST", 20))  # сек на проверку, пока замеров нет
+PLAN_KEEP_DAYS = int(os.getenv("PLAN_KEEP_DAYS", 30))  # дней хранения замеров тайтлов, которых нет в очереди
+COST_SMOOTHING = 0.3  # вес последнего замера в оценке стоимости
+UNRANKED_WEIGHT = 0.3  # вес тайтла, которого сегодня нет ни в одном чарте
+RECHECK_HOURS = 24  # за сколько часов после проверки шанс выхода снова близок к полному
+
+
+@dataclass
+class CheckTask:
+    """Проверка одного не вышедшего тайтла"""
+    content_type: str
+    movie: dict
+    cost: float
+    value: float
+    state: dict | None = None
+
+    @property
+    def url(self) -> str:
+        return self.movie["url"]
+
+    @property
+    def score(self) -> float:
+        """Ожидаемая польза на секунду проверки"""
+        return self.value / max(self.cost, 1.0)
+
+
+def release_closeness(year_start: int | None, today: date) -> float:
+    """Чем ближе год начала к текущему, тем вероятнее, что тайтл уже вышел"""
+    if year_start is None:
+        return 0.5
+    if year_start <= today.year:
+        return 1.0
+    if year_start == today.year + 1:
+        return 0.4
+    return 0.1
+
+
+class CheckPlanner:
+    """
+    Очередь проверок check_movie_release на запуск update_table.
+    Стоимость проверки оценивается по прошлым замерам тайтла, ценность - по позиции в чартах,
+    рейтингу, близости выхода и времени с прошлой проверки. Проверки идут по убыванию
+    ценности на секунду в пределах бюджета, до остальных очередь дойдёт в следующий запуск.
+    """
+
+    def __init__(self, repository: DatabaseRepository, default_cost: float = CHECK_DEFAULT_COST):
+        self.repository = repository
+        self.default_cost = default_cost
+
+    def ensure_table(self):
+        self.repository.create_table(table_name=PLAN_TABLE, schema=PLAN_SCHEMA)
+        self.repository.create_index(table_name=PLAN_TABLE, columns=["content_type", "url"])
+
+    def load_states(self, content_type: str) -> dict[str, dict]:
+        rows = self.repository.get_table(table_name=PLAN_TABLE, data={"content_type": content_type}, fetchone=False)
+        return {row["url"]: dict(row) for row in rows}
+
+    def chart_ranks(self, content_type: str, day: date) -> dict[str, int]:
+        """Лучшая позиция тайтла среди сегодняшних снимков чартов категории"""
+        ranks = {}
+        for source in CHART_SOURCES:
+            if source.category != content_type:
+                continue
+            try:
+                snapshot = get_snapshot(self.repository, source.name, day)
+            except Exception as e:
+                logger.warning(f"Нет снимка чарта {source.name}: {e}")
+                continue
+            for url, row in snapshot.items():
+                ranks[url] = min(ranks.get(url, row["rank"]), row["rank"])
+        return ranks
+
+    def value(self, movie: dict, rank: int | None, state: dict | None, now: datetime) -> float:
+        """Ценность проверки: важность тайтла, умноженная на шанс, что он вышел с прошлой проверки"""
+        importance = (movie.get("rating") or 5.0) / 10
+        importance *= 1 / (1 + (rank - 1) / 50) if rank else UNRANKED_WEIGHT
+        chance = release_closeness(movie.get("year_start"), now.date())
+        last_checked = state and state["last_checked"]
+        if last_checked:
+            hours = (now - last_checked).total_seconds() / 3600
+            chance *= 1 - math.exp(-max(hours, 0) / RECHECK_HOURS)
+        carried = state["carried"] if state else 0
+        return importance * chance * (1 + carried)
+
+    def plan(self, movies: dict[str, list[dict]]) -> list[CheckTask]:
+        """
+        :param movies: {content_type: строки не вышедших тайтлов (url, rating, year_start)}.
+        :return: Проверки всех категорий по убыванию ценности на секунду.
+        """
+
+        now = datetime.now(timezone.utc)
+        tasks = []
+        for content_type, rows in movies.items():
+            states = self.load_states(content_type)
+            ranks = self.chart_ranks(content_type, now.date())
+            costs = [state["cost"] for state in states.values() if state["cost"]]
+            fallback = statistics.median(costs) if costs else self.default_cost
+            for movie in rows:
+                state = states.get(movie["url"])
+                tasks.append(CheckTask(
+                    content_type=content_type,
+                    movie=dict(movie),
+                    cost=state["cost"] if state and state["cost"] else fallback,
+                    value=self.value(movie, ranks.get(movie["url"]), state, now),
+                    state=state
+                ))
+        tasks.sort(key=lambda task: task.score, reverse=True)
+        return tasks
+
+    @staticmethod
+    def fits(tasks: list[CheckTask], budget: float) -> int:
+        """Сколько первых проверок укладывается в бюджет по оценке"""
+        spent = 0.0
+        for n, task in enumerate(tasks):
+            spent += task.cost
+            if spent > budget:
+                return n
+        return len(tasks)
+
+    def save(self, task: CheckTask, updates: dict):
+        """Строка обновляется по content_type и url: id вставки, отложенной в журнал, неизвестен"""
+        updates["updated_at"] = datetime.now(timezone.utc)
+        if task.state is None:
+            task.state = {"content_type": task.content_type, "url": task.url, "checks": 0, "carried": 0, **updates}
+            self.repository.add_into_table(table_name=PLAN_TABLE, data=dict(task.state))
+        else:
+            task.state.update(updates)
+            self.repository.update_table(
+                table_name=PLAN_TABLE, data={"content_type": task.content_type, "url": task.url}, updates=updates
+            )
+
+    def record(self, task: CheckTask, seconds: float):
+        """Учитывает проверку тайтла и её длительность"""
+        cost = task.state["cost"] if task.state else None
+        self.save(task, {
+            "cost": seconds if not cost else cost + COST_SMOOTHING * (seconds - cost),
+            "checks": (task.state["checks"] if task.state else 0) + 1,
+            "last_checked": datetime.now(timezone.utc),
+            "carried": 0
+        })
+
+    def carry(self, tasks: list[CheckTask]):
+        """Тайтлы, до которых не дошла очередь, в следующий запуск поднимаются выше"""
+        for task in tasks:
+            self.save(task, {"carried": (task.state["carried"] if task.state else 0) + 1})
+
+    def prune(self):
+        """Удаляет замеры тайтлов, которые давно не были в очереди (вышли или выпали из таблиц)"""
+        self.repository.delete_from_table(
+            table_name=PLAN_TABLE,
+            data={"updated_at": ("<", datetime.now(timezone.utc) - timedelta(days=PLAN_KEEP_DAYS))}
+        )
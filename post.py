@@ -0,0 +1,120 @@
+import html
+import re
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Optional
+
+from movie import Movie
+from progress import Progress
+
+CAPTION_LIMIT = 1024  # Лимит подписи к видео в Bot API (текст без разметки)
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+@dataclass
+class Post:
+    """Подготовленный к отправке пост о вышедшем фильме/сериале"""
+    content_type: str
+    movie: Movie
+    title_trailer: str
+    title_full: str
+    youtube_url: str
+    caption: str
+    video_path: Optional[str] = None
+    progress: Optional[Progress] = None
+    audience: list[str] = field(default_factory=list)  # чаты, которым пост ещё нужно отправить
+
+
+def caption_length(caption: str) -> int:
+    """Длина подписи так, как её считает Telegram: текст без HTML-разметки в единицах UTF-16"""
+    text = html.unescape(TAG_RE.sub("", caption))
+    return len(text.encode("utf-16-le")) // 2
+
+
+def trim_text(text: str, length: int) -> str:
+    """Обрезает текст до length единиц UTF-16 по границе слова и добавляет многоточие"""
+    if len(text.encode("utf-16-le")) // 2 <= length:
+        return text
+    if length <= 1:
+        return ""
+    text = text.encode("utf-16-le")[:(length - 1) * 2].decode("utf-16-le", errors="ignore")
+    cut = text.rstrip()
+    if " " in cut:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip(" ,.;:-") + "…"
+
+
+def render_caption(content_type: str, movie: Movie, youtube_url: str, title_full: str,
+                   categories: str, countries: str, description: str) -> str:
+    title_original_display = f"<b><a href='{youtube_url}'>{html.escape(movie.title_original or '')}</a></b>\n"
+    if movie.title_original == movie.title:
+        title_original_display = ""
+
+    return (
+        f"<b><u>#{content_type}</u></b>\n"
+        f"<b><a href='{youtube_url}'>{html.escape(title_full)}</a></b>\n"
+        f"{title_original_display}"
+        f"{countries}\n"
+        f"🎬 {categories}\n"
+        f"⭐️ <a href='{movie.url}'>{movie.rating}</a>\n"
+        f"{html.escape(description or '')}")
+
+
+def render_post(
+    content_type: str, movie: Movie, categories: str, countries: str, limit: int = CAPTION_LIMIT
+) -> Post:
+    """
+    Собирает текст поста и поисковый запрос трейлера.
+    Описание, не влезающее в лимит подписи к видео, обрезается.
+    :param categories: Переведённые жанры (Movie.get_translated_categories).
+    :param countries: Переведённые страны (Movie.get_translated_countries).
+    """
+
+    year_mod = movie.year_start
+    if movie.year_end:
+        year_mod = f"{movie.year_start}-{movie.year_end}"
+    title_trailer = f"{movie.title_original} {movie.year_start} трейлер"
+    if movie.year_end:
+        title_trailer = f"{movie.title_original} {movie.year_end} трейлер"
+    title_full = f"{movie.title} ({year_mod})"
+
+    # Кодируем название фильма для YouTube-поиска
+    title_trailer_encoded = urllib.parse.quote_plus(title_trailer)
+    youtube_url = f"https://www.youtube.com/results?search_query={title_trailer_encoded}"
+
+    description = movie.description or ""
+    caption = render_caption(content_type, movie, youtube_url, title_full, categories, countries, description)
+    overflow = caption_length(caption) - limit
+    if overflow > 0 and description:
+        room = caption_length(html.escape(description)) - overflow
+        description = trim_text(description, room)
+        caption = render_caption(content_type, movie, youtube_url, title_full, categories, countries, description)
+
+    return Post(
+        content_type=content_type,
+        movie=movie,
+        title_trailer=title_trailer,
+        title_full=title_full,
+        youtube_url=youtube_url,
+        caption=caption
+    )
+
+
+def render_posts(content_type: str, movies: list[Movie], limit: int = CAPTION_LIMIT) -> list[Post]:
+    """
+    Собирает посты пачкой до любой сетевой работы (поиск и скачивание трейлеров).
+    Переводы жанров и стран берутся из кэша по набору (movie.translated_categories).
+    """
+
+    return [
+        render_post(content_type, movie, movie.get_translated_categories(), movie.get_translated_countries(), limit)
+        for movie in movies
+    ]
+
+
+def caption_problem(post: Post, limit: int = CAPTION_LIMIT) -> str | None:
+    """Причина, по которой Telegram не примет подпись поста, или None"""
+    length = caption_length(post.caption)
+    if length > limit:
+        return f"Подпись длиннее лимита Telegram даже без описания: {length} > {limit}"
+    return None
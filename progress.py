@@ -0,0 +1,168 @@
+import os
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from loguru import logger
+
+from database import DatabaseRepository
+
+PROGRESS_TABLE = "send_progress"
+PROGRESS_SCHEMA = {
+    "id": "SERIAL PRIMARY KEY",
+    "content_type": "TEXT NOT NULL",
+    "url": "TEXT NOT NULL",
+    "stage": "TEXT NOT NULL",
+    "youtube_links": "TEXT[]",
+    "video_url": "TEXT",
+    "file_id": "TEXT",  # трейлер, уже загруженный в Telegram
+    "sent_to": "TEXT[]",  # чаты, куда релиз уже отправлен
+    "attempts": "INT NOT NULL DEFAULT 0",
+    "next_attempt_at": "TIMESTAMPTZ",
+    "last_error": "TEXT",
+    "updated_at": "TIMESTAMPTZ",
+}
+
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", 5))
+SEND_BACKOFF_BASE = int(os.getenv("SEND_BACKOFF_BASE", 600))  # секунд до первой повторной попытки
+
+# Этапы отправки одного релиза
+STAGE_NEW = "new"
+STAGE_LINKS = "links"  # ссылки на трейлеры найдены
+STAGE_DOWNLOADED = "downloaded"  # трейлер скачан
+STAGE_SENT = "sent"  # сообщение отправлено во все чаты
+STAGE_FAILED = "failed"  # попытки исчерпаны
+
+
+@dataclass
+class Progress:
+    """Состояние отправки одного релиза"""
+    content_type: str
+    url: str
+    stage: str = STAGE_NEW
+    youtube_links: Optional[list[str]] = None
+    video_url: Optional[str] = None
+    file_id: Optional[str] = None
+    sent_to: Optional[list[str]] = None
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    id: Optional[int] = None
+    # Строка уже добавлена (в т.ч. отложенной в журнал вставкой, чей id ещё неизвестен)
+    stored: bool = field(default=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.stored = self.stored or self.id is not None
+
+    @property
+    def key(self) -> dict:
+        return {"content_type": self.content_type, "url": self.url}
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in (STAGE_SENT, STAGE_FAILED)
+
+    @property
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name not in ("id", "stored")}
+
+
+def backoff(attempts: int, base: int = SEND_BACKOFF_BASE) -> timedelta:
+    """Экспоненциальная задержка перед попыткой номер attempts + 1"""
+    return timedelta(seconds=base * 2 ** max(0, attempts - 1))
+
+
+class ProgressTracker:
+    """Сохраняет этапы отправки релизов, чтобы при сбое повторять только упавший шаг"""
+
+    def __init__(self, repository: DatabaseRepository, max_attempts: int = SEND_MAX_ATTEMPTS):
+        self.repository = repository
+        self.max_attempts = max_attempts
+
+    def ensure_table(self):
+        self.repository.create_table(table_name=PROGRESS_TABLE, schema=PROGRESS_SCHEMA)
+
+    def load(self, content_type: str, url: str) -> Progress:
+        """Состояние релиза. Новое состояние не сохраняется, пока не пройден первый этап"""
+        row = self.repository.get_table(
+            table_name=PROGRESS_TABLE,
+            data={"content_type": content_type, "url": url}
+        )
+        return Progress(**row) if row else Progress(content_type=content_type, url=url)
+
+    def pending(self, content_type: str) -> list[Progress]:
+        """Незавершённые релизы, для которых подошло время повторной попытки"""
+        rows = self.repository.get_table(
+            table_name=PROGRESS_TABLE,
+            data={"content_type": content_type, "next_attempt_at": ("<=", datetime.now(timezone.utc))},
+            sort_by="next_attempt_at ASC",
+            fetchone=False
+        )
+        return [Progress(**row) for row in rows]
+
+    @staticmethod
+    def is_due(progress: Progress) -> bool:
+        return not progress.finished and (
+            progress.next_attempt_at is None or progress.next_attempt_at <= datetime.now(timezone.utc)
+        )
+
+    def save(self, progress: Progress):
+        """
+        Строка обновляется по content_type и url, а не по id: вставка могла уйти в журнал,
+        и её id станет известен только после воспроизведения.
+        """
+
+        progress.updated_at = datetime.now(timezone.utc)
+        if not progress.stored:
+            progress.id = self.repository.add_into_table(table_name=PROGRESS_TABLE, data=progress.to_dict)
+            progress.stored = True
+        else:
+            self.repository.update_table(table_name=PROGRESS_TABLE, data=progress.key, updates=progress.to_dict)
+
+    def advance(self, progress: Progress, stage: str, **updates):
+        """Отмечает пройденный этап и сбрасывает счётчик попыток"""
+        for key, value in updates.items():
+            setattr(progress, key, value)
+        progress.stage = stage
+        progress.attempts = 0
+        progress.last_error = None
+        progress.next_attempt_at = None if progress.finished else datetime.now(timezone.utc)
+        self.save(progress)
+
+    def fail(self, progress: Progress, error, retry: bool = True) -> bool:
+        """
+        Учитывает неудачную попытку текущего этапа и назначает следующую с экспоненциальной задержкой.
+        :param retry: False - ошибка не исправится повтором, попытки сразу исчерпываются.
+        :return: True, если попытки исчерпаны.
+        """
+
+        progress.attempts = progress.attempts + 1 if retry else self.max_attempts
+        progress.last_error = str(error)[:1000]
+        if progress.attempts >= self.max_attempts:
+            progress.stage = STAGE_FAILED
+            progress.next_attempt_at = None
+        else:
+            progress.next_attempt_at = datetime.now(timezone.utc) + backoff(progress.attempts)
+            logger.warning(
+                f"Этап после '{progress.stage}' не пройден для {progress.url} "
+                f"(попытка {progress.attempts}/{self.max_attempts}), повтор в {progress.next_attempt_at:%H:%M}"
+            )
+        self.save(progress)
+        return progress.stage == STAGE_FAILED
+
+    def forget(self, progress: Progress):
+        """Удаляет состояние, чтобы релиз прошёл все этапы заново"""
+        if progress.stored:
+            self.forget_release(progress.content_type, progress.url)
+            progress.id = None
+            progress.stored = False
+
+    def forget_release(self, content_type: str, url: str):
+        """
+        Удаляет состояние отправки тайтла, у которого обнулили date_now: иначе завершённая
+        прошлая отправка (stage='sent') заставит пропустить повторный выход.
+        """
+
+        if self.repository.table_exists(PROGRESS_TABLE):
+            self.repository.delete_from_table(table_name=PROGRESS_TABLE, data={"content_type": content_type, "url": url})
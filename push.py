@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+
+import message
+from database import DatabaseRepository, db
+
+PUSH_SEND = os.getenv("PUSH_SEND", "true").lower() == "true"
+RELEASE_CHANNEL = os.getenv("RELEASE_CHANNEL", "movie_released")
+# Часы (местное время), когда новые релизы не отправляются сразу, например "23-8"; пусто - без тишины
+QUIET_HOURS = os.getenv("QUIET_HOURS", "")
+PUSH_MIN_INTERVAL = float(os.getenv("PUSH_MIN_INTERVAL", 10))  # минут между отправками по событиям
+PUSH_BATCH_DELAY = float(os.getenv("PUSH_BATCH_DELAY", 60))  # сек ожидания соседних релизов одной проверки
+PUSH_POLL_INTERVAL = 5  # сек, как часто слушатель проверяет, не пора ли отправлять
+
+
+def notify_release(content_type: str, movie_url: str):
+    """Сообщает слушателю, что у тайтла появилась дата выхода"""
+    db.notify(RELEASE_CHANNEL, json.dumps({"content_type": content_type, "url": movie_url}))
+
+
+def parse_quiet_hours(spec: str) -> tuple[int, int] | None:
+    """
+    "23-8" -> (23, 8). Конец не входит в тишину, интервал может переходить через полночь.
+    :return: None, если тишина не задана.
+    """
+
+    if not spec.strip():
+        return None
+    start, end = (int(hour) for hour in spec.split("-"))
+    if not (0 <= start < 24 and 0 <= end < 24):
+        raise ValueError(f"Неверные QUIET_HOURS: {spec}")
+    return start, end
+
+
+def is_quiet(now: datetime, quiet_hours: tuple[int, int] | None) -> bool:
+    if quiet_hours is None:
+        return False
+    start, end = quiet_hours
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+class ReleaseListener:
+    """
+    Отправляет новые релизы сразу после того, как check_movie_release отметил выход тайтла,
+    а не в плановое время. Соседние релизы одной проверки уходят одной отправкой,
+    между отправками выдерживается PUSH_MIN_INTERVAL, в тихие часы отправка ждёт их окончания.
+    """
+
+    def __init__(
+        self,
+        send,
+        busy=None,
+        repository: DatabaseRepository = db,
+        quiet_hours: str = QUIET_HOURS,
+        min_interval: float = PUSH_MIN_INTERVAL * 60,
+        batch_delay: float = PUSH_BATCH_DELAY
+    ):
+        """
+        :param send: Функция отправки с параметром since - отправить релизы с date_now не раньше since.
+        :param busy: Функция без параметров, True - отправка уже идёт, событие подождёт.
+        """
+
+        self.send = send
+        self.busy = busy or (lambda: False)
+        self.repository = repository
+        self.quiet_hours = parse_quiet_hours(quiet_hours)
+        self.min_interval = min_interval
+        self.batch_delay = batch_delay
+        self.pending_since = None  # time.monotonic() первого неотправленного события
+        self.last_send = None  # time.monotonic() последней отправки по событию
+        # Релизы с date_now раньше этого момента уже прошли через отправку по событию
+        self.covered_until = datetime.now(timezone.utc) - timedelta(hours=2)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="release-listener", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        for payload in self.repository.listen(RELEASE_CHANNEL, timeout=PUSH_POLL_INTERVAL):
+            if payload is not None:
+                self.received(payload)
+            try:
+                self.send_if_due()
+            except Exception as e:
+                message.send_report(f"Отправка по событию не удалась: {e}")
+
+    def received(self, payload: str):
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        if payload:
+            release = json.loads(payload)
+            logger.info(f"Новый релиз {release['content_type']}: {release['url']}")
+        else:
+            logger.info("События релизов могли быть пропущены, проверю отправку")
+
+    def due(self) -> bool:
+        if self.pending_since is None or self.busy():
+            return False
+        now = time.monotonic()
+        if now - self.pending_since < self.batch_delay:
+            return False
+        if self.last_send is not None and now - self.last_send < self.min_interval:
+            return False
+        return not is_quiet(datetime.now(), self.quiet_hours)
+
+    def send_if_due(self):
+        if not self.due():
+            return
+        started = datetime.now(timezone.utc)
+        waited = time.monotonic() - self.pending_since
+        self.pending_since = None
+        self.last_send = time.monotonic()
+        logger.info(f"Отправляю релизы по событию (ожидание {waited:.0f} сек)")
+        try:
+            # Минута запаса на разницу часов: уже отправленное отсеет ProgressTracker
+            self.send(since=self.covered_until - timedelta(minutes=1))
+        except Exception:
+            self.pending_since = time.monotonic()  # повторим после PUSH_MIN_INTERVAL
+            raise
+        self.covered_until = started
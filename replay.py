@@ -0,0 +1,319 @@
+"""
+Запись и воспроизведение внешнего трафика конвейера update_table -> send_new_movies.
+
+Режимы:
+    python replay.py record --cassette cassette.json
+        Прогоняет конвейер на живых IMDb/YouTube/Google Translate и сохраняет ответы.
+    python replay.py replay --cassette cassette.json [--latency 1.0] [--profile out.prof]
+        Прогоняет конвейер без сети: ответы берутся из кассеты.
+    python replay.py synthesize --cassette cassette.json --titles 10000 [--released 0.01]
+        Генерирует кассету с заданным числом не вышедших тайтлов для нагрузочных тестов.
+
+По умолчанию используется бд в памяти (DB_BACKEND=memory), --db postgres или --db sqlite прогоняет запись в настоящую бд.
+"""
+
+import argparse
+import cProfile
+import hashlib
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+from itertools import count
+
+from loguru import logger
+
+WILDCARD = "*"
+
+
+class CassetteMiss(KeyError):
+    """В кассете нет записи для вызова"""
+
+
+class Cassette:
+    """Файл с записанными ответами внешних сервисов: {kind: {key: {"result": ..., "elapsed": ...}}}"""
+
+    def __init__(self, path: str, latency: float = 0.0):
+        self.path = path
+        self.latency = latency
+        self.calls: dict[str, dict[str, dict]] = {}
+        self.hits: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            self.calls = json.load(f)["calls"]
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "calls": self.calls}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        logger.success(f"Кассета сохранена: {self.path}")
+
+    def put(self, kind: str, key: str, result, elapsed: float = 0.0):
+        with self._lock:
+            self.calls.setdefault(kind, {})[key] = {"result": result, "elapsed": round(elapsed, 4)}
+
+    def get(self, kind: str, key: str):
+        entries = self.calls.get(kind, {})
+        entry = entries.get(key) or entries.get(WILDCARD)
+        if entry is None:
+            raise CassetteMiss(f"{kind}: {key}")
+        with self._lock:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+        if self.latency:
+            time.sleep(entry["elapsed"] * self.latency)
+        return entry["result"]
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeRequests:
+    """Подменяет модуль requests в message.py: ответы Bot API берутся из кассеты"""
+
+    Timeout = TimeoutError
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self._file_ids = count(1)
+
+    def _video(self, media: str) -> dict:
+        # Новое видео получает новый file_id, отправленное по file_id - сохраняет свой
+        if media and not media.startswith("attach://"):
+            return {"video": {"file_id": media}}
+        return {"video": {"file_id": f"replay-file-{next(self._file_ids)}"}}
+
+    def post(self, url, data=None, files=None, **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        try:
+            result = self.cassette.get("telegram", method)
+        except CassetteMiss:
+            result = {"status_code": 200, "text": json.dumps({"ok": True, "result": {}})}
+        if result["status_code"] >= 400:
+            return FakeResponse(result["status_code"], result["text"])
+        data = data or {}
+        if method == "sendVideo":
+            sent = self._video(data.get("video", "attach://video"))
+        elif method == "sendMediaGroup":
+            sent = [self._video(media["media"]) for media in json.loads(data["media"])]
+        else:
+            sent = {}
+        return FakeResponse(result["status_code"], json.dumps({"ok": True, "result": sent}))
+
+
+class NullDriverContext:
+    """Заглушка WebDriverContext: при воспроизведении браузер не нужен"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class Harness:
+    """Подменяет внешние вызовы parcer/main/message записью или воспроизведением"""
+
+    def __init__(self, cassette: Cassette, mode: str, live_telegram: bool = False):
+        self.cassette = cassette
+        self.mode = mode
+        self.live_telegram = live_telegram
+        self._originals = []
+
+    def _patch(self, module, name, value):
+        self._originals.append((module, name, getattr(module, name)))
+        setattr(module, name, value)
+
+    def _wrap(self, kind, func, key_fn, dump=lambda result: result, load=lambda result, *args, **kwargs: result):
+        cassette = self.cassette
+
+        if self.mode == "replay":
+            def replayed(*args, **kwargs):
+                return load(cassette.get(kind, key_fn(*args, **kwargs)), *args, **kwargs)
+            return replayed
+
+        def recorded(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            cassette.put(kind, key_fn(*args, **kwargs), dump(result), time.perf_counter() - started)
+            return result
+        return recorded
+
+    def install(self):
+        import main
+        import message
+        import parcer
+
+        def dump_download(path):
+            return {"ext": os.path.splitext(path)[1], "size": os.path.getsize(path)}
+
+        def load_download(result, url, output_dir):
+            # Создаём файл нужного размера, содержимое для загрузки не важно
+            path = os.path.join(output_dir, f"{text_key(url)}{result['ext']}")
+            with open(path, "wb") as f:
+                f.truncate(result["size"])
+            return path
+
+        fetch_chart = self._wrap("chart", parcer.fetch_chart, lambda driver, url, known=None: url)
+        fetch_title_page = self._wrap("title", parcer.fetch_title_page, lambda driver, url: url)
+        translate = self._wrap("translate", parcer.translate, text_key)
+        get_youtube_links = self._wrap("youtube", parcer.get_youtube_links, lambda video_name: video_name)
+        metadata = self._wrap("metadata", parcer.ytdlp_metadata, lambda url: url)
+        download = self._wrap(
+            "download", parcer.ytdlp_download, lambda url, output_dir: url, dump_download, load_download
+        )
+
+        if self.mode == "replay":
+            self._patch(parcer, "WebDriverContext", NullDriverContext)
+        self._patch(parcer, "fetch_chart", fetch_chart)
+        self._patch(parcer, "fetch_title_page", fetch_title_page)
+        self._patch(parcer, "translate", translate)
+        self._patch(parcer, "get_youtube_links", get_youtube_links)
+        self._patch(parcer, "ytdlp_metadata", metadata)
+        self._patch(parcer, "ytdlp_download", download)
+        self._patch(main, "get_youtube_links", get_youtube_links)
+        if not self.live_telegram:
+            self._patch(message, "requests", FakeRequests(self.cassette))
+        return self
+
+    def uninstall(self):
+        for module, name, value in reversed(self._originals):
+            setattr(module, name, value)
+        self._originals = []
+
+
+def synthesize(path: str, titles: int, released: float = 0.01, seed: int = 0) -> Cassette:
+    """
+    Генерирует кассету с titles не вышедшими тайтлами, поровну по категориям.
+    :param released: Доля тайтлов, которые при проверке окажутся вышедшими.
+    """
+
+    from dictionaries import CATEGORY_TRANSLATED, CATEGORY_URLS, COUNTRY_TRANSLATED
+
+    rnd = random.Random(seed)
+    cassette = Cassette(path)
+    year = datetime.now().year
+    categories, countries = list(CATEGORY_TRANSLATED), list(COUNTRY_TRANSLATED)
+    per_chart = max(1, titles // len(CATEGORY_URLS))
+
+    n = 0
+    for chart_url in CATEGORY_URLS.values():
+        rows = []
+        for rank in range(1, per_chart + 1):
+            n += 1
+            url = f"https://www.imdb.com/title/tt{9000000 + n}"
+            title = f"Synthetic Title {n}"
+            rating = round(rnd.uniform(5, 9.5), 1)
+            description = f"Synthetic description {n}. " + " ".join(rnd.choices(["lorem", "ipsum", "dolor"], k=40))
+            rows.append({
+                "rank": rank, "title": title, "year_start": year, "year_end": None, "url": url, "rating": rating
+            })
+            cassette.put("title", url, {
+                "title": title,
+                "title_original": title,
+                "rating": rating,
+                "description": description,
+                "countries": rnd.sample(countries, k=rnd.randint(1, 3)),
+                "categories": rnd.sample(categories, k=rnd.randint(1, 3)),
+                "released": rnd.random() < released
+            }, elapsed=rnd.uniform(3, 8))
+            cassette.put("translate", text_key(description), f"Синтетическое описание {n}.", elapsed=0.3)
+        cassette.put("chart", chart_url, rows, elapsed=15)
+
+    youtube_links = [f"https://www.youtube.com/watch?v=synthetic{i}" for i in range(3)]
+    cassette.put("youtube", WILDCARD, youtube_links, elapsed=4)
+    # Первое видео с возрастным ограничением, второе - полный фильм, скачать стоит только третье
+    cassette.put("metadata", youtube_links[0], {
+        "url": youtube_links[0], "error": "ERROR: Sign in to confirm your age. This video may be inappropriate"
+    }, elapsed=1.5)
+    cassette.put("metadata", youtube_links[1], {
+        "url": youtube_links[1], "title": "Full Movie", "channel": "Uploads", "duration": 7200
+    }, elapsed=1.5)
+    cassette.put("metadata", youtube_links[2], {
+        "url": youtube_links[2], "title": "Official Trailer", "channel": "Netflix", "channel_is_verified": True,
+        "duration": 150, "age_limit": 0, "availability": "public", "live_status": "not_live"
+    }, elapsed=1.5)
+    cassette.put("download", WILDCARD, {"ext": ".mp4", "size": 5 * 1024 * 1024}, elapsed=6)
+    cassette.put("telegram", WILDCARD, {"status_code": 200, "text": json.dumps({"ok": True, "result": {}})}, elapsed=2)
+    return cassette
+
+
+def run_pipeline():
+    import main
+
+    main.update_table()
+    main.send_new_movies()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay", "synthesize"])
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--db", default="memory", choices=["memory", "postgres", "sqlite"])
+    parser.add_argument("--latency", type=float, default=0.0, help="Множитель записанных задержек при воспроизведении")
+    parser.add_argument("--profile", help="Файл для статистики cProfile")
+    parser.add_argument("--titles", type=int, default=10000)
+    parser.add_argument("--released", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live-telegram", action="store_true", help="При записи реально отправлять сообщения")
+    args = parser.parse_args()
+
+    if args.mode == "synthesize":
+        synthesize(args.cassette, args.titles, args.released, args.seed).save()
+        return
+
+    os.environ["DB_BACKEND"] = args.db
+    os.environ.setdefault("CATEGORY_BAN_LIST", "")
+    os.environ.setdefault("COUNTRY_BAN_LIST", "")
+
+    import message
+
+    cassette = Cassette(args.cassette, latency=args.latency)
+    if args.mode == "replay":
+        cassette.load()
+    harness = Harness(cassette, args.mode, live_telegram=args.live_telegram and args.mode == "record").install()
+
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    try:
+        if profiler:
+            profiler.runcall(run_pipeline)
+        else:
+            run_pipeline()
+    finally:
+        message.reporter.flush()
+        harness.uninstall()
+        if args.mode == "record":
+            cassette.save()
+
+    logger.info(f"Конвейер завершён за {time.perf_counter() - started:.2f} сек, обращений к кассете: {cassette.hits}")
+    if profiler:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,170 @@
+import atexit
+import hashlib
+import html
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Callable
+
+from loguru import logger
+
+from ratelimit import TokenBucket
+
+REPORT_DIGEST_INTERVAL = float(os.getenv("REPORT_DIGEST_INTERVAL", 60))
+REPORT_RATE_LIMIT = float(os.getenv("REPORT_RATE_LIMIT", 10))  # сообщений в минуту
+REPORT_MAX_ENTRIES = int(os.getenv("REPORT_MAX_ENTRIES", 50))
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_TEXT_LENGTH = 1500
+MAX_TRACEBACK_LENGTH = 1000
+
+
+@dataclass
+class ReportEntry:
+    """Сгруппированная по отпечатку ошибка"""
+    text: str
+    details: str
+    count: int = 1
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+
+
+def fingerprint(text: str, details: str) -> str:
+    """
+    Отпечаток ошибки: текст без чисел и адресов + место возникновения из traceback.
+    Ошибки с одинаковым отпечатком попадают в дайджест одной строкой со счётчиком.
+    """
+
+    normalized = re.sub(r"0x[0-9a-fA-F]+|\d+", "#", text)
+    frames = re.findall(r'File "(.+?)", line (\d+)', details)
+    location = "|".join(f"{path}:{line}" for path, line in frames[-3:])
+    exc_type = details.strip().rsplit("\n", 1)[-1].split(":", 1)[0] if details else ""
+    return hashlib.sha1(f"{normalized}|{location}|{exc_type}".encode()).hexdigest()
+
+
+class Reporter:
+    """
+    Фоновый канал отчётов об ошибках.
+    Ошибки складываются в очередь, группируются по отпечатку и
+    раз в interval секунд отправляются одним дайджестом с ограничением частоты.
+    """
+
+    def __init__(
+        self,
+        sender: Callable[[str], None],
+        interval: float = REPORT_DIGEST_INTERVAL,
+        rate_per_minute: float = REPORT_RATE_LIMIT,
+        max_entries: int = REPORT_MAX_ENTRIES
+    ):
+        self.sender = sender
+        self.interval = interval
+        self.max_entries = max_entries
+        self.bucket = TokenBucket(rate=rate_per_minute / 60, capacity=max(1, int(rate_per_minute // 6)))
+        self._queue = queue.Queue()
+        self._pending: dict[str, ReportEntry] = {}
+        self._dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Запускает фоновый поток (один раз)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="reporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def report(self, message):
+        """Ставит ошибку в очередь. Traceback берётся в потоке вызывающего"""
+        text = str(message)
+        details = traceback.format_exc()
+        if details.startswith("NoneType: None"):
+            details = ""
+        logger.error(f"{text}\n{details}")
+        self.start()
+        self._queue.put((text, details, time.time()))
+
+    def flush(self, timeout: float = 10):
+        """Отправляет накопленные ошибки, не дожидаясь конца интервала"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _collect(self, item):
+        text, details, seen = item
+        key = fingerprint(text, details)
+        entry = self._pending.get(key)
+        if entry:
+            entry.count += 1
+            entry.last_seen = seen
+        elif len(self._pending) >= self.max_entries:
+            self._dropped += 1
+        else:
+            self._pending[key] = ReportEntry(text=text, details=details, first_seen=seen, last_seen=seen)
+
+    def _run(self):
+        next_flush = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                self._send_digest()
+                item.set()
+                continue
+            if item is not None:
+                self._collect(item)
+                continue
+
+            self._send_digest()
+            next_flush = time.monotonic() + self.interval
+
+    def _send_digest(self):
+        if not self._pending:
+            return
+        entries, dropped = list(self._pending.values()), self._dropped
+        self._pending, self._dropped = {}, 0
+
+        for chunk in build_digest(entries, dropped):
+            self.bucket.acquire()
+            try:
+                self.sender(chunk)
+            except Exception as e:
+                logger.warning(f"Не удалось отправить отчёт об ошибках: {e}")
+
+
+def format_entry(entry: ReportEntry) -> str:
+    counter = f"<b>×{entry.count}</b> " if entry.count > 1 else ""
+    block = f"{counter}{html.escape(entry.text[:MAX_TEXT_LENGTH], quote=False)}"
+    if entry.details:
+        details = f"\n<pre>{html.escape(entry.details.strip()[-MAX_TRACEBACK_LENGTH:], quote=False)}</pre>"
+        if len(block) + len(details) <= MAX_MESSAGE_LENGTH:
+            block += details
+    return block
+
+
+def build_digest(entries: list[ReportEntry], dropped: int = 0) -> list[str]:
+    """Собирает дайджест и режет его на сообщения не длиннее лимита Telegram"""
+    total = sum(entry.count for entry in entries)
+    header = f"<b>Ошибки: {len(entries)} уникальных, {total} всего</b>"
+    if dropped:
+        header += f"\nЕщё {dropped} ошибок отброшено (превышен лимит дайджеста)"
+
+    chunks, current = [], header
+    for entry in sorted(entries, key=lambda e: e.count, reverse=True):
+        block = format_entry(entry)
+        if len(current) + len(block) + 2 > MAX_MESSAGE_LENGTH:
+            chunks.append(current)
+            current = block
+        else:
+            current = f"{current}\n\n{block}"
+    chunks.append(current)
+    return chunks
@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+
+from loguru import logger
+
+from database import DatabaseRepository
+
+SNAPSHOT_TABLE = "chart_snapshots"
+SNAPSHOT_SCHEMA = {
+    "snapshot_date": "DATE NOT NULL",
+    "category": "TEXT NOT NULL",
+    "url": "TEXT NOT NULL",
+    "rank": "INT NOT NULL",
+    "rating": "FLOAT",
+}
+SNAPSHOT_COLUMNS = list(SNAPSHOT_SCHEMA)
+
+
+def ensure_snapshot_table(repository: DatabaseRepository):
+    """
+    Таблица снимков чартов. Строки пишутся только в конец по дате,
+    поэтому BRIN-индекса по дате хватает и его размер почти не растёт.
+    """
+
+    repository.create_table(table_name=SNAPSHOT_TABLE, schema=SNAPSHOT_SCHEMA)
+    repository.create_index(table_name=SNAPSHOT_TABLE, columns=["snapshot_date"], method="brin")
+
+
+def save_snapshot(repository: DatabaseRepository, category: str, chart_rows: list[dict], day: date = None) -> int:
+    """
+    Сохраняет позиции и рейтинги чарта за день одним COPY.
+    Повторный запуск в тот же день заменяет снимок.
+    :param chart_rows: Строки чарта из parcer.fetch_chart.
+    :return: Число сохранённых строк.
+    """
+
+    day = day or date.today()
+    ensure_snapshot_table(repository)
+    repository.delete_from_table(table_name=SNAPSHOT_TABLE, data={"snapshot_date": day, "category": category})
+    rows = [(day, category, row["url"], row["rank"], row["rating"]) for row in chart_rows]
+    count = repository.copy_into_table(table_name=SNAPSHOT_TABLE, columns=SNAPSHOT_COLUMNS, rows=rows)
+    logger.debug(f"Снимок чарта {category} за {day}: {count} строк")
+    return count
+
+
+def get_snapshot(repository: DatabaseRepository, category: str, day: date) -> dict[str, dict]:
+    rows = repository.get_table(
+        table_name=SNAPSHOT_TABLE,
+        data={"snapshot_date": day, "category": category},
+        fetchone=False,
+        columns=["url", "rank", "rating"]
+    )
+    return {row["url"]: dict(row) for row in rows}
+
+
+def rank_deltas(repository: DatabaseRepository, category: str, days: int = 1, day: date = None) -> list[dict]:
+    """
+    Изменение позиций и рейтинга за days дней.
+    :return: Список {url, rank, prev_rank, delta, rating, rating_delta}; delta > 0 - тайтл поднялся.
+             Для новых в чарте prev_rank и delta равны None.
+    """
+
+    day = day or date.today()
+    current = get_snapshot(repository, category, day)
+    previous = get_snapshot(repository, category, day - timedelta(days=days))
+
+    deltas = []
+    for url, row in current.items():
+        prev = previous.get(url)
+        deltas.append({
+            "url": url,
+            "rank": row["rank"],
+            "prev_rank": prev["rank"] if prev else None,
+            "delta": prev["rank"] - row["rank"] if prev else None,
+            "rating": row["rating"],
+            "rating_delta": round(row["rating"] - prev["rating"], 2)
+            if prev and row["rating"] is not None and prev["rating"] is not None else None,
+        })
+    return sorted(deltas, key=lambda d: d["rank"])
+
+
+def trending(repository: DatabaseRepository, category: str, days: int = 7, limit: int = 10, day: date = None):
+    """Тайтлы, сильнее всего поднявшиеся в чарте за days дней"""
+    deltas = [d for d in rank_deltas(repository, category, days, day) if d["delta"]]
+    return sorted(deltas, key=lambda d: d["delta"], reverse=True)[:limit]
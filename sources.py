@@ -0,0 +1,65 @@
+import json
+import os
+from dataclasses import dataclass
+
+from dictionaries import CATEGORY_URLS
+
+
+@dataclass(frozen=True)
+class ChartSource:
+    """Чарт IMDb и категория (таблица), которую он пополняет"""
+    name: str  # ключ снимков чарта в chart_snapshots
+    url: str
+    category: str
+
+
+# Основные чарты называются как категории, чтобы снимки и trending(category) не поменялись
+CHART_SOURCES: list[ChartSource] = [
+    ChartSource(name=category, url=url, category=category) for category, url in CATEGORY_URLS.items()
+]
+
+
+def register_source(name: str, url: str, category: str) -> ChartSource:
+    """
+    Добавляет чарт в список обходимых при обновлении таблиц.
+    :param category: Ключ CATEGORY_URLS, в таблицу которого попадут тайтлы чарта.
+    """
+
+    if category not in CATEGORY_URLS:
+        raise ValueError(f"Неизвестная категория чарта {name}: {category}")
+    if any(source.name == name for source in CHART_SOURCES):
+        raise ValueError(f"Чарт {name} уже добавлен")
+    source = ChartSource(name=name, url=url, category=category)
+    CHART_SOURCES.append(source)
+    return source
+
+
+def merge_charts(charts: dict[ChartSource, list[dict]]) -> dict[str, list[dict]]:
+    """
+    Объединяет строки чартов по категориям, убирая повторы одного тайтла.
+    Тайтл остаётся в категории первого по порядку чарта, где он встретился;
+    рейтинг, если его нет, берётся из другого чарта.
+    :param charts: Строки parcer.fetch_chart по чартам, в порядке CHART_SOURCES.
+    :return: {category: [строки чарта]}, у каждой строки добавлен список sources.
+    """
+
+    merged: dict[str, dict] = {}
+    by_category: dict[str, list[dict]] = {}
+    for source, rows in charts.items():
+        for row in rows:
+            known = merged.get(row["url"])
+            if known:
+                known["sources"].append(source.name)
+                if known["rating"] is None:
+                    known["rating"] = row["rating"]
+                continue
+            row = {**row, "sources": [source.name]}
+            merged[row["url"]] = row
+            by_category.setdefault(source.category, []).append(row)
+    return by_category
+
+
+# Дополнительные чарты (жанры, страны, топ по рейтингу) из .env:
+# CHART_SOURCES='[{"name": "horror", "url": "https://www.imdb.com/search/title/?genres=horror", "category": "Фильмы"}]'
+for extra in json.loads(os.getenv("CHART_SOURCES") or "[]"):
+    register_source(**extra)
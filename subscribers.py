@@ -0,0 +1,116 @@
+import os
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+from loguru import logger
+
+from database import DatabaseRepository
+from dictionaries import CATEGORY_TRANSLATED, COUNTRY_TRANSLATED, untranslate
+from movie import Movie
+
+SUBSCRIBERS_TABLE = "subscribers"
+SUBSCRIBERS_SCHEMA = {
+    "id": "SERIAL PRIMARY KEY",
+    "chat_id": "TEXT NOT NULL UNIQUE",
+    "name": "TEXT",
+    "category_ban_list": "TEXT[]",
+    "country_ban_list": "TEXT[]",
+    "enabled": "BOOLEAN NOT NULL DEFAULT TRUE",
+}
+
+# Канал из .env, если в таблице подписчиков никого нет
+TELEGRAM_BOT_CHAT_ID = os.getenv("TELEGRAM_BOT_CHAT_ID")
+CATEGORY_BAN_LIST = os.getenv("CATEGORY_BAN_LIST", "").split()
+COUNTRY_BAN_LIST = os.getenv("COUNTRY_BAN_LIST", "").split()
+
+
+@dataclass
+class Subscriber:
+    """Чат, в который рассылаются релизы, со своими фильтрами жанров и стран"""
+    chat_id: str
+    name: Optional[str] = None
+    category_ban_list: list[str] = field(default_factory=list)
+    country_ban_list: list[str] = field(default_factory=list)
+    enabled: bool = True
+    id: Optional[int] = None
+
+    def accepts(self, categories: str, countries: str) -> bool:
+        """
+        :param categories: Переведённые жанры (Movie.get_translated_categories).
+        :param countries: Переведённые страны (Movie.get_translated_countries).
+        """
+
+        return (
+            Movie.filter_passes(categories, self.category_ban_list)
+            and Movie.filter_passes(countries, self.country_ban_list)
+        )
+
+    @property
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "id"}
+
+
+def shared_ban_filter(subscribers: list[Subscriber]) -> dict:
+    """
+    Фильтр для запроса к таблице категории: отсекает строки с жанрами или странами,
+    которые запрещены у всех подписчиков сразу, - такие строки не нужны никому.
+    Фильтры конкретного подписчика по-прежнему проверяет Subscriber.accepts.
+    :return: Словарь вида {"categories": ("NOT &&", [...]), "countries": ("NOT &&", [...])} (пустые опускаются).
+    """
+
+    if not subscribers:
+        return {}
+    categories = set.intersection(*(
+        untranslate(subscriber.category_ban_list, CATEGORY_TRANSLATED) for subscriber in subscribers
+    ))
+    countries = set.intersection(*(
+        untranslate(subscriber.country_ban_list, COUNTRY_TRANSLATED) for subscriber in subscribers
+    ))
+    return Movie(
+        categories=("NOT &&", sorted(categories)) if categories else ...,
+        countries=("NOT &&", sorted(countries)) if countries else ...
+    ).to_dict
+
+
+class SubscriberRegistry:
+    """Список чатов для рассылки в таблице subscribers"""
+
+    def __init__(self, repository: DatabaseRepository):
+        self.repository = repository
+
+    def ensure_table(self):
+        self.repository.create_table(table_name=SUBSCRIBERS_TABLE, schema=SUBSCRIBERS_SCHEMA)
+
+    def all(self) -> list[Subscriber]:
+        """Включённые подписчики. Пока таблица пуста - канал и фильтры из .env, как раньше"""
+        self.ensure_table()
+        rows = self.repository.get_table(
+            table_name=SUBSCRIBERS_TABLE, data={"enabled": True}, sort_by="id ASC", fetchone=False
+        )
+        subscribers = [
+            Subscriber(**{**row, "category_ban_list": row["category_ban_list"] or [],
+                          "country_ban_list": row["country_ban_list"] or []})
+            for row in rows
+        ]
+        if not subscribers and TELEGRAM_BOT_CHAT_ID:
+            subscribers = [Subscriber(
+                chat_id=TELEGRAM_BOT_CHAT_ID,
+                category_ban_list=CATEGORY_BAN_LIST,
+                country_ban_list=COUNTRY_BAN_LIST
+            )]
+        return subscribers
+
+    def add(self, subscriber: Subscriber):
+        """Добавляет чат или обновляет фильтры уже добавленного"""
+        self.ensure_table()
+        if self.repository.get_table(table_name=SUBSCRIBERS_TABLE, data={"chat_id": subscriber.chat_id}):
+            self.repository.update_table(
+                table_name=SUBSCRIBERS_TABLE, data={"chat_id": subscriber.chat_id}, updates=subscriber.to_dict
+            )
+        else:
+            subscriber.id = self.repository.add_into_table(table_name=SUBSCRIBERS_TABLE, data=subscriber.to_dict)
+        logger.info(f"Подписчик {subscriber.name or subscriber.chat_id} сохранён")
+
+    def remove(self, chat_id: str):
+        self.ensure_table()
+        self.repository.update_table(table_name=SUBSCRIBERS_TABLE, data={"chat_id": chat_id}, updates={"enabled": False})
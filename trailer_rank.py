@@ -0,0 +1,102 @@
+import os
+import re
+from typing import Optional
+
+TRAILER_CANDIDATES = int(os.getenv("TRAILER_CANDIDATES", 5))  # сколько первых ссылок выдачи проверять по метаданным
+TRAILER_MIN_DURATION = int(os.getenv("TRAILER_MIN_DURATION", 30))  # секунд
+TRAILER_MAX_DURATION = int(os.getenv("TRAILER_MAX_DURATION", 600))  # секунд, длиннее - не трейлер
+TRAILER_OFFICIAL_CHANNELS = [
+    channel.strip() for channel in os.getenv(
+        "TRAILER_OFFICIAL_CHANNELS",
+        "netflix,warner bros,universal pictures,sony pictures,marvel,hbo,apple tv,prime video,disney,"
+        "paramount,a24,lionsgate,20th century studios,focus features,neon,amc,fx networks,кинопоиск"
+    ).lower().split(",") if channel.strip()
+]
+
+TRAILER_KEYWORDS = ("trailer", "трейлер", "teaser", "тизер")
+# Слова в названии, по которым видео точно не трейлер
+TRAILER_STOP_WORDS = (
+    "reaction", "review", "breakdown", "explained", "parody", "fan made", "fanmade", "concept",
+    "обзор", "реакция", "разбор", "пародия",
+)
+# Ошибки yt-dlp, которые не исправятся повтором
+BLOCKING_ERRORS = (
+    "sign in to confirm your age", "private video", "video unavailable", "members-only",
+    "this live event", "not available in your country",
+)
+UNAVAILABLE = ("private", "premium_only", "subscriber_only", "needs_auth")
+
+
+def words(text: str) -> set[str]:
+    return set(re.findall(r"\w+", (text or "").lower()))
+
+
+def trailer_rejection(meta: dict) -> Optional[str]:
+    """
+    Причина, по которой видео нельзя или не стоит скачивать.
+    :param meta: Метаданные из parcer.ytdlp_metadata.
+    :return: None, если видео подходит.
+    """
+
+    error = (meta.get("error") or "").lower()
+    if error:
+        return error if any(blocking in error for blocking in BLOCKING_ERRORS) else None
+    if (meta.get("age_limit") or 0) >= 18:
+        return "ограничение по возрасту"
+    if meta.get("availability") in UNAVAILABLE:
+        return f"недоступно: {meta['availability']}"
+    if meta.get("live_status") in ("is_live", "is_upcoming", "post_live"):
+        return "трансляция"
+    duration = meta.get("duration")
+    if duration and duration > TRAILER_MAX_DURATION:
+        return f"слишком длинное: {duration} сек"
+    title = (meta.get("title") or "").lower()
+    if any(stop_word in title for stop_word in TRAILER_STOP_WORDS):
+        return "не трейлер"
+    return None
+
+
+def score_trailer(meta: dict, title: str, year: int = None, position: int = 0) -> float:
+    """
+    Оценка видео как трейлера тайтла (0..1).
+    Учитывает совпадение названия, официальный канал, длительность и место в выдаче YouTube.
+    :param title: Оригинальное название тайтла.
+    :param position: Номер ссылки в выдаче, при прочих равных выше первые.
+    """
+
+    if meta.get("error"):
+        # Метаданные не получены, но и причины отказаться нет - оставляем в конце
+        return 0.05 / (position + 1)
+
+    video_title = words(meta.get("title"))
+    wanted = words(title)
+    title_score = len(wanted & video_title) / len(wanted) if wanted else 0.0
+    keyword_score = 1.0 if any(keyword in video_title for keyword in TRAILER_KEYWORDS) else 0.0
+    if year and str(year) in video_title:
+        keyword_score = min(1.0, keyword_score + 0.5)
+
+    channel = (meta.get("channel") or meta.get("uploader") or "").lower()
+    official_score = 0.0
+    if meta.get("channel_is_verified"):
+        official_score = 0.7
+    if any(official in channel for official in TRAILER_OFFICIAL_CHANNELS):
+        official_score = 1.0
+    elif "official" in video_title:
+        official_score = max(official_score, 0.5)
+
+    duration = meta.get("duration")
+    if not duration:
+        duration_score = 0.5
+    elif duration < TRAILER_MIN_DURATION:
+        duration_score = 0.2
+    elif duration <= 240:
+        duration_score = 1.0
+    else:
+        duration_score = 0.5
+
+    position_score = 1.0 / (position + 1)
+    return round(
+        0.35 * title_score + 0.15 * keyword_score + 0.25 * official_score
+        + 0.15 * duration_score + 0.10 * position_score,
+        4
+    )
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from typing import Callable
+
+from loguru import logger
+
+TRAILER_STORE_DIR = os.getenv("TRAILER_STORE_DIR", "trailers")
+TRAILER_STORE_BUDGET_MB = int(os.getenv("TRAILER_STORE_BUDGET_MB", 2048))
+
+INDEX_FILE = "index.json"
+TMP_DIR = ".tmp"
+
+
+def video_id(url: str) -> str:
+    """Id видео YouTube из ссылки (watch?v=, youtu.be/, shorts/). Для прочих ссылок - хэш url"""
+    parsed = urllib.parse.urlparse(url)
+    query_id = urllib.parse.parse_qs(parsed.query).get("v")
+    if query_id:
+        return query_id[0]
+    if parsed.netloc.endswith("youtu.be"):
+        return parsed.path.strip("/")
+    if "/shorts/" in parsed.path:
+        return parsed.path.split("/shorts/")[1].strip("/")
+    return hashlib.sha1(url.encode()).hexdigest()
+
+
+class TrailerStore:
+    """
+    Локальное хранилище трейлеров с ключом по id видео.
+    Файлы записываются атомарно, при превышении бюджета диска удаляются давно не использованные.
+    Файлы, выданные через get/put, закреплены до вызова release и не вытесняются.
+    """
+
+    def __init__(self, root: str = TRAILER_STORE_DIR, budget_mb: int = TRAILER_STORE_BUDGET_MB):
+        self.root = root
+        self.budget = budget_mb * 1024 * 1024
+        self.index: dict[str, dict] = {}
+        self.pinned = Counter()
+        self._lock = threading.RLock()
+        os.makedirs(os.path.join(self.root, TMP_DIR), exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), encoding="utf-8") as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        except ValueError as e:
+            logger.warning(f"Индекс хранилища трейлеров повреждён, начинаем заново: {e}")
+            self.index = {}
+
+    def _save_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(f"{path}.tmp", path)
+
+    def cleanup(self):
+        """
+        Удаляет недокачанные файлы, файлы вне индекса и записи индекса без файлов.
+        Вызывается один раз при запуске бота: модуль импортируют и процессы перекодирования,
+        и инструменты, у которых в это время могут идти загрузки.
+        """
+        with self._lock:
+            tmp_root = os.path.join(self.root, TMP_DIR)
+            shutil.rmtree(tmp_root, ignore_errors=True)
+            os.makedirs(tmp_root, exist_ok=True)
+
+            known = {entry["file"] for entry in self.index.values()}
+            removed = 0
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name in (INDEX_FILE, TMP_DIR) or name in known or not os.path.isfile(path):
+                    continue
+                os.remove(path)
+                removed += 1
+
+            missing = [key for key, entry in self.index.items()
+                       if not os.path.exists(os.path.join(self.root, entry["file"]))]
+            for key in missing:
+                del self.index[key]
+            self._save_index()
+        if removed or missing:
+            logger.info(f"Хранилище трейлеров: удалено файлов-сирот {removed}, пустых записей {len(missing)}")
+
+    def key_of(self, path: str) -> str | None:
+        """Ключ файла, если он лежит в хранилище"""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.root):
+            return None
+        name = os.path.basename(path)
+        key = os.path.splitext(name)[0]
+        with self._lock:
+            entry = self.index.get(key)
+        return key if entry and entry["file"] == name else None
+
+    def get(self, key: str) -> str | None:
+        """Путь к файлу по ключу (и закрепление его) или None"""
+        with self._lock:
+            entry = self.index.get(key)
+            if not entry:
+                return None
+            path = os.path.join(self.root, entry["file"])
+            if not os.path.exists(path):
+                del self.index[key]
+                self._save_index()
+                return None
+            entry["last_used"] = time.time()
+            self.pinned[key] += 1
+            self._save_index()
+        logger.debug(f"Трейлер {key} взят из хранилища")
+        return path
+
+    def put(self, key: str, produce: Callable[[str], str]) -> str:
+        """
+        Скачивает файл во временную папку и атомарно переносит его в хранилище.
+        :param key: Ключ (id видео).
+        :param produce: Функция, которая создаёт файл в переданной папке и возвращает путь к нему.
+        :return: Путь к файлу в хранилище (закреплён).
+        """
+
+        tmp_dir = os.path.join(self.root, TMP_DIR, f"{key}-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            produced = produce(tmp_dir)
+            return self.adopt(key, produced)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def adopt(self, key: str, source_path: str) -> str:
+        """Переносит готовый файл в хранилище под ключом key и закрепляет его"""
+        ext = os.path.splitext(source_path)[1]
+        name = f"{key}{ext}"
+        path = os.path.join(self.root, name)
+        if os.path.abspath(source_path) != os.path.abspath(path):
+            os.replace(source_path, path)
+        with self._lock:
+            self.index[key] = {"file": name, "size": os.path.getsize(path), "last_used": time.time()}
+            self.pinned[key] += 1
+            self._save_index()
+            self.evict()
+        return path
+
+    def release(self, path: str):
+        """Открепляет файл. Файлы вне хранилища просто удаляются"""
+        key = self.key_of(path)
+        if key is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with self._lock:
+            self.pinned[key] -= 1
+            if self.pinned[key] <= 0:
+                del self.pinned[key]
+
+    def evict(self):
+        """Удаляет давно не использованные файлы, пока хранилище не уложится в бюджет"""
+        with self._lock:
+            total = sum(entry["size"] for entry in self.index.values())
+            for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.budget:
+                    break
+                if self.pinned[key]:
+                    continue
+                try:
+                    os.remove(os.path.join(self.root, entry["file"]))
+                except FileNotFoundError:
+                    pass
+                del self.index[key]
+                total -= entry["size"]
+                logger.debug(f"Трейлер {key} вытеснен из хранилища")
+            self._save_index()
+
+
+trailer_store = TrailerStore()
@@ -0,0 +1,165 @@
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from loguru import logger
+
+import message
+from metrics import metrics
+from trailer_store import trailer_store
+
+TRANSCODE_ENABLED = os.getenv("TRANSCODE_ENABLED", "false").lower() == "true"
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", os.cpu_count() or 2))
+TRANSCODE_MAX_HEIGHT = int(os.getenv("TRANSCODE_MAX_HEIGHT", 720))
+TRANSCODE_VIDEO_BITRATE = os.getenv("TRANSCODE_VIDEO_BITRATE", "1500k")
+TRANSCODE_AUDIO_BITRATE = os.getenv("TRANSCODE_AUDIO_BITRATE", "128k")
+TRANSCODE_TIMEOUT = int(os.getenv("TRANSCODE_TIMEOUT", 600))
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+@dataclass
+class TranscodeResult:
+    source_path: str
+    output_path: str
+    source_size: int
+    output_size: int
+    seconds: float
+
+
+def ffmpeg_command(source_path: str, output_path: str, reencode: bool = True) -> list[str]:
+    """
+    Команда ffmpeg: уменьшение до TRANSCODE_MAX_HEIGHT и битрейта TRANSCODE_VIDEO_BITRATE,
+    moov atom в начале файла (+faststart), чтобы видео начинало играть до окончания загрузки.
+    При reencode=False файл только перепаковывается без перекодирования.
+    """
+
+    command = [FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", source_path]
+    if reencode:
+        command += [
+            "-vf", f"scale=-2:'min({TRANSCODE_MAX_HEIGHT},ih)'",
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-b:v", TRANSCODE_VIDEO_BITRATE, "-maxrate", TRANSCODE_VIDEO_BITRATE, "-bufsize", TRANSCODE_VIDEO_BITRATE,
+            "-c:a", "aac", "-b:a", TRANSCODE_AUDIO_BITRATE,
+        ]
+    else:
+        command += ["-c", "copy"]
+    return command + ["-movflags", "+faststart", "-f", "mp4", output_path]
+
+
+def transcode_video(source_path: str) -> TranscodeResult:
+    """Перекодирует трейлер. Выполняется в отдельном процессе"""
+    started = time.perf_counter()
+    output_path = f"{os.path.splitext(source_path)[0]}.preview.mp4"
+    tmp_path = f"{output_path}.tmp"
+    source_size = os.path.getsize(source_path)
+
+    subprocess.run(ffmpeg_command(source_path, tmp_path), check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    if os.path.getsize(tmp_path) >= source_size:
+        # Перекодированный файл не меньше исходного - только переносим moov atom в начало
+        subprocess.run(
+            ffmpeg_command(source_path, tmp_path, reencode=False),
+            check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT
+        )
+    os.replace(tmp_path, output_path)
+
+    return TranscodeResult(
+        source_path=source_path,
+        output_path=output_path,
+        source_size=source_size,
+        output_size=os.path.getsize(output_path),
+        seconds=time.perf_counter() - started
+    )
+
+
+class TranscodePool:
+    """
+    Пул процессов для перекодирования трейлеров.
+    Если TRANSCODE_ENABLED выключен или ffmpeg не найден, файлы возвращаются как есть.
+    """
+
+    def __init__(self, enabled: bool = TRANSCODE_ENABLED, workers: int = TRANSCODE_WORKERS):
+        self.enabled = enabled
+        self.workers = workers
+        self.executor = None
+        self.futures: dict[str, Future] = {}
+        self.done: set[str] = set()
+
+    def __enter__(self):
+        if self.enabled and shutil.which(FFMPEG_BINARY) is None:
+            logger.warning(f"ffmpeg не найден ({FFMPEG_BINARY}), трейлеры отправляются без перекодирования")
+            self.enabled = False
+        if self.enabled:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, video_path: str):
+        """Ставит трейлер из хранилища в очередь на перекодирование, если готовой версии ещё нет"""
+        key = trailer_store.key_of(video_path)
+        if not self.executor or not key or video_path in self.futures:
+            return
+        if f"{key}.preview" in trailer_store.index:
+            return
+        self.futures[video_path] = self.executor.submit(transcode_video, video_path)
+
+    def result(self, video_path: str) -> str:
+        """
+        Ждёт перекодирования и возвращает путь к файлу, который нужно отправить.
+        Перекодированный трейлер сохраняется в хранилище рядом с исходным.
+        """
+
+        key = trailer_store.key_of(video_path)
+        if not self.executor or not key:
+            return video_path
+
+        future = self.futures.get(video_path)
+        if future and video_path not in self.done:
+            self.done.add(video_path)
+            try:
+                result = future.result()
+            except Exception as e:
+                message.send_report(f"Не удалось перекодировать {video_path}: {e}")
+                return video_path
+            trailer_store.adopt(f"{key}.preview", result.output_path)
+            trailer_store.release(result.output_path)
+            metrics.incr("transcode.files")
+            metrics.incr("transcode.bytes_in", result.source_size)
+            metrics.incr("transcode.bytes_out", result.output_size)
+            metrics.observe("transcode.seconds", result.seconds)
+            logger.debug(
+                f"Перекодировано {os.path.basename(video_path)}: "
+                f"{result.source_size / 2 ** 20:.1f} МБ -> {result.output_size / 2 ** 20:.1f} МБ за {result.seconds:.1f} сек"
+            )
+
+        preview_path = trailer_store.get(f"{key}.preview")
+        if not preview_path:
+            return video_path
+        trailer_store.release(video_path)
+        return preview_path
+
+
+def log_transcode_summary():
+    """Пишет в лог сэкономленный объём и оценку выигрыша во времени загрузки"""
+    files = metrics.counter("transcode.files")
+    if not files:
+        return
+    bytes_in, bytes_out = metrics.counter("transcode.bytes_in"), metrics.counter("transcode.bytes_out")
+    saved = bytes_in - bytes_out
+    upload_bytes, upload_seconds = metrics.counter("upload.bytes"), metrics.counter("upload.seconds")
+    summary = (
+        f"Перекодировано трейлеров: {int(files)}, сэкономлено {saved / 2 ** 20:.1f} МБ "
+        f"({saved / bytes_in:.0%}), p50 перекодирования {metrics.summary('transcode.seconds')['p50']:.1f} сек"
+    )
+    if upload_bytes and upload_seconds:
+        throughput = upload_bytes / upload_seconds
+        summary += (
+            f", скорость загрузки {throughput / 2 ** 20:.2f} МБ/сек, "
+            f"сэкономлено ~{saved / throughput:.0f} сек загрузки"
+        )
+    logger.info(summary)